@@ -0,0 +1,24 @@
+"""
+原子写文件: 先写同目录下的唯一临时文件再 os.replace
+读的一方要么看到旧文件要么看到新文件, 多个进程同时写同一个路径也不会互相改名对方写了一半的临时文件
+抓取策略表、会话文件、响应缓存和 Prometheus 指标文件都用它落盘
+
+    write_file_atomic(path, json.dumps(data).encode("utf-8"))
+"""
+import os
+import tempfile
+
+
+def write_file_atomic(path, data):
+    """把 bytes 写到 path(目录要已经存在); 失败时删掉临时文件并抛出 OSError"""
+    f = tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp", delete=False)
+    try:
+        with f:
+            f.write(data)
+        os.replace(f.name, path)
+    except BaseException:
+        try:
+            os.remove(f.name)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,133 @@
+"""
+百度跳转链接解析
+百度结果里的链接都是 https://www.baidu.com/link?url=... 形式的跳转链接, 之后每次 get_html 都要多走一跳,
+不同引擎的结果也没法按链接去重
+这里用不跟随跳转的 HEAD 请求并发取出真实地址(Location), 结果缓存一段时间
+
+    urls = await resolve_baidu_links(urls)                  # 无法解析的链接原样返回
+    text, urls = await baidu_search(query, resolve_links=True)
+"""
+import asyncio
+import logging
+import re
+import time
+import weakref
+from collections import OrderedDict
+from urllib.parse import urlsplit, urljoin
+from http_client import get_client
+from proxy_pool import use_proxy
+
+BAIDU_HOSTS = ("www.baidu.com", "baidu.com", "m.baidu.com")
+RESOLVE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36 Edg/132.0.0.0",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+}
+# HEAD 没有返回 Location 时, 从 GET 的页面里找 meta refresh / location.replace
+PAGE_REDIRECT = re.compile(r"""(?:URL\s*=\s*'?|location\.replace\(\s*["'])([^'")]+)""", re.I)
+
+
+def is_baidu_redirect(url):
+    parts = urlsplit(url)
+    return parts.hostname in BAIDU_HOSTS and parts.path.startswith("/link")
+
+
+class BaiduLinkResolver:
+    """并发解析跳转链接, 成功的结果缓存 ttl 秒; 同一链接同时只发一次请求"""
+
+    def __init__(self, ttl=3600, max_items=4096, concurrency=8, timeout=10):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.timeout = timeout
+        self.concurrency = concurrency
+        # 解析器是进程内共享的, 信号量和进行中的任务都绑定在事件循环上, 按循环分开
+        self._semaphores = weakref.WeakKeyDictionary()   # 事件循环 -> asyncio.Semaphore
+        self._items = OrderedDict()   # 跳转链接 -> (stored_at, 真实地址)
+        self._inflight = {}           # (事件循环, 跳转链接) -> task
+
+    def _lookup(self, url):
+        item = self._items.get(url)
+        if item is None:
+            return None
+        stored_at, target = item
+        if time.time() - stored_at > self.ttl:
+            del self._items[url]
+            return None
+        self._items.move_to_end(url)
+        return target
+
+    def _store(self, url, target):
+        self._items[url] = (time.time(), target)
+        self._items.move_to_end(url)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return semaphore
+
+    async def _fetch_target(self, url, proxy):
+        async with self._semaphore(), use_proxy(proxy, url) as chosen:
+            client = get_client(proxy=chosen)
+            response = await client.head(url, headers=RESOLVE_HEADERS, timeout=self.timeout, follow_redirects=False)
+            location = response.headers.get("location")
+            if not location:
+                response = await client.get(url, headers=RESOLVE_HEADERS, timeout=self.timeout, follow_redirects=False)
+                location = response.headers.get("location")
+                if not location:
+                    match = PAGE_REDIRECT.search(response.text)
+                    location = match.group(1) if match else None
+        if not location:
+            return None
+        return urljoin(url, location)
+
+    async def resolve(self, url, proxy=None):
+        """返回真实地址; 不是百度跳转链接或解析失败时返回原链接"""
+        if not is_baidu_redirect(url):
+            return url
+        target = self._lookup(url)
+        if target is not None:
+            return target
+
+        key = (asyncio.get_running_loop(), url)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_target(url, proxy))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._inflight.pop(key, None))
+        try:
+            target = await asyncio.shield(task)
+        except Exception as e:
+            # 任何错误(非法 URL、代理池出错等)都只影响这一条链接, 不能让整页搜索结果失败
+            logging.warning(f"解析百度跳转链接失败: {url} ({type(e).__name__}: {e})")
+            return url
+        if not target:
+            logging.warning(f"百度跳转链接没有返回目标地址: {url}")
+            return url
+        self._store(url, target)
+        return target
+
+    async def resolve_many(self, urls, proxy=None):
+        """并发解析一批链接, 返回与 urls 一一对应的列表"""
+        return list(await asyncio.gather(*(self.resolve(url, proxy) for url in urls)))
+
+    def clear(self):
+        self._items.clear()
+
+
+_default_resolver = None
+
+
+def get_baidu_resolver():
+    """返回进程内共享的解析器"""
+    global _default_resolver
+    if _default_resolver is None:
+        _default_resolver = BaiduLinkResolver()
+    return _default_resolver
+
+
+async def resolve_baidu_links(urls, proxy=None, resolver=None):
+    return await (resolver or get_baidu_resolver()).resolve_many(urls, proxy)
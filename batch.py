@@ -0,0 +1,61 @@
+"""
+批量并发抓取的公共工具
+get_html_many / post_html_many 使用: 全局并发上限 + 每个主机的并发上限,
+结果按完成顺序产出, 慢的页面不会挡住后面已经完成的页面
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+
+def host_of(url):
+    """取 URL 的主机名(小写), 解析失败时返回原字符串"""
+    try:
+        return urlsplit(url).hostname or url
+    except ValueError:
+        return url
+
+
+class ConcurrencyLimiter:
+    """全局信号量 + 按主机划分的信号量"""
+
+    def __init__(self, concurrency=8, per_host_limit=2):
+        self._global = asyncio.Semaphore(concurrency)
+        self._per_host_limit = per_host_limit
+        self._hosts = {}
+
+    def _host_semaphore(self, url):
+        host = host_of(url)
+        sem = self._hosts.get(host)
+        if sem is None:
+            sem = self._hosts[host] = asyncio.Semaphore(self._per_host_limit)
+        return sem
+
+    @asynccontextmanager
+    async def host_slot(self, url):
+        """只占用主机名额(Playwright 回退使用, 其全局并发由浏览器池限制)"""
+        async with self._host_semaphore(url):
+            yield
+
+    @asynccontextmanager
+    async def slot(self, url):
+        """同时占用主机名额和全局名额"""
+        async with self._host_semaphore(url):
+            async with self._global:
+                yield
+
+
+async def iter_as_completed(coros):
+    """并发运行协程, 按完成顺序产出结果; 迭代提前结束时取消未完成的任务"""
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        pending = [t for t in tasks if not t.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            logging.info(f"取消 {len(pending)} 个未完成的抓取任务。")
+            await asyncio.gather(*pending, return_exceptions=True)
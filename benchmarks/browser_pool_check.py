@@ -0,0 +1,220 @@
+"""
+用假的 Playwright 验证浏览器池(见 browser_pool.py)的 context 上限、关闭流程和 cookie 隔离, 不需要安装浏览器
+检查:
+    1. 并发租用不同参数的 context 时, 同时存在的 context 数不超过 max_contexts
+    2. 有页面仍在租用、另有调用方在等 context 名额时关闭池: 等待方立刻抛出 RuntimeError,
+       租用方正常归还, 它的 context 被直接关闭; 关闭后不能再租用
+    3. isolated=True 的租用看不到之前调用方留在 context 里的 cookie, 也不会拿到非隔离调用方的 context
+
+用法 (在仓库根目录):
+    python benchmarks/browser_pool_check.py
+    python benchmarks/browser_pool_check.py --requests 500 --json
+有检查不通过时以非零状态码退出
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from browser_pool import BrowserPool
+
+
+class FakeContext:
+    def __init__(self, counter):
+        self.counter = counter
+        self.pages = []
+        self.closed = False
+        self.cookies = []
+
+    def on(self, event, handler):
+        pass
+
+    async def new_page(self):
+        return FakePage()
+
+    async def add_cookies(self, cookies):
+        self.cookies.extend(cookies)
+
+    async def clear_cookies(self):
+        self.cookies.clear()
+
+    async def close(self):
+        if not self.closed:
+            self.closed = True
+            self.counter["live"] -= 1
+
+
+class FakePage:
+    def on(self, event, handler):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self, counter):
+        self.counter = counter
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self, **options):
+        await asyncio.sleep(random.random() / 200)
+        self.counter["live"] += 1
+        self.counter["created"] += 1
+        self.counter["peak"] = max(self.counter["peak"], self.counter["live"])
+        return FakeContext(self.counter)
+
+    async def close(self):
+        pass
+
+
+class FakePlaywright:
+    """只实现浏览器池用到的部分: chromium.launch() 和 stop()"""
+
+    def __init__(self):
+        self.counter = {"live": 0, "created": 0, "peak": 0}
+        self.chromium = self
+
+    async def launch(self, **options):
+        return FakeBrowser(self.counter)
+
+    async def stop(self):
+        pass
+
+
+def make_pool(**options):
+    pool = BrowserPool(**options)
+    pool._playwright = FakePlaywright()   # _ensure_started 看到已有驱动就不会启动真的 Playwright
+    return pool, pool._playwright.counter
+
+
+async def check_limit(requests, max_pages, max_contexts):
+    pool, counter = make_pool(max_pages=max_pages, max_contexts=max_contexts)
+
+    async def lease(i):
+        async with pool.page(user_agent=f"ua{i % (max_contexts + 1)}"):
+            await asyncio.sleep(random.random() / 100)
+
+    await asyncio.wait_for(asyncio.gather(*(lease(i) for i in range(requests))), 60)
+    await pool.close()
+    return {
+        "requests": requests,
+        "contexts_created": counter["created"],
+        "peak_contexts": counter["peak"],
+        "checks": {
+            "context 数不超过 max_contexts": counter["peak"] <= max_contexts,
+            "关闭后没有残留的 context": counter["live"] == 0,
+        },
+    }
+
+
+async def check_close_while_leased():
+    pool, counter = make_pool(max_pages=2, max_contexts=1)
+    leased = asyncio.Event()
+    release = asyncio.Event()
+
+    async def holder():
+        async with pool.page(user_agent="holder"):
+            leased.set()
+            await release.wait()
+
+    async def waiter():
+        async with pool.page(user_agent="waiter"):
+            pass
+
+    holder_task = asyncio.create_task(holder())
+    await leased.wait()
+    waiter_task = asyncio.create_task(waiter())
+    await asyncio.sleep(0.05)
+    waiting = not waiter_task.done()
+
+    await pool.close()
+    waiter_done, _ = await asyncio.wait({waiter_task}, timeout=1)
+    waiter_error = waiter_task.exception() if waiter_done else None
+    release.set()
+    holder_done, _ = await asyncio.wait({holder_task}, timeout=1)
+    holder_error = holder_task.exception() if holder_done else None
+    try:
+        async with pool.page():
+            pass
+        reopened = True
+    except RuntimeError:
+        reopened = False
+    for task in (holder_task, waiter_task):
+        task.cancel()
+    return {
+        "waiter_error": repr(waiter_error),
+        "holder_error": repr(holder_error),
+        "checks": {
+            "关闭前等待方在等名额": waiting,
+            "关闭后等待方抛出 RuntimeError": isinstance(waiter_error, RuntimeError),
+            "租用方正常归还": holder_done and holder_error is None,
+            "归还的 context 被关闭": counter["live"] == 0,
+            "关闭后不能再租用": not reopened,
+        },
+    }
+
+
+async def check_isolation():
+    pool, _ = make_pool(max_pages=1, max_contexts=4)
+    seen = {}
+
+    async def use(name, isolated, cookie=None):
+        async with pool.context(isolated=isolated) as context:
+            seen[name] = list(context.cookies)
+            if cookie:
+                await context.add_cookies([cookie])
+
+    await use("shared", False, {"name": "sid", "value": "shared"})
+    await use("isolated_1", True, {"name": "sid", "value": "isolated"})
+    await use("isolated_2", True)
+    await use("shared_again", False)
+    await pool.close()
+    return {
+        "seen": seen,
+        "checks": {
+            "隔离的租用看不到非隔离调用方的 cookie": seen["isolated_1"] == [],
+            "隔离的租用看不到上一次隔离租用的 cookie": seen["isolated_2"] == [],
+            "非隔离的租用仍然共用 cookie": seen["shared_again"] == [{"name": "sid", "value": "shared"}],
+        },
+    }
+
+
+async def run(args):
+    return {
+        "limit": await check_limit(args.requests, args.max_pages, args.max_contexts),
+        "close_while_leased": await check_close_while_leased(),
+        "isolation": await check_isolation(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="上限检查的租用次数")
+    parser.add_argument("--max-pages", type=int, default=6, help="上限检查的 max_pages(应大于 max_contexts)")
+    parser.add_argument("--max-contexts", type=int, default=2, help="上限检查的 max_contexts")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+
+    report = asyncio.run(run(args))
+    failed = [name for section in report.values() for name, passed in section["checks"].items() if not passed]
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        for section, result in report.items():
+            print(f"[{section}]")
+            for name, passed in result["checks"].items():
+                print(f"  {'通过' if passed else '失败'}  {name}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+比较 html_to_markdown_combined 的 mode="body" 与 mode="main"(正文提取) 在 fixtures 上的 token 数和转换耗时
+
+用法 (在仓库根目录):
+    python benchmarks/content_extraction.py
+    python benchmarks/content_extraction.py --rounds 50 --json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html2md import convert_html_to_markdown, estimate_tokens
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def measure(html, mode, rounds):
+    stats = {}
+    # html2md 会打印进度, 计时时屏蔽输出
+    with contextlib.redirect_stdout(io.StringIO()):
+        markdown = convert_html_to_markdown(html, mode=mode, stats=stats)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            convert_html_to_markdown(html, mode=mode)
+        elapsed = (time.perf_counter() - start) / rounds * 1000
+    return {"tokens": estimate_tokens(markdown), "chars": len(markdown), "ms": elapsed, "stats": stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20, help="每个 fixture 的计时轮数")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    results = {}
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if not name.endswith(".html"):
+            continue
+        with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+            html = f.read()
+        body = measure(html, "body", args.rounds)
+        main_content = measure(html, "main", args.rounds)
+        results[name] = {
+            "body_tokens": body["tokens"],
+            "main_tokens": main_content["tokens"],
+            "tokens_saved": body["tokens"] - main_content["tokens"],
+            "token_reduction": 1 - main_content["tokens"] / body["tokens"] if body["tokens"] else 0.0,
+            "text_reduction": main_content["stats"].get("reduction", 0.0),
+            "extract_mode": main_content["stats"].get("mode"),
+            "body_ms": round(body["ms"], 3),
+            "main_ms": round(main_content["ms"], 3),
+        }
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    total_body = sum(r["body_tokens"] for r in results.values())
+    total_main = sum(r["main_tokens"] for r in results.values())
+    print(f"{'fixture':22} {'body tokens':>12} {'main tokens':>12} {'节省':>7} {'body ms':>9} {'main ms':>9}  提取结果")
+    for name, r in results.items():
+        print(f"{name:22} {r['body_tokens']:>12} {r['main_tokens']:>12} {r['token_reduction']:>7.0%} {r['body_ms']:>9.2f} {r['main_ms']:>9.2f}  {r['extract_mode']}")
+    if total_body:
+        print(f"{'合计':20} {total_body:>12} {total_main:>12} {1 - total_main / total_body:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+离线基准测试用的本地模拟服务器(aiohttp), 不访问任何外网
+
+    /baidu/s                百度搜索结果页(fixtures/baidu_serp.html)
+    /searx/search           searx 搜索结果页(fixtures/searx_serp.html)
+    /bing/search            必应搜索结果页(fixtures/bing_serp.html)
+    /link?url=...           302 跳转到 /page/<url>, 模拟百度跳转链接
+    /page/{name}            普通文章页(轮流使用 fixtures 里的 article.html / news_article.html)
+    /cf                     Cloudflare 风格的防护页(503, Server: cloudflare, cf-ray)
+    /slow?delay=0.2         延迟 delay 秒后返回文章页
+    /large?size=2000000     约 size 字节的大页面
+    /redirect/{n}           连续 n 次 302 后到达文章页
+    /json                   JSON 接口
+    /post                   把 POST 的表单原样以 JSON 返回
+
+用法:
+    async with MockServer() as server:
+        html = await get_html(server.url("/page/1"))
+
+    python benchmarks/mock_server.py --port 8765     # 单独启动, 手动调试用
+
+依赖 aiohttp(不是运行时依赖): pip install -r benchmarks/requirements.txt
+"""
+import argparse
+import asyncio
+import json
+import os
+from aiohttp import web
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+ARTICLE_FIXTURES = ("article.html", "news_article.html")
+
+CHALLENGE_PAGE = """<!DOCTYPE html>
+<html lang="en-US"><head><title>Just a moment...</title>
+<meta http-equiv="refresh" content="390">
+<script src="/cdn-cgi/challenge-platform/h/b/orchestrate/chl_page/v1"></script></head>
+<body><div class="main-wrapper"><h1>Checking if the site connection is secure</h1>
+<p>Enable JavaScript and cookies to continue</p>
+<div class="footer">Performance &amp; security by Cloudflare</div></div></body></html>
+"""
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def large_page(size):
+    paragraph = "<p>" + "大页面的填充文本 large page filler text. " * 20 + "</p>\n"
+    count = max(1, size // len(paragraph.encode("utf-8")))
+    return f"<!DOCTYPE html><html><head><title>large</title></head><body><h1>large</h1>\n{paragraph * count}</body></html>"
+
+
+class MockServer:
+    """在 127.0.0.1 的随机端口(或指定端口)上启动模拟服务器; hits 记录每个路径的请求次数"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.hits = {}
+        self._runner = None
+        self._fixtures = {name: load_fixture(name) for name in ("baidu_serp.html", "searx_serp.html", "bing_serp.html") + ARTICLE_FIXTURES}
+        self._large = {}
+
+    def url(self, path):
+        return f"http://{self.host}:{self.port}{path}"
+
+    def _html(self, name):
+        return web.Response(text=self._fixtures[name], content_type="text/html")
+
+    def _article(self, key):
+        return self._html(ARTICLE_FIXTURES[sum(map(ord, key)) % len(ARTICLE_FIXTURES)])
+
+    @web.middleware
+    async def _count(self, request, handler):
+        self.hits[request.path] = self.hits.get(request.path, 0) + 1
+        return await handler(request)
+
+    async def baidu(self, request):
+        return self._html("baidu_serp.html")
+
+    async def searx(self, request):
+        return self._html("searx_serp.html")
+
+    async def bing(self, request):
+        return self._html("bing_serp.html")
+
+    async def link(self, request):
+        raise web.HTTPFound(f"/page/{request.query.get('url', 'x')}")
+
+    async def page(self, request):
+        return self._article(request.match_info["name"])
+
+    async def challenge(self, request):
+        return web.Response(text=CHALLENGE_PAGE, status=503, content_type="text/html",
+                            headers={"Server": "cloudflare", "CF-RAY": "8c0ffee0000000-HKG"})
+
+    async def slow(self, request):
+        await asyncio.sleep(float(request.query.get("delay", 0.2)))
+        return self._article(request.query_string)
+
+    async def large(self, request):
+        size = int(request.query.get("size", 2_000_000))
+        if size not in self._large:
+            self._large[size] = large_page(size)
+        return web.Response(text=self._large[size], content_type="text/html")
+
+    async def redirect(self, request):
+        remaining = int(request.match_info["n"])
+        raise web.HTTPFound(f"/redirect/{remaining - 1}" if remaining > 1 else "/page/redirected")
+
+    async def json_endpoint(self, request):
+        return web.json_response({"items": [{"id": i, "title": f"条目 {i}"} for i in range(20)]})
+
+    async def post(self, request):
+        data = await request.post()
+        return web.Response(text=json.dumps({"form": dict(data)}, ensure_ascii=False), content_type="application/json")
+
+    def app(self):
+        app = web.Application(middlewares=[self._count])
+        app.router.add_get("/baidu/s", self.baidu)
+        app.router.add_get("/searx/search", self.searx)
+        app.router.add_get("/bing/search", self.bing)
+        app.router.add_route("*", "/link", self.link)
+        app.router.add_get("/page/{name}", self.page)
+        app.router.add_get("/cf", self.challenge)
+        app.router.add_get("/slow", self.slow)
+        app.router.add_get("/large", self.large)
+        app.router.add_get("/redirect/{n}", self.redirect)
+        app.router.add_get("/json", self.json_endpoint)
+        app.router.add_post("/post", self.post)
+        return app
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+async def serve_forever(host, port):
+    async with MockServer(host, port) as server:
+        print(f"模拟服务器已启动: {server.url('/')}")
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
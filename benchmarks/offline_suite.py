@@ -0,0 +1,299 @@
+"""
+可复现的离线基准测试: 所有请求都发给本地模拟服务器(见 mock_server.py), 不需要代理和外网
+对每个场景按给定并发跑 requests 次, 记录吞吐量、p50/p95/最大延迟、失败次数和峰值 RSS, 结果可以输出为 JSON,
+与之前保存的结果比较, 吞吐量下降或 p95 上升超过阈值时以非零状态码退出
+
+场景:
+    get_html            普通文章页(httpx)
+    get_html_slow       服务器延迟 --slow-delay 秒
+    get_html_large      约 2 MB 的大页面
+    get_html_redirect   3 次跳转
+    get_html_challenge  Cloudflare 防护页(不启用 Playwright, 期望返回 None)
+    get_html_json       JSON 接口
+    post_html           表单 POST
+    search_baidu        baidu_search_results(本地百度结果页)
+    search_searx        searx_search_results(本地 searx 结果页)
+    parse_serp          百度/searx/必应结果页解析
+    html2md             fixtures 中文章页转 Markdown
+
+用法 (在仓库根目录, 先 pip install -r benchmarks/requirements.txt):
+    python benchmarks/offline_suite.py
+    python benchmarks/offline_suite.py --requests 500 --concurrency 32 --output results.json
+    python benchmarks/offline_suite.py --scenarios get_html,html2md --compare results.json --threshold 0.15
+
+说明:
+- 主机限速器用默认配置(不主动限速, 429/503 之后才限速, 防护页不算), 所有请求都发往 127.0.0.1 也不会被限住;
+  --no-host-limiter 完全关闭, 可以用来比较限速器本身的开销
+- 不使用响应缓存、搜索缓存、抓取策略表和会话存储, 每次都真正走一遍请求
+- html2md 默认在事件循环里直接转换, --convert-executor process 时工作进程的内存不计入 RSS
+- 峰值 RSS 是整个进程的, 前面场景占用的内存不一定会还给系统, 需要单独比较内存时用 --scenarios 只跑一个场景
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import search_engine
+from get_html import get_html
+from post_html import post_html
+from html2md import html_to_markdown_combined, shutdown_converters
+from http_client import close_clients
+from host_limiter import configure_host_limiter
+from mock_server import MockServer, load_fixture, ARTICLE_FIXTURES
+
+FETCH_OPTIONS = {"use_playwright": False, "strategy": False, "session": False}
+
+
+def make_scenarios(args):
+    """场景名 -> async op(server, i), 返回 True 表示结果符合预期"""
+    articles = [load_fixture(name) for name in ARTICLE_FIXTURES]
+    serps = [
+        (search_engine.extract_div_contents, load_fixture("baidu_serp.html")),
+        (search_engine.extract_searx_results, load_fixture("searx_serp.html")),
+        (search_engine.extract_bing_results, load_fixture("bing_serp.html")),
+    ]
+
+    async def fetch(path):
+        return await get_html(path, **FETCH_OPTIONS)
+
+    async def page(server, i):
+        return bool(await fetch(server.url(f"/page/{i}")))
+
+    async def slow(server, i):
+        return bool(await fetch(server.url(f"/slow?delay={args.slow_delay}&i={i}")))
+
+    async def large(server, i):
+        html = await fetch(server.url(f"/large?size={args.large_size}&i={i}"))
+        return bool(html) and len(html) > args.large_size // 4
+
+    async def redirect(server, i):
+        return bool(await fetch(server.url(f"/redirect/3?i={i}")))
+
+    async def challenge(server, i):
+        return await fetch(server.url(f"/cf?i={i}")) is None
+
+    async def json_endpoint(server, i):
+        return bool(await fetch(server.url(f"/json?i={i}")))
+
+    async def post(server, i):
+        content = await post_html(server.url("/post"), payload={"i": str(i)}, use_playwright=False)
+        return bool(content) and f'"i": "{i}"' in content
+
+    async def search_baidu(server, i):
+        results = await search_engine.baidu_search_results(f"基准测试 {i}", top_n=args.top_n)
+        return len(results) > 0
+
+    async def search_searx(server, i):
+        results = await search_engine.searx_search_results(f"benchmark {i}", top_n=args.top_n)
+        return len(results) > 0
+
+    async def parse_serp(server, i):
+        extract, html = serps[i % len(serps)]
+        await asyncio.sleep(0)
+        return len(extract(html)) > 0
+
+    async def html2md(server, i):
+        markdown = await html_to_markdown_combined(articles[i % len(articles)], executor=args.convert_executor)
+        return bool(markdown) and not markdown.startswith("Error during conversion")
+
+    return {
+        "get_html": page,
+        "get_html_slow": slow,
+        "get_html_large": large,
+        "get_html_redirect": redirect,
+        "get_html_challenge": challenge,
+        "get_html_json": json_endpoint,
+        "post_html": post,
+        "search_baidu": search_baidu,
+        "search_searx": search_searx,
+        "parse_serp": parse_serp,
+        "html2md": html2md,
+    }
+
+
+def current_rss():
+    """当前进程的 RSS(字节); 没有 /proc 时退回到 getrusage 的峰值"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def sample_rss(peak, interval=0.005):
+    while True:
+        peak[0] = max(peak[0], current_rss())
+        await asyncio.sleep(interval)
+
+
+def percentile(sorted_values, q):
+    """最近秩法取分位数"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(op, server, requests, concurrency, warmup):
+    for i in range(warmup):
+        await op(server, -1 - i)
+
+    latencies = []
+    failures = 0
+    next_index = iter(range(requests))
+
+    async def worker():
+        nonlocal failures
+        for i in next_index:
+            started = time.perf_counter()
+            try:
+                ok = await op(server, i)
+            except Exception as e:
+                logging.debug(f"请求 {i} 抛出异常: {e}")
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            failures += not ok
+
+    peak = [current_rss()]
+    sampler = asyncio.create_task(sample_rss(peak))
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await sampler
+    peak[0] = max(peak[0], current_rss())
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "failures": failures,
+        "seconds": round(elapsed, 4),
+        "throughput": round(requests / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "peak_rss_mb": round(peak[0] / 1024 / 1024, 1),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """与基线比较, 返回退化的场景列表; 吞吐量下降或 p95 上升超过 threshold 算退化"""
+    regressions = []
+    print(f"\n{'场景':20} {'吞吐量':>22} {'p95 ms':>24}")
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        throughput_change = current["throughput"] / previous["throughput"] - 1 if previous["throughput"] else 0.0
+        p95_change = current["p95_ms"] / previous["p95_ms"] - 1 if previous["p95_ms"] else 0.0
+        regressed = throughput_change < -threshold or p95_change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:20} {previous['throughput']:>9.1f} -> {current['throughput']:>9.1f} {throughput_change:>+7.0%}"
+              f"  {previous['p95_ms']:>9.2f} -> {current['p95_ms']:>9.2f} {p95_change:>+7.0%}{'  退化' if regressed else ''}")
+    return regressions
+
+
+async def run(args):
+    scenarios = make_scenarios(args)
+    names = args.scenarios.split(",") if args.scenarios else list(scenarios)
+    unknown = [name for name in names if name not in scenarios]
+    if unknown:
+        raise SystemExit(f"未知的场景: {', '.join(unknown)}，可选: {', '.join(scenarios)}")
+
+    if args.no_host_limiter:
+        configure_host_limiter(enabled=False)
+
+    results = {}
+    async with MockServer() as server:
+        search_engine.BAIDU_SEARCH_URL = server.url("/baidu/s")
+        search_engine.SEARX_SEARCH_URL = server.url("/searx/search")
+        search_engine.BING_SEARCH_URL = server.url("/bing/search")
+        try:
+            for name in names:
+                # 被测代码会打印进度, 计时时屏蔽输出
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    result = await run_scenario(scenarios[name], server, args.requests, args.concurrency, args.warmup)
+                results[name] = result
+                print(f"{name:20} 吞吐量 {result['throughput']:>9.1f}/s  p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms"
+                      f"  失败 {result['failures']:>4}  峰值 RSS {result['peak_rss_mb']:>7.1f} MB", file=sys.stderr)
+        finally:
+            await close_clients()
+            shutdown_converters(wait=False)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", help="逗号分隔的场景名, 默认全部")
+    parser.add_argument("--requests", type=int, default=200, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发数")
+    parser.add_argument("--warmup", type=int, default=5, help="每个场景正式计时前的预热次数")
+    parser.add_argument("--top-n", type=int, default=10, help="搜索场景的 top_n")
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="get_html_slow 的服务器延迟(秒)")
+    parser.add_argument("--large-size", type=int, default=2_000_000, help="get_html_large 的页面大小(字节)")
+    parser.add_argument("--convert-executor", choices=("process", "thread"), default=None, help="html2md 使用的执行器, 默认直接转换")
+    parser.add_argument("--no-host-limiter", action="store_true", help="关闭主机限速器")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    parser.add_argument("--compare", help="与之前保存的 JSON 结果比较")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定退化的相对变化阈值")
+    parser.add_argument("--verbose", action="store_true", help="保留被测代码的日志(默认只显示 ERROR)")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.ERROR)
+
+    results = asyncio.run(run(args))
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "convert_executor": args.convert_executor,
+            "host_limiter": not args.no_host_limiter,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n性能退化: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
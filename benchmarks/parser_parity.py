@@ -0,0 +1,89 @@
+"""
+检查 lxml 与 bs4(html.parser) 两个解析后端在 fixtures 上的输出是否一致, 并比较耗时
+
+用法 (在仓库根目录):
+    python benchmarks/parser_parity.py
+    python benchmarks/parser_parity.py --rounds 200
+不一致时以非零状态码退出
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parsers
+from html2md import html_to_markdown_combined
+from search_engine import extract_div_contents, extract_searx_results, extract_bing_results
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+EXTRACTORS = {
+    "baidu_serp.html": lambda html, backend: extract_div_contents(html, backend=backend),
+    "searx_serp.html": lambda html, backend: extract_searx_results(html, backend=backend),
+    "bing_serp.html": lambda html, backend: extract_bing_results(html, backend=backend),
+}
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def html_to_markdown(html, backend):
+    previous = parsers.resolve_backend()
+    parsers.set_parser_backend(backend)
+    try:
+        return asyncio.run(html_to_markdown_combined(html))
+    finally:
+        parsers.set_parser_backend(previous)
+
+
+def timed(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=50, help="每个 fixture 的计时轮数")
+    args = parser.parse_args()
+
+    if not parsers.HAS_LXML:
+        print("未安装 lxml，无法比较。")
+        return 1
+
+    cases = list(EXTRACTORS.items())
+    cases.append(("article.html", html_to_markdown))
+
+    failed = False
+    # html2md 会打印进度, 计时时屏蔽输出
+    devnull = open(os.devnull, "w")
+    for name, func in cases:
+        html = load_fixture(name)
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            expected = func(html, "bs4")
+            actual = func(html, "lxml")
+            bs4_ms = timed(lambda: func(html, "bs4"), args.rounds)
+            lxml_ms = timed(lambda: func(html, "lxml"), args.rounds)
+        finally:
+            sys.stdout = stdout
+
+        same = expected == actual
+        failed |= not same
+        count = len(expected) if isinstance(expected, list) else f"{len(expected)} 字符"
+        print(f"{name:18} {'一致' if same else '不一致'}  结果: {count:<10} bs4: {bs4_ms:7.2f} ms  lxml: {lxml_ms:7.2f} ms  加速: {bs4_ms / lxml_ms:4.1f}x")
+        if not same:
+            print(f"  bs4 : {expected!r}")
+            print(f"  lxml: {actual!r}")
+    devnull.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
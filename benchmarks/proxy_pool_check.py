@@ -0,0 +1,168 @@
+"""
+用本地代理验证代理池(见 proxy_pool.py), 不需要真实代理和外网
+启动模拟服务器(mock_server.py)和一个本地 HTTP 正向代理, 再加一个连不上的代理地址, 检查:
+    1. 池里有一个坏代理时, 所有请求都能经好代理完成, 坏代理的失败被记录并被剔除
+    2. 目标站点慢(读超时)不算代理的错, 好代理不会因此被剔除
+
+用法 (在仓库根目录, 先 pip install -r benchmarks/requirements.txt):
+    python benchmarks/proxy_pool_check.py
+    python benchmarks/proxy_pool_check.py --requests 100 --concurrency 16 --json
+有检查不通过时以非零状态码退出
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from get_html import get_html
+from http_client import close_clients
+from proxy_pool import ProxyPool
+from mock_server import MockServer
+
+FETCH_OPTIONS = {"use_playwright": False, "strategy": False, "session": False}
+HOP_BY_HOP = ("connection:", "proxy-connection:", "keep-alive:", "proxy-authorization:")
+
+
+class LocalProxy:
+    """最简单的 HTTP 正向代理: 只转发 http:// 目标的绝对 URL 请求, 每个请求一条连接, 不支持 CONNECT"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._server = None
+
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def _handle(self, reader, writer):
+        upstream = None
+        try:
+            head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+            lines = head.split("\r\n")
+            method, target, version = lines[0].split(" ", 2)
+            headers = [line for line in lines[1:] if line and not line.lower().startswith(HOP_BY_HOP)]
+            length = next((int(line.split(":", 1)[1]) for line in headers if line.lower().startswith("content-length:")), 0)
+            body = await reader.readexactly(length) if length else b""
+            self.requests += 1
+
+            parts = urlsplit(target)
+            path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+            up_reader, upstream = await asyncio.open_connection(parts.hostname, parts.port or 80)
+            upstream.write("\r\n".join([f"{method} {path} {version}", *headers, "Connection: close", "", ""]).encode("latin-1") + body)
+            await upstream.drain()
+            while chunk := await up_reader.read(65536):
+                writer.write(chunk)
+                await writer.drain()
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            logging.debug(f"本地代理转发失败: {e}")
+        finally:
+            if upstream is not None:
+                upstream.close()
+            writer.close()
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._server.close()
+        await self._server.wait_closed()
+
+
+def unreachable_proxy(host="127.0.0.1"):
+    """一个没人监听的本地端口, 连接会被拒绝"""
+    with socket.socket() as s:
+        s.bind((host, 0))
+        port = s.getsockname()[1]
+    return f"http://{host}:{port}"
+
+
+async def check_failover(server, good, dead, requests, concurrency):
+    # sticky_ttl=0: 每个请求都重新选代理, 坏代理被剔除前有机会被选中
+    pool = ProxyPool([dead, good.url()], sticky_ttl=0, max_failures=1, eject_time=60)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(i):
+        async with semaphore:
+            return await get_html(server.url(f"/page/{i}"), proxy=pool, httpx_retries=3, timeout=5, **FETCH_OPTIONS)
+
+    # 让好代理一开始看起来更慢, 第一个请求一定先选中坏代理(否则两个代理分数相同, 随机选)
+    pool.record(good.url(), True, 5.0)
+    results = await asyncio.gather(*(fetch(i) for i in range(requests)))
+    stats = pool.stats()
+    succeeded = sum(1 for html in results if html)
+    return {
+        "succeeded": succeeded,
+        "requests": requests,
+        "proxied": good.requests,
+        "stats": stats,
+        "checks": {
+            "所有请求都成功": succeeded == requests,
+            "请求都经过了好代理": good.requests >= requests,
+            "坏代理被剔除": stats[dead]["ejected_for"] > 0,
+            "好代理没有失败记录": stats[good.url()]["failures"] == 0,
+        },
+    }
+
+
+async def check_slow_target(server, good, rounds, delay):
+    pool = ProxyPool([good.url()], max_failures=2)
+    for i in range(rounds):
+        await get_html(server.url(f"/slow?delay={delay}&i={i}"), proxy=pool, httpx_retries=1, timeout=delay / 4, **FETCH_OPTIONS)
+    stats = pool.stats()[good.url()]
+    return {
+        "rounds": rounds,
+        "stats": stats,
+        "checks": {
+            "读超时不记为代理失败": stats["failures"] == 0,
+            "好代理没有被剔除": stats["ejected_for"] == 0,
+        },
+    }
+
+
+async def run(args):
+    async with MockServer() as server, LocalProxy() as good:
+        dead = unreachable_proxy()
+        try:
+            return {
+                "failover": await check_failover(server, good, dead, args.requests, args.concurrency),
+                "slow_target": await check_slow_target(server, good, args.slow_rounds, args.slow_delay),
+            }
+        finally:
+            await close_clients()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40, help="故障切换检查的请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="故障切换检查的并发数")
+    parser.add_argument("--slow-rounds", type=int, default=4, help="慢站点检查的请求数(应大于 max_failures)")
+    parser.add_argument("--slow-delay", type=float, default=1.0, help="慢站点的响应延迟(秒), 客户端超时取它的 1/4")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+
+    report = asyncio.run(run(args))
+    failed = [name for section in report.values() for name, passed in section["checks"].items() if not passed]
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        for section, result in report.items():
+            print(f"[{section}]")
+            for name, passed in result["checks"].items():
+                print(f"  {'通过' if passed else '失败'}  {name}")
+            for proxy, stats in result["stats"].items() if section == "failover" else [("good", result["stats"])]:
+                print(f"  {proxy}: 请求 {stats['requests']} 失败 {stats['failures']} 剔除剩余 {stats['ejected_for']:.0f} 秒")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
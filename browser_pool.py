@@ -0,0 +1,315 @@
+"""
+Playwright 浏览器池
+get_html / post_html / edge_search 的 Playwright 回退都从这里租用 context/page,
+避免每次都 async_playwright() + chromium.launch() 冷启动(通常 1~3 秒)
+
+用法:
+    pool = get_browser_pool()
+    async with pool.page(proxy=proxy, user_agent=ua) as page:
+        await page.goto(url)
+    ...
+    await close_browser_pool()  # 程序退出前调用
+
+- 每个代理对应一个常驻的 chromium 实例
+- context 按 (代理, 是否隔离, context 参数) 复用, 使用 max_uses 次后或崩溃后自动回收;
+  isolated=True 的租用(不使用会话的抓取)不和其它调用方共用 context, 每次租到时先清空 cookie, 看不到之前调用方留下的 cookie
+- max_pages 限制同时打开的页面总数, max_contexts 限制 context 总数(满了先关其它键的空闲 context, 没有空闲的就等别人归还)
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+
+DEFAULT_LAUNCH_ARGS = ["--disable-blink-features=AutomationControlled"]
+
+# 只需要 DOM 时可以拦截的资源类型
+BLOCKABLE_RESOURCE_TYPES = ("image", "font", "stylesheet", "media")
+
+
+def _freeze(value):
+    """把 context 参数转换为可哈希的键"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+async def block_page_resources(page, resource_types=BLOCKABLE_RESOURCE_TYPES):
+    """在页面上拦截指定类型的子资源请求; 路由挂在页面上, 页面关闭后不会影响复用的 context"""
+    blocked = set(resource_types)
+
+    async def handle(route):
+        if route.request.resource_type in blocked:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await page.route("**/*", handle)
+
+
+class _PooledContext:
+    """池中的一个 BrowserContext 及其使用状态"""
+
+    def __init__(self, context, browser, key):
+        self.context = context
+        self.browser = browser
+        self.key = key
+        self.uses = 0
+        self.broken = False
+        context.on("close", self._mark_broken)
+
+    def _mark_broken(self, *_):
+        self.broken = True
+
+    def usable(self):
+        return not self.broken and self.browser.is_connected()
+
+
+class _PageSlots:
+    """可以一次申请多个名额的计数信号量(多标签页需要一次占用多个页面名额)"""
+
+    def __init__(self, total):
+        self.total = total
+        self.available = total
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, n=1):
+        n = min(n, self.total)
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.available >= n)
+            self.available -= n
+        return n
+
+    async def release(self, n=1):
+        async with self._cond:
+            self.available += n
+            self._cond.notify_all()
+
+
+class BrowserPool:
+    """长期存活、有上限的浏览器/上下文池"""
+
+    def __init__(self, max_pages=4, max_contexts=8, context_max_uses=50, headless=True, launch_args=None):
+        self.max_pages = max_pages
+        self.max_contexts = max(max_contexts, 1)
+        self.context_max_uses = context_max_uses
+        self.headless = headless
+        self.launch_args = launch_args or DEFAULT_LAUNCH_ARGS
+        self._reset()
+
+    def _reset(self):
+        self._loop = None
+        self._playwright = None
+        self._browsers = {}     # proxy -> Browser
+        self._idle = {}         # key -> [_PooledContext]
+        self._context_count = 0  # 已创建和正在创建的 context, 不超过 max_contexts
+        self._contexts = None    # Condition: 保护 _idle / _context_count, 名额空出来时通知
+        self._slots = None
+        self._lock = None
+        self._closed = False
+
+    async def _ensure_started(self):
+        if self._closed:
+            raise RuntimeError("浏览器池已关闭")
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._loop is not None:
+                # Playwright 对象绑定在创建它的事件循环上, 换了循环只能丢弃旧实例
+                logging.warning("浏览器池所在的事件循环已变化，丢弃旧的浏览器实例。")
+                self._reset()
+            self._loop = loop
+            self._slots = _PageSlots(self.max_pages)
+            self._lock = asyncio.Lock()
+            self._contexts = asyncio.Condition()
+        async with self._lock:
+            if self._playwright is None:
+                logging.info("启动 Playwright 驱动...")
+                self._playwright = await async_playwright().start()
+
+    async def _get_browser(self, proxy):
+        async with self._lock:
+            if self._closed:
+                raise RuntimeError("浏览器池已关闭")
+            browser = self._browsers.get(proxy)
+            if browser is None or not browser.is_connected():
+                logging.info(f"启动常驻 chromium 实例 (代理: {proxy})")
+                browser = await self._playwright.chromium.launch(
+                    headless=self.headless,
+                    args=self.launch_args,
+                    proxy={"server": proxy} if proxy else None
+                )
+                self._browsers[proxy] = browser
+            return browser
+
+    def _discard(self, pooled=None):
+        """让出一个 context 名额并唤醒等待者, 调用时必须持有 self._contexts; 返回要关闭的 context"""
+        self._context_count -= 1
+        self._contexts.notify_all()
+        return pooled
+
+    @staticmethod
+    async def _close_contexts(pooled_list):
+        """在锁外关闭 context"""
+        for pooled in pooled_list:
+            try:
+                await pooled.context.close()
+            except Exception as e:
+                logging.debug(f"关闭 context 时出错(忽略): {e}")
+
+    def _evict_idle(self):
+        """context 数量达到上限时让出一个其它键的空闲 context 的名额, 返回它(没有空闲的返回 None)"""
+        for key, idle in list(self._idle.items()):
+            if idle:
+                pooled = idle.pop(0)
+                if not idle:
+                    del self._idle[key]
+                return self._discard(pooled)
+        return None
+
+    async def _acquire_context(self, proxy, isolated, context_options):
+        key = (proxy, isolated, _freeze(context_options))
+        to_close = []
+        try:
+            async with self._contexts:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("浏览器池已关闭")
+                    idle = self._idle.get(key, [])
+                    while idle:
+                        pooled = idle.pop()
+                        if pooled.usable():
+                            return pooled
+                        to_close.append(self._discard(pooled))
+                    self._idle.pop(key, None)
+                    if self._context_count < self.max_contexts:
+                        self._context_count += 1
+                        break
+                    evicted = self._evict_idle()
+                    if evicted is not None:
+                        to_close.append(evicted)
+                        continue
+                    # 所有 context 都在用, 等一个被归还或关闭, 不超过上限
+                    logging.info(f"context 数量已达上限 {self.max_contexts}，等待归还...")
+                    await self._contexts.wait()
+        finally:
+            await self._close_contexts(to_close)
+
+        try:
+            browser = await self._get_browser(proxy)
+            options = {"ignore_https_errors": True}
+            options.update(context_options)
+            context = await browser.new_context(**options)
+        except BaseException:
+            async with self._contexts:
+                self._discard()
+            raise
+        pooled = _PooledContext(context, browser, key)
+        if self._closed:
+            # 创建期间池被关闭了
+            await self._release_context(pooled)
+            raise RuntimeError("浏览器池已关闭")
+        return pooled
+
+    async def _release_context(self, pooled):
+        async with self._contexts:
+            if self._closed or not pooled.usable() or pooled.uses >= self.context_max_uses:
+                if pooled.uses >= self.context_max_uses:
+                    logging.info(f"context 已使用 {pooled.uses} 次，回收。")
+                self._discard(pooled)
+            else:
+                # 归还到空闲列表也要通知: 等待者可以复用它, 或者关掉它换成自己要的键
+                self._idle.setdefault(pooled.key, []).append(pooled)
+                self._contexts.notify_all()
+                return
+        await self._close_contexts([pooled])
+
+    @asynccontextmanager
+    async def context(self, proxy=None, pages=1, isolated=False, **context_options):
+        """租用一个 BrowserContext, 占用 pages 个页面名额, 退出时归还
+        isolated=True 时租到的 context 不带任何 cookie(见模块说明)"""
+        await self._ensure_started()
+        slots = self._slots
+        taken = await slots.acquire(pages)
+        try:
+            pooled = await self._acquire_context(proxy, isolated, context_options)
+            pooled.uses += 1
+            try:
+                if isolated and pooled.uses > 1:
+                    await pooled.context.clear_cookies()
+                yield pooled.context
+            except Exception:
+                if not pooled.browser.is_connected():
+                    pooled.broken = True
+                raise
+            finally:
+                for page in list(pooled.context.pages) if pooled.usable() else []:
+                    try:
+                        await page.close()
+                    except Exception:
+                        pooled.broken = True
+                await self._release_context(pooled)
+        finally:
+            await slots.release(taken)
+
+    @asynccontextmanager
+    async def page(self, proxy=None, isolated=False, **context_options):
+        """租用一个新页面, 退出时关闭页面并归还 context"""
+        async with self.context(proxy=proxy, isolated=isolated, **context_options) as context:
+            page = await context.new_page()
+            crashed = []
+            page.on("crash", crashed.append)
+            try:
+                yield page
+            finally:
+                if crashed:
+                    logging.warning("页面崩溃，所在 context 将被回收。")
+                    await context.close()
+
+    async def close(self):
+        """关闭所有空闲 context、浏览器和 Playwright 驱动; 关闭后不能再租用
+        仍在租用中的 context 归还时直接关闭, 正在等 context 名额的调用方会被唤醒并抛出 RuntimeError"""
+        if self._closed:
+            return
+        if self._loop is not asyncio.get_running_loop():
+            # 其它事件循环上的 Playwright 对象在这里关不掉, 只能丢弃
+            self._reset()
+            self._closed = True
+            return
+        async with self._contexts:
+            self._closed = True
+            idle = [self._discard(pooled) for pooled_list in self._idle.values() for pooled in pooled_list]
+            self._idle.clear()
+            self._contexts.notify_all()
+        await self._close_contexts(idle)
+        async with self._lock:
+            browsers = list(self._browsers.values())
+            self._browsers.clear()
+            playwright, self._playwright = self._playwright, None
+        for browser in browsers:
+            try:
+                await browser.close()
+            except Exception as e:
+                logging.debug(f"关闭浏览器时出错(忽略): {e}")
+        if playwright is not None:
+            await playwright.stop()
+        logging.info("浏览器池已关闭。")
+
+
+_default_pool = None
+
+
+def get_browser_pool():
+    """返回进程内共享的默认浏览器池"""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = BrowserPool()
+    return _default_pool
+
+
+async def close_browser_pool():
+    """关闭默认浏览器池(如果已创建)"""
+    global _default_pool
+    if _default_pool is not None:
+        await _default_pool.close()
+        _default_pool = None
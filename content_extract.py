@@ -0,0 +1,224 @@
+"""
+正文提取(readability 风格的去模板)
+html2md 默认把整个 <body> 转成 Markdown, 导航栏/页脚/Cookie 提示/侧边栏都会进到结果里, 白白浪费 token
+这里给 DOM 块打分, 只保留正文所在的块:
+
+    1. 删掉 nav/aside 等必然不是正文的标签、搜索框/登录框之类的表单, 以及 class/id 像侧边栏、评论、广告、Cookie 提示的元素
+       (ASP.NET WebForms 整页都包在 <form> 里, 所以 form 只删文字很少或像搜索/登录的)
+    2. 每个段落按文字长度和逗号/句号数量得分, 分数累加到父元素和祖父元素
+    3. 候选块的初始分由标签语义(article/main 加分, 列表/标题减分)和 class/id 决定, 最后乘以 (1 - 链接密度)
+    4. 取得分最高的块, 再把同级里得分相近或像正文段落的兄弟块一起带上;
+       最高分的块如果是重复结构中的一项(列表页、搜索结果页), 改为取整个列表
+
+提取出的正文过短时(列表页、搜索结果页等)回退到整个 <body>; 去模板把 body 删空了时回退到去模板之前的 body
+用法: html_to_markdown_combined(html, mode="main")
+"""
+import re
+from bs4 import Tag
+
+# 不可能包含正文的标签, 直接删除
+REMOVE_TAGS = ("nav", "aside", "iframe", "noscript", "svg", "button", "select", "input", "textarea", "dialog")
+# 在 article/main 外面才删除的标签(文章内的 header 通常包含标题)
+REMOVE_OUTSIDE_ARTICLE = ("header", "footer")
+
+UNLIKELY = re.compile(
+    r"banner|breadcrumb|combx|comment|community|consent|cookie|disqus|extra|foot|gdpr|header|legends|menu|modal|"
+    r"nav|newsletter|pager|pagination|popup|related|remark|replies|rss|share|shoutbox|sidebar|skyscraper|social|"
+    r"sponsor|subscribe|supplemental|toolbar|widget|advert|ad-break|agegate", re.I)
+MAYBE_CANDIDATE = re.compile(r"and|article|body|column|content|main|shadow|post|entry|text", re.I)
+POSITIVE = re.compile(r"article|body|content|entry|hentry|h-entry|main|page|post|text|blog|story", re.I)
+NEGATIVE = re.compile(
+    r"-ad-|hidden|^hid$|banner|combx|comment|com-|contact|consent|cookie|foot|footer|footnote|gdpr|masthead|media|"
+    r"meta|outbrain|promo|related|scroll|share|shoutbox|sidebar|skyscraper|sponsor|shopping|tags|tool|widget|advert", re.I)
+
+# 搜索框、登录框、订阅框等表单
+FORM_BOILERPLATE = re.compile(r"search|login|log-in|signin|sign-in|signup|register|subscribe|newsletter|comment|query", re.I)
+
+# 作为“段落”参与打分的标签
+PARAGRAPH_TAGS = ("p", "pre", "td", "blockquote")
+BLOCK_TAGS = frozenset(("address", "article", "aside", "blockquote", "div", "dl", "fieldset", "figure", "footer", "form",
+                        "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "ol", "p", "pre", "section", "table", "ul"))
+
+TAG_WEIGHTS = {
+    "article": 25, "main": 25,
+    "div": 5, "section": 5,
+    "pre": 3, "td": 3, "blockquote": 3,
+    "address": -3, "ol": -3, "ul": -3, "dl": -3, "dd": -3, "dt": -3, "li": -3, "form": -3,
+    "h1": -5, "h2": -5, "h3": -5, "h4": -5, "h5": -5, "h6": -5, "th": -5,
+}
+
+MIN_PARAGRAPH_CHARS = 25
+MIN_LISTING_ITEMS = 3
+MIN_CONTENT_CHARS = 200
+PUNCTUATION = re.compile(r"[,，。、;；]")
+
+
+def _class_and_id(tag):
+    classes = tag.get("class") or []
+    if isinstance(classes, str):
+        classes = [classes]
+    return " ".join(classes) + " " + (tag.get("id") or "")
+
+
+def _class_weight(tag):
+    match_string = _class_and_id(tag)
+    weight = 0
+    if NEGATIVE.search(match_string):
+        weight -= 25
+    if POSITIVE.search(match_string):
+        weight += 25
+    return weight
+
+
+def _text_length(tag):
+    return len(tag.get_text(" ", strip=True))
+
+
+def link_density(tag, text_length=None):
+    """链接文字占全部文字的比例"""
+    text_length = _text_length(tag) if text_length is None else text_length
+    if not text_length:
+        return 0.0
+    link_length = sum(len(a.get_text(" ", strip=True)) for a in tag.find_all("a"))
+    return link_length / text_length
+
+
+def _inside(tag, names):
+    return any(parent.name in names for parent in tag.parents)
+
+
+def _is_boilerplate_form(form):
+    """文字很少的表单, 或像搜索/登录/订阅、里面又没有正文段落的表单"""
+    if _text_length(form) < MIN_CONTENT_CHARS:
+        return True
+    looks_like = (form.get("role") == "search" or form.find("input", attrs={"type": "password"}) is not None
+                  or FORM_BOILERPLATE.search(_class_and_id(form) + " " + (form.get("action") or "")))
+    return bool(looks_like) and not any(_text_length(p) >= MIN_PARAGRAPH_CHARS * 3 for p in form.find_all(PARAGRAPH_TAGS))
+
+
+def _remove_boilerplate(body):
+    """把模板元素从 body 里摘下来(不销毁), 返回 [(父元素, 位置, 元素)], 需要时用 _restore 放回去"""
+    marked = body.find_all(REMOVE_TAGS)
+    marked += [form for form in body.find_all("form") if _is_boilerplate_form(form)]
+    marked += [tag for tag in body.find_all(REMOVE_OUTSIDE_ARTICLE) if not _inside(tag, ("article", "main"))]
+    for tag in body.find_all(True):
+        if tag.name in ("body", "a", "article", "main"):
+            continue
+        match_string = _class_and_id(tag)
+        if UNLIKELY.search(match_string) and not MAYBE_CANDIDATE.search(match_string) and not _inside(tag, ("table", "code", "pre")):
+            marked.append(tag)
+
+    # 同一个元素可能被标记多次, 被标记元素里面的元素随它一起摘下
+    marked = list({id(tag): tag for tag in marked}.values())
+    marked_ids = {id(tag) for tag in marked}
+    removed = []
+    for tag in marked:
+        if any(id(parent) in marked_ids for parent in tag.parents):
+            continue
+        parent = tag.parent
+        removed.append((parent, parent.index(tag), tag))
+        tag.extract()
+    return removed
+
+
+def _restore(removed):
+    for parent, position, tag in reversed(removed):
+        parent.insert(position, tag)
+
+
+def _is_inline_div(tag):
+    """没有块级子元素、直接装文字的 div, 按段落处理"""
+    return tag.name == "div" and not any(isinstance(child, Tag) and child.name in BLOCK_TAGS for child in tag.children)
+
+
+def _score_candidates(body):
+    """返回 {id(tag): (tag, 分数)}; bs4 的 Tag 按序列化后的 HTML 计算哈希, 不能直接做字典键"""
+    scores = {}
+
+    def add_score(tag, score):
+        key = id(tag)
+        if key not in scores:
+            scores[key] = (tag, TAG_WEIGHTS.get(tag.name, 0) + _class_weight(tag))
+        scores[key] = (tag, scores[key][1] + score)
+
+    for paragraph in body.find_all(lambda t: t.name in PARAGRAPH_TAGS or _is_inline_div(t)):
+        text = paragraph.get_text(" ", strip=True)
+        if len(text) < MIN_PARAGRAPH_CHARS:
+            continue
+        score = 1 + len(PUNCTUATION.findall(text)) + min(len(text) // 100, 3)
+        for level, ancestor in enumerate(paragraph.parents):
+            if ancestor is None or ancestor.name in ("html", "[document]") or level >= 3:
+                break
+            divider = 1 if level == 0 else 2 if level == 1 else level * 3
+            add_score(ancestor, score / divider)
+    # 链接密度高的块(导航、相关文章列表)降权
+    return {key: (tag, score * (1 - link_density(tag))) for key, (tag, score) in scores.items()}
+
+
+def _promote_listing(top):
+    """top 或它的 3 层以内祖先有至少 MIN_LISTING_ITEMS 个同标签同 class 的兄弟时, 返回这组兄弟的父元素"""
+    node = top
+    for _ in range(4):
+        parent = node.parent
+        if parent is None or parent.name in ("body", "html", "[document]"):
+            break
+        same = [child for child in parent.children
+                if isinstance(child, Tag) and child.name == node.name and child.get("class") == node.get("class")]
+        if len(same) >= MIN_LISTING_ITEMS:
+            return parent
+        node = parent
+    return top
+
+
+def extract_main_content(soup):
+    """返回 (正文 HTML 字符串, 统计信息); 找不到足够长的正文时返回整个 body 的 HTML
+
+    统计信息: mode(实际使用 main 还是 body), input_chars / output_chars(纯文本长度), reduction(减少的比例)
+    soup 会被原地修改
+    """
+    body = soup.body or soup
+    input_chars = _text_length(body)
+    removed = _remove_boilerplate(body)
+
+    scores = _score_candidates(body)
+    top, top_score = max(scores.values(), key=lambda item: item[1]) if scores else (None, 0)
+    kept = []
+    if top is not None:
+        top = _promote_listing(top)
+        threshold = max(10, top_score * 0.2)
+        top_classes = top.get("class")
+        siblings = [child for child in top.parent.children if isinstance(child, Tag)] if top.parent is not None else [top]
+        for sibling in siblings:
+            if sibling is top:
+                kept.append(sibling)
+                continue
+            bonus = top_score * 0.2 if top_classes and sibling.get("class") == top_classes else 0
+            if scores.get(id(sibling), (None, 0))[1] + bonus >= threshold:
+                kept.append(sibling)
+            elif sibling.name == "p":
+                length = _text_length(sibling)
+                density = link_density(sibling, length)
+                if (length > 80 and density < 0.25) or (0 < length <= 80 and density == 0 and PUNCTUATION.search(sibling.get_text())):
+                    kept.append(sibling)
+
+    output_chars = sum(_text_length(tag) for tag in kept)
+    if output_chars < MIN_CONTENT_CHARS:
+        # 不像文章页, 保留去掉模板后的整个 body; 去模板把内容删光了(误判)就用原来的 body
+        if _text_length(body) < min(MIN_CONTENT_CHARS, input_chars):
+            _restore(removed)
+        kept = [body]
+        mode = "body"
+        output_chars = _text_length(body)
+    else:
+        mode = "main"
+
+    html = "".join(str(tag) for tag in kept)
+    if mode == "main":
+        html = f"<div>{html}</div>"
+    stats = {
+        "mode": mode,
+        "input_chars": input_chars,
+        "output_chars": output_chars,
+        "reduction": 1 - output_chars / input_chars if input_chars else 0.0,
+    }
+    return html, stats
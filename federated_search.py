@@ -0,0 +1,193 @@
+"""
+聚合搜索: 同时查询多个引擎, 用倒数排名融合(RRF)合并结果
+- 各引擎并发请求, budget 秒后还没返回的引擎直接取消, 只用已经到达的结果(edge 要起浏览器, 经常是最慢的那个)
+- 链接先规范化(小写域名、去掉 www/默认端口/锚点/跟踪参数、参数排序)再去重, 多个引擎都返回的链接得分累加
+- 每条结果的得分: sum(weight / (k + 该引擎中的名次)); 返回的链接是排名最好的那个引擎给出的原始链接
+- 百度结果默认解析跳转链接(resolve_links=True, 见 baidu_links.py), 否则 baidu.com/link?url=... 永远和别的引擎对不上;
+  不需要时用 engine_options={'baidu': {'resolve_links': False}} 关掉
+
+    results = await federated_search_results("关键词", top_n=10, budget=3)
+    text, urls = await federated_search("关键词", top_n=10, budget=3)
+"""
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from search_engine import searx_search_results, baidu_search_results, edge_search_results
+from search_results import SearchResult, SearchResults
+from http_client import close_clients
+from browser_pool import close_browser_pool
+
+ENGINES = {
+    'baidu': baidu_search_results,
+    'searx': searx_search_results,
+    'edge': edge_search_results,
+}
+DEFAULT_ENGINES = ('baidu', 'searx', 'edge')
+# 百度的跳转链接要解析成真实地址才能和其它引擎的结果去重
+DEFAULT_ENGINE_OPTIONS = {'baidu': {'resolve_links': True}}
+RRF_K = 60
+
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|gclid|dclid|fbclid|msclkid|yclid|spm|ref_src|_hsenc|_hsmi|mc_cid|mc_eid)$', re.I)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+@dataclass(slots=True, frozen=True)
+class FusedResult(SearchResult):
+    score: float = 0.0
+    sources: tuple = ()     # 返回了这条结果的引擎, 按各自名次从好到差
+
+
+def canonicalize_url(url):
+    """规范化链接用于去重; 解析失败时原样返回"""
+    try:
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or '').lower().rstrip('.')
+        port = parts.port
+    except ValueError:
+        return url
+    if host.startswith('www.'):
+        host = host[4:]
+    netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    path = re.sub(r'/{2,}', '/', parts.path)
+    if path.endswith('/'):
+        path = path.rstrip('/')
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                             if not TRACKING_PARAMS.match(key)))
+    return urlunsplit((scheme, netloc, path or '/', query, ''))
+
+
+def dedup_key(url):
+    """http 和 https 视为同一个链接"""
+    canonical = canonicalize_url(url)
+    return canonical.split('://', 1)[-1]
+
+
+def rrf_fuse(result_lists, k=RRF_K, weights=None, top_n=None):
+    """result_lists: {引擎名: SearchResults}, 返回按融合得分排序的 SearchResults(FusedResult)
+    同一引擎里重复的链接只按最好的名次算一次; 没有有效链接的条目不参与融合"""
+    weights = weights or {}
+    fused = {}      # key -> [score, [(rank, engine, result)]]
+    for engine, results in result_lists.items():
+        weight = weights.get(engine, 1.0)
+        seen = set()
+        for result in results:
+            if not result.has_valid_url:
+                continue
+            key = dedup_key(result.url)
+            if key in seen:
+                continue
+            seen.add(key)
+            item = fused.setdefault(key, [0.0, []])
+            item[0] += weight / (k + result.rank)
+            item[1].append((result.rank, engine, result))
+
+    ranked = sorted(fused.values(), key=lambda item: -item[0])
+    if top_n is not None:
+        ranked = ranked[:top_n]
+    merged = SearchResults(engine='federated')
+    for position, (score, hits) in enumerate(ranked, 1):
+        hits.sort(key=lambda hit: (hit[0], -weights.get(hit[1], 1.0)))
+        best = hits[0][2]
+        # 规范化的链接只用来去重, 返回引擎给出的原始链接(去掉 www/参数后可能指向别的页面)
+        merged.append(FusedResult(best.title, best.url, best.snippet, position, 'federated',
+                                  best.fetched_at, score, tuple(hit[1] for hit in hits)))
+    return merged
+
+
+async def federated_search_results(query, engines=DEFAULT_ENGINES, top_n=10, budget=None, proxy=None, cache=None,
+                                   k=RRF_K, weights=None, engine_options=None, stats=None):
+    """同时查询 engines 并融合结果, 返回 SearchResults(FusedResult)
+
+    budget: 时间预算(秒), 到时还没返回的引擎被取消; None 等所有引擎返回
+    weights: {引擎名: 权重}, 默认都是 1
+    engine_options: {引擎名: 额外参数}, 例如 {'edge': {'tabs': 2}, 'searx': {'language': 'en-US'}}, 覆盖 DEFAULT_ENGINE_OPTIONS
+    stats: 传入 dict 时写入 elapsed 和每个引擎的 status(ok/error/timeout)、results、elapsed、error
+    """
+    engine_options = engine_options or {}
+    unknown = [name for name in engines if name not in ENGINES]
+    if unknown:
+        raise ValueError(f"未知的搜索引擎: {', '.join(unknown)}")
+    if stats is None:
+        stats = {}
+    stats['engines'] = {}
+    start = time.perf_counter()
+
+    async def run(name):
+        options = {**DEFAULT_ENGINE_OPTIONS.get(name, {}), **engine_options.get(name, {})}
+        try:
+            return await ENGINES[name](query, top_n=top_n, proxy=proxy, cache=cache, **options)
+        finally:
+            stats['engines'][name]['elapsed'] = time.perf_counter() - start
+
+    tasks = {}
+    for name in dict.fromkeys(engines):
+        stats['engines'][name] = {'status': 'timeout', 'results': 0, 'elapsed': None, 'error': None}
+        tasks[asyncio.create_task(run(name))] = name
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=budget)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+    for task in pending:
+        stats['engines'][tasks[task]]['elapsed'] = time.perf_counter() - start
+    if pending:
+        logging.info(f"聚合搜索超过时间预算 {budget} 秒, 已取消: {', '.join(tasks[task] for task in pending)}")
+
+    result_lists = {}
+    for task, name in tasks.items():
+        if task not in done:
+            continue
+        engine_stats = stats['engines'][name]
+        if task.exception() is not None:
+            engine_stats['status'] = 'error'
+            engine_stats['error'] = str(task.exception())
+            logging.error(f"{name} 搜索失败: {task.exception()}")
+            continue
+        result_lists[name] = task.result()
+        engine_stats['status'] = 'ok'
+        engine_stats['results'] = len(task.result())
+
+    merged = rrf_fuse(result_lists, k, weights, top_n)
+    stats['elapsed'] = time.perf_counter() - start
+    return merged
+
+
+async def federated_search(query, engines=DEFAULT_ENGINES, top_n=10, budget=None, proxy=None, cache=None, k=RRF_K, weights=None,
+                           engine_options=None):
+    """与 baidu_search 等相同的返回格式: (结果文本, 有效链接列表); 所有引擎都失败时返回错误信息和空列表"""
+    stats = {}
+    results = await federated_search_results(query, engines, top_n, budget, proxy, cache, k, weights, engine_options, stats)
+    if not results:
+        errors = [f"{name}: {s['error'] or s['status']}" for name, s in stats['engines'].items() if s['status'] != 'ok']
+        if errors:
+            return f"搜索失败: {'; '.join(errors)}", []
+    return results.to_text(), results.urls
+
+
+async def main():
+    proxy = "http://127.0.0.1:7890"
+    # proxy = None  # 默认无代理
+
+    try:
+        while True:
+            query = input("请输入搜索关键词：")
+            stats = {}
+            results = await federated_search_results(query, proxy=proxy, budget=5, stats=stats)
+            for result in results:
+                print(f"{result.rank}. [{result.score:.4f} {'+'.join(result.sources)}] {result.title}\n   {result.url}")
+            for name, s in stats['engines'].items():
+                elapsed = f"{s['elapsed']:.2f}s" if s['elapsed'] is not None else "-"
+                print(f"{name}: {s['status']} {s['results']} 条 {elapsed}")
+    except KeyboardInterrupt:
+        print("\n检测到强制退出（Ctrl+C），退出程序...")
+    finally:
+        await close_clients()
+        await close_browser_pool()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,779 @@
+"""
+统一的抓取核心, get_html / post_html 都只是在这里拼一个 FetchRequest
+原来两个文件各有一份 SSL 配置、退避、Cloudflare 检测、内容有效性判断和 Playwright 启动代码, 现在只有这一份
+
+    FetchRequest    方法 / URL / 参数 / payload / 请求头 / 代理 / 超时 / 限长 / 渲染配置
+    FetchResponse   状态码 / 响应头 / 最终 URL / 文本 / 来源(httpx, playwright, cache) / 是否截断
+    传输层          HttpxTransport              共享的 httpx 客户端(见 http_client.py)
+                    PlaywrightPageTransport     浏览器打开页面渲染(GET)
+                    PlaywrightRequestTransport  浏览器 context 的 APIRequestContext(POST 等), 与页面共享 cookie
+    中间件          按顺序挂在流程上的对象, 可以实现下面任意几个方法:
+                    before_fetch(request)                             返回 FetchResponse 时直接作为结果(例如缓存命中)
+                    before_send(request, transport)                   每次调用传输层之前(抛出异常则放弃这次抓取)
+                    after_send(request, transport, response, error)   每次调用传输层之后
+                    proxy_changed(request)                            换了代理之后(对冲的备用路径, 或代理池在重试前换掉连不上的代理), 例如换成新代理对应的 cookie
+                    after_fetch(request, response)                    返回最终结果(倒序调用)
+                    内置: ProxyPoolMiddleware / RateLimitMiddleware / SessionMiddleware / StrategyMiddleware / CacheMiddleware / StatsMiddleware
+    重试            RetryPolicy, httpx 阶段的指数退避
+
+流程: before_fetch → httpx(按 httpx_retries 重试, 遇到防护页立即放弃) → 不成功且允许时换浏览器传输层 → after_fetch
+      设置了 hedge 时 httpx 超过截止时间就并行启动备用路径, 先到的有效结果胜出(见 hedging.py); budget 限制整次抓取的时长
+指标(见 metrics.py, 开启后才记录): 区间 fetch / fetch.send{transport}, 直方图 httpx_phase_seconds{phase} / fetch_response_bytes,
+      计数 fetch_total{source} / fetch_retries_total / fetch_challenges_total / fetch_playwright_total{reason} / fetch_cache_hits_total 等
+
+    core = FetchCore(default_middlewares(cache=True))
+    response = await core.fetch(FetchRequest("GET", url))
+"""
+import asyncio
+import copy
+import logging
+import random
+import ssl
+import time
+import httpx
+from browser_pool import get_browser_pool
+from http_client import get_client
+from http_cache import resolve_cache
+from host_limiter import get_host_limiter, CircuitOpenError
+from fetch_strategy import resolve_strategy
+from session_store import resolve_session_store
+from render_profiles import apply_render_profile, render
+from proxy_pool import ProxyPool, pick_proxy, is_proxy_error
+from metrics import get_metrics, span, incr, observe, BYTES_BUCKETS
+
+# 创建并配置 SSL 上下文，忽略证书验证
+ssl_context = ssl.create_default_context()
+ssl_context.check_hostname = False
+ssl_context.verify_mode = ssl.CERT_NONE
+
+# 流式/限长模式下只在前后 DEFAULT_SNIFF_BYTES 字符里查找这些标记
+DEFAULT_SNIFF_BYTES = 64 * 1024
+CHALLENGE_MARKERS = ('cloudflare', 'access denied', 'cf-ray')
+JS_RENDER_MARKERS = ('loading', 'document.write')
+
+# 默认的 httpx 请求头
+DEFAULT_HTTPX_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Accept": "*/*",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+# 调用方没有传 headers 时 Playwright 附加的请求头
+DEFAULT_PLAYWRIGHT_HEADERS = {
+    "Accept": "*/*",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+
+async def wait_with_backoff(attempt, base_delay=0.5, max_delay=5.0):
+    """根据尝试次数进行指数退避等待，并加入随机抖动"""
+    delay = min(base_delay * (2 ** (attempt - 1)), max_delay)
+    jitter = delay * random.uniform(0.1, 0.5)
+    wait_time = delay + jitter
+    logging.info(f"等待 {wait_time:.2f} 秒后重试...")
+    await asyncio.sleep(wait_time)
+
+
+def is_cloudflare_headers(headers):
+    if 'server' in headers and 'cloudflare' in headers['server'].lower():
+        logging.info("检测到 Cloudflare 防护（基于 Server 头）。")
+        return True
+    if 'cf-ray' in headers:
+        logging.info("检测到 Cloudflare 防护（基于 cf-ray 头）。")
+        return True
+    return False
+
+
+def needs_js_render(lowered, raw_text):
+    """页面带脚本且像是加载中/由 JS 生成的骨架"""
+    return '<script' in lowered and (any(marker in lowered for marker in JS_RENDER_MARKERS) or 'app-root' in raw_text)
+
+
+def sniff_window(text, sniff_bytes=DEFAULT_SNIFF_BYTES):
+    """取文本开头和结尾各 sniff_bytes 个字符, 用来代替对整页做 lower()"""
+    if len(text) <= 2 * sniff_bytes:
+        return text
+    return text[:sniff_bytes] + text[-sniff_bytes:]
+
+
+async def read_capped(client, url, headers, timeout, max_bytes, method="GET", data=None, extensions=None):
+    """流式读取响应体, 超过 max_bytes 字节就停止, 返回 (response, text, truncated)"""
+    async with client.stream(method, url, headers=headers, data=data, timeout=timeout, follow_redirects=True, extensions=extensions) as response:
+        chunks = []
+        size = 0
+        truncated = False
+        async for chunk in response.aiter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                truncated = True
+                break
+    body = b"".join(chunks)[:max_bytes]
+    return response, body.decode(response.encoding or "utf-8", errors="replace"), truncated
+
+
+async def is_cloudflare_response(response, content=None):
+    """检测响应是否为 Cloudflare 防护页面
+    content: 已经转成小写的响应文本(或其中一段), 不传时使用 response.text"""
+    # 检查响应头
+    if is_cloudflare_headers(response.headers):
+        return True
+
+    # 检查响应内容
+    if content is None:
+        content = response.text.lower()
+    if any(marker in content for marker in CHALLENGE_MARKERS):
+        logging.info("检测到 Cloudflare 防护（基于内容）。")
+        return True
+
+    return False
+
+
+class FetchRequest:
+    """一次抓取的全部参数; 中间件可以修改 headers / skip_httpx 等字段, 也可以在 state 里放自己的数据"""
+
+    def __init__(self, method, url, params=None, payload=None, headers=None, browser_headers=None, proxy=None, timeout=30,
+                 httpx_retries=2, skip_httpx=False, use_playwright=True, max_bytes=None, sniff_bytes=DEFAULT_SNIFF_BYTES,
+                 render_profile="full", wait_selector=None, hedge=None, hedge_proxy=None, budget=None):
+        self.method = method.upper()
+        self.url = url
+        self.params = params or {}
+        self.payload = payload
+        self.headers = dict(headers) if headers is not None else DEFAULT_HTTPX_HEADERS.copy()
+        self.browser_headers = browser_headers or DEFAULT_PLAYWRIGHT_HEADERS
+        # httpx 和 Playwright 用同一个 UA, Playwright 拿到的 clearance cookie 才能给 httpx 用
+        self.user_agent = self.headers.get("User-Agent", DEFAULT_HTTPX_HEADERS["User-Agent"])
+        # 传入 ProxyPool 时按域名选定一个代理, httpx 和浏览器用同一个(见 proxy_pool.py)
+        self.proxy_pool = proxy if isinstance(proxy, ProxyPool) else None
+        self.proxy = pick_proxy(proxy, url)
+        self.timeout = timeout
+        self.httpx_retries = httpx_retries
+        self.skip_httpx = skip_httpx
+        self.use_playwright = use_playwright
+        self.max_bytes = max_bytes
+        self.sniff_bytes = sniff_bytes
+        self.render_profile = render_profile
+        self.wait_selector = wait_selector
+        self.hedge = hedge                # HedgePolicy: httpx 超过截止时间没有结果就并行启动备用路径(见 hedging.py)
+        self.hedge_proxy = hedge_proxy    # 设置后备用路径为经该代理的 httpx, 否则为浏览器
+        self.budget = budget              # 整次抓取的硬上限(秒), 到点返回 None
+        self.racing = False               # httpx 和备用路径正在并行
+        self.cancelled = set()            # 因对冲输掉而被取消的路径: httpx / httpx_hedge(经 hedge_proxy 的备用 httpx) / playwright
+        self.conditional_headers = {}   # 只加在 httpx 请求上(缓存重新验证)
+        self.cookies = []               # 浏览器传输层打开页面前加到 context 里
+        self.capture_state = False      # 浏览器传输层是否返回 storage_state
+        self.state = {}                 # 中间件自用
+        self.stats = {}                 # 传输层和中间件写入的统计(render: 渲染拦截统计)
+
+    @property
+    def full_url(self):
+        # 参数按原样拼接(不做 URL 编码), 与原来的 get_html 一致
+        if self.params:
+            return f"{self.url}?{'&'.join(f'{k}={v}' for k, v in self.params.items())}"
+        return self.url
+
+    @property
+    def label(self):
+        return "" if self.method == "GET" else f" ({self.method})"
+
+
+class FetchResponse:
+    def __init__(self, status, headers, url, text, source, truncated=False, sniff_bytes=None, storage_state=None):
+        self.status = status
+        self.headers = headers if headers is not None else {}
+        self.url = url
+        self.text = text
+        self.source = source
+        self.truncated = truncated
+        self.storage_state = storage_state
+        self.verdict = None         # httpx 响应的检查结果: ok / not_modified / challenge / invalid / http_error
+        # 防护/有效性检查只看这一段(限长模式下是开头和结尾), 整页只转一次小写
+        self.sample = sniff_window(text, sniff_bytes) if sniff_bytes and truncated else text
+        self._lowered = None
+
+    @property
+    def lowered(self):
+        if self._lowered is None:
+            self._lowered = self.sample.lower()
+        return self._lowered
+
+    @property
+    def ok(self):
+        return self.status is not None and 200 <= self.status < 300
+
+
+def _httpx_tracer():
+    """httpcore 的 trace 回调: 把连接(含 DNS 解析)、TLS、发请求、等响应头、读响应体各阶段的耗时写进直方图 httpx_phase_seconds"""
+    started = {}
+
+    async def trace(event_name, info):
+        scope, _, state = event_name.rpartition(".")
+        phase = scope.split(".", 1)[-1]
+        if state == "started":
+            started[phase] = time.perf_counter()
+        elif state in ("complete", "failed") and phase in started:
+            observe("httpx_phase_seconds", time.perf_counter() - started.pop(phase), phase=phase)
+
+    return trace
+
+
+class HttpxTransport:
+    name = "httpx"
+
+    async def send(self, request):
+        client = get_client(proxy=request.proxy, verify=ssl_context)
+        headers = {**request.headers, **request.conditional_headers} if request.conditional_headers else request.headers
+        data = (request.payload if request.payload else {}) if request.method != "GET" else None
+        extensions = {"trace": _httpx_tracer()} if get_metrics() is not None else None
+        if request.max_bytes:
+            response, text, truncated = await read_capped(client, request.full_url, headers, request.timeout, request.max_bytes, request.method, data,
+                                                          extensions)
+            if truncated:
+                logging.warning(f"响应超过 {request.max_bytes} 字节，只保留前 {request.max_bytes} 字节。")
+        else:
+            response = await client.request(request.method, request.full_url, headers=headers, data=data, timeout=request.timeout, follow_redirects=True,
+                                            extensions=extensions)
+            text = response.text
+            truncated = False
+        return FetchResponse(response.status_code, response.headers, str(response.url), text, "httpx", truncated, request.sniff_bytes)
+
+
+async def _log_request(request):
+    print(f"请求: {request.url}")
+
+
+class PlaywrightPageTransport:
+    """打开页面按渲染配置加载(只用于 GET)"""
+    name = "playwright"
+
+    async def send(self, request):
+        async with get_browser_pool().page(
+            proxy=request.proxy,
+            # 不使用会话时 context 里不能有别的调用方留下的 cookie
+            isolated=not request.capture_state,
+            user_agent=request.user_agent,
+            extra_http_headers=request.browser_headers,
+        ) as page:
+            page.on("request", _log_request)
+            if request.cookies:
+                await page.context.add_cookies(request.cookies)
+            stats = await apply_render_profile(page, request.render_profile)
+
+            print(f"正在访问: {request.full_url} (渲染配置: {request.render_profile})")
+            response = await render(page, request.full_url, request.render_profile, wait_selector=request.wait_selector, timeout=request.timeout)
+            content = await page.content()
+            final_url = page.url
+            print(f"最终 URL: {final_url}")
+
+            if stats.blocked_requests:
+                logging.info(f"渲染共 {stats.requests} 个请求，拦截 {stats.blocked_requests} 个，估算节省 {stats.estimated_bytes_saved / 1024:.0f} KB")
+            request.stats["render"] = stats.to_dict()
+            state = await page.context.storage_state() if request.capture_state and content else None
+            return FetchResponse(response.status if response else None, response.headers if response else None, final_url, content,
+                                 "playwright", storage_state=state)
+
+
+class PlaywrightRequestTransport:
+    """用浏览器 context 的 APIRequestContext 直接发请求(POST 等), 带着浏览器的 cookie 和指纹"""
+    name = "playwright"
+
+    async def send(self, request):
+        async with get_browser_pool().page(
+            proxy=request.proxy,
+            # 不使用会话时 context 里不能有别的调用方留下的 cookie
+            isolated=not request.capture_state,
+            user_agent=request.user_agent,
+            extra_http_headers=request.browser_headers,
+        ) as page:
+            page.on("request", _log_request)
+            if request.cookies:
+                await page.context.add_cookies(request.cookies)
+
+            print(f"正在通过 {request.method} 访问: {request.full_url}")
+            data = (request.payload if request.payload else {}) if request.method != "GET" else None
+            response = await page.request.fetch(request.full_url, method=request.method, data=data, headers=request.browser_headers)
+            text = await response.text()
+            print(f"最终 URL: {response.url}")
+            state = await page.context.storage_state() if request.capture_state and text else None
+            return FetchResponse(response.status, response.headers, response.url, text, "playwright", storage_state=state)
+
+
+class RetryPolicy:
+    """httpx 阶段失败后的等待: 指数退避加随机抖动"""
+
+    def __init__(self, base_delay=0.5, max_delay=5.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    async def wait(self, attempt):
+        await wait_with_backoff(attempt, self.base_delay, self.max_delay)
+
+
+def check_response(request, response, attempt):
+    """判断一次 httpx 响应能不能用, 返回 ok / not_modified / challenge / invalid / http_error"""
+    lowered = response.lowered
+    raw_text = response.text
+    logging.info(f"httpx 收到状态码: {response.status}, 最终 URL: {response.url}")
+
+    # 条件请求命中, 缓存内容仍然有效
+    if response.status == 304 and request.conditional_headers:
+        logging.info("服务器返回 304，使用缓存内容。")
+        return "not_modified"
+
+    # 检测是否为 Cloudflare 防护页面
+    if is_cloudflare_headers(response.headers):
+        return "challenge"
+    if any(marker in lowered for marker in CHALLENGE_MARKERS):
+        logging.info("检测到 Cloudflare 防护（基于内容）。")
+        return "challenge"
+
+    if not response.ok:
+        logging.warning(f"httpx 第 {attempt} 次尝试失败，状态码: {response.status}")
+        return "http_error"
+
+    content_type = response.headers.get('content-type', '').lower()
+    if 'text/html' in content_type:
+        # 截断的页面没有 </html>
+        if raw_text and len(raw_text.strip()) > 150 and '<html' in lowered and ('</html>' in lowered or response.truncated):
+            if needs_js_render(lowered, response.sample):
+                logging.warning(f"httpx 获取了 HTML，但似乎需要 JS 渲染。将尝试 Playwright。")
+                return "invalid"
+            logging.info(f"httpx 在第 {attempt} 次尝试成功获取有效 HTML。")
+            return "ok"
+        logging.warning(f"httpx 获取的 HTML 内容无效、过短或结构不完整。")
+        return "invalid"
+    if 'application/json' in content_type:
+        if raw_text and len(raw_text.strip()) > 2:
+            logging.info(f"httpx 在第 {attempt} 次尝试成功获取有效 JSON。")
+            return "ok"
+        logging.warning(f"httpx 获取的 JSON 内容无效或为空。")
+        return "invalid"
+    if raw_text and len(raw_text.strip()) > 50:
+        logging.info(f"httpx 在第 {attempt} 次尝试成功获取到类型为 {content_type} 的非空内容。")
+        return "ok"
+    logging.warning(f"httpx 获取的内容为空或过短 (类型: {content_type})。")
+    return "invalid"
+
+
+class ProxyPoolMiddleware:
+    """把每次发送的结果记到代理池的健康度上; httpx 因代理失败时下一次重试换一个代理"""
+
+    async def before_send(self, request, transport):
+        request.state["proxy_started", transport.name] = time.perf_counter()
+        request.state["proxy_used", transport.name] = request.proxy
+
+    async def after_send(self, request, transport, response, error):
+        pool = request.proxy_pool
+        if pool is None:
+            return
+        if error is not None:
+            if not is_proxy_error(error):
+                return
+            pool.record(request.proxy, False)
+            if transport.name == "httpx":
+                request.proxy = pool.select(request.url, exclude={request.proxy})
+        elif response.status == 407:
+            pool.record(request.proxy, False)
+        else:
+            pool.record(request.proxy, True, time.perf_counter() - request.state["proxy_started", transport.name])
+
+
+class RateLimitMiddleware:
+    """按主机限速和熔断(见 host_limiter.py); 熔断中的主机直接放弃, 不再启动浏览器"""
+
+    async def before_send(self, request, transport):
+        await get_host_limiter().acquire(request.full_url)
+
+    async def after_send(self, request, transport, response, error):
+        limiter = get_host_limiter()
+        if error is not None:
+            if request.state.get(("proxy_used", transport.name)) is not None and is_proxy_error(error):
+                # 连不上代理不是目标主机的问题, 不计入主机熔断(代理池会记到代理头上)
+                return
+            if transport.name != "httpx" or isinstance(error, httpx.RequestError):
+                limiter.record(request.full_url, error=error)
+        elif response.verdict == "challenge" or isinstance(transport, PlaywrightPageTransport):
+            # 防护页(常见 403/503)不算主机故障; 渲染完成就说明主机可用(防护页的首个响应常是 403/503, 不按状态码记录)
+            limiter.record(request.full_url)
+        else:
+            limiter.record(request.full_url, response.status, response.headers)
+
+
+class SessionMiddleware:
+    """复用浏览器拿到的 cookie(见 session_store.py)"""
+
+    def __init__(self, store):
+        self.store = store
+
+    async def before_fetch(self, request):
+        self._apply(request)
+
+    async def proxy_changed(self, request):
+        # cookie 和出口 IP 绑定, 换了代理就换成新代理的 cookie
+        self._apply(request)
+
+    def _apply(self, request):
+        caller_cookie = request.state.setdefault("caller_cookie", request.headers.get("Cookie"))
+        cookie = self.store.cookie_header(request.url, request.proxy, request.user_agent)
+        if cookie:
+            request.headers["Cookie"] = f"{caller_cookie}; {cookie}" if caller_cookie else cookie
+        elif caller_cookie:
+            request.headers["Cookie"] = caller_cookie
+        else:
+            request.headers.pop("Cookie", None)
+        request.cookies = self.store.cookies(request.url, request.proxy, request.user_agent)
+        request.capture_state = True
+        request.state["has_clearance"] = self.store.has_clearance(request.url, request.proxy, request.user_agent)
+
+    async def after_send(self, request, transport, response, error):
+        if transport.name == "playwright" and response is not None and response.storage_state:
+            self.store.save(request.url, request.proxy, request.user_agent, response.storage_state)
+
+
+class StrategyMiddleware:
+    """按域名的抓取方式记录(见 fetch_strategy.py): httpx 总是失败的域名直接用浏览器"""
+
+    def __init__(self, memory):
+        self.memory = memory
+
+    async def before_fetch(self, request):
+        if not request.use_playwright or request.skip_httpx:
+            return
+        choice = self.memory.choose(request.url)
+        if choice == "playwright" and request.state.get("has_clearance"):
+            logging.info("已保存该域名的 clearance cookie，先尝试 httpx。")
+            choice = None
+        request.state["strategy"] = choice
+        if choice == "playwright":
+            logging.info("策略表显示该域名的 httpx 请求总是失败，直接使用 Playwright。")
+            request.skip_httpx = True
+
+    async def before_send(self, request, transport):
+        now = time.perf_counter()
+        request.state["send_started", transport.name] = now
+        if transport.name == "httpx":
+            # httpx 阶段(含重试)按一次记录, 从第一次发送开始计时
+            request.state.setdefault("httpx_started", now)
+        elif not request.racing:
+            self._record_httpx_failure(request)
+
+    async def after_send(self, request, transport, response, error):
+        if transport.name == "httpx":
+            if response is not None and response.verdict in ("ok", "not_modified"):
+                request.state["httpx_recorded"] = True
+                self.memory.record(request.url, "httpx", True, time.perf_counter() - request.state["httpx_started"])
+            return
+        success = response is not None and bool(response.text)
+        self.memory.record(request.url, "playwright", success, time.perf_counter() - request.state["send_started", transport.name] if success else None)
+
+    async def after_fetch(self, request, response):
+        self._record_httpx_failure(request)
+        return response
+
+    def _record_httpx_failure(self, request):
+        if "httpx_started" in request.state and not request.state.get("httpx_recorded") and "httpx" not in request.cancelled:
+            request.state["httpx_recorded"] = True
+            self.memory.record(request.url, "httpx", False)
+
+
+class CacheMiddleware:
+    """响应缓存(见 http_cache.py): 新鲜的直接返回; 过期的 httpx 条目做条件请求(只限 GET); 过期的 Playwright 条目直接走浏览器
+    只写入确认可用的响应: httpx 的要通过 check_response, Playwright 的要 2xx 且内容里没有防护页标记"""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    async def before_fetch(self, request):
+        # 键里的 Cookie 用调用方自己传的, 不含 SessionMiddleware 加上的会话 cookie(会轮换, 且不代表调用方身份)
+        headers = request.headers
+        if "caller_cookie" in request.state:
+            headers = {**headers, "Cookie": request.state["caller_cookie"]}
+        key = self.cache.make_key(request.method, request.url, request.params, request.payload, headers)
+        cached = self.cache.get(key)
+        request.state["cache_key"] = key
+        request.state["cached"] = cached
+        if cached is None:
+            return None
+        if cached.is_fresh():
+            logging.info(f"命中响应缓存 (来源: {cached.source})。")
+            return FetchResponse(200, None, cached.meta.get("url") or request.url, cached.body, "cache")
+        if cached.source == "playwright" and request.state.get("strategy") != "httpx":
+            logging.info("缓存条目来自 Playwright 且已过期，跳过 httpx。")
+            request.skip_httpx = True
+        elif cached.source == "httpx" and request.method == "GET":
+            request.conditional_headers = cached.conditional_headers()
+        return None
+
+    async def after_fetch(self, request, response):
+        if response is None or response.source == "cache":
+            return response
+        key = request.state["cache_key"]
+        cached = request.state["cached"]
+        if response.status == 304 and request.conditional_headers and cached is not None:
+            self.cache.refresh(key, cached, response.headers)
+            return FetchResponse(200, response.headers, response.url, cached.body, "cache")
+        if not self._cacheable(response):
+            return response
+        self.cache.put(key, response.text, response.headers, source=response.source, method=request.method, url=response.url)
+        return response
+
+    @staticmethod
+    def _cacheable(response):
+        if response.truncated or not response.text:
+            return False
+        if response.source == "httpx":
+            return response.verdict == "ok"
+        # 浏览器结果没有经过 check_response; 没解开的防护页/验证码页不能缓存, 否则过期前每次都拿到它
+        # 不看响应头: 经 Cloudflare CDN 的正常页面也带 cf-ray / server: cloudflare
+        return response.ok and not any(marker in response.lowered for marker in CHALLENGE_MARKERS)
+
+
+class StatsMiddleware:
+    """把每次调用传输层的耗时和结果追加到 stats["sends"]: [{transport, elapsed, status, verdict, error}]"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    async def before_send(self, request, transport):
+        request.state["stats_started", transport.name] = time.perf_counter()
+
+    async def after_send(self, request, transport, response, error):
+        self.stats.setdefault("sends", []).append({
+            "transport": transport.name,
+            "elapsed": time.perf_counter() - request.state.get(("stats_started", transport.name), time.perf_counter()),
+            "status": response.status if response is not None else None,
+            "verdict": response.verdict if response is not None else None,
+            "error": str(error) if error is not None else None,
+        })
+
+
+def default_middlewares(cache=None, strategy=None, session=None, rate_limit=True, hedge=None):
+    """内置中间件栈; 顺序有关系: 会话在策略之前(有 clearance 时不强制走浏览器), 策略在缓存之前"""
+    middlewares = [ProxyPoolMiddleware()]
+    if rate_limit:
+        middlewares.append(RateLimitMiddleware())
+    session = resolve_session_store(session)
+    if session:
+        middlewares.append(SessionMiddleware(session))
+    strategy = resolve_strategy(strategy)
+    if strategy:
+        middlewares.append(StrategyMiddleware(strategy))
+    cache = resolve_cache(cache)
+    if cache:
+        middlewares.append(CacheMiddleware(cache))
+    if hedge:
+        middlewares.append(hedge)
+    return middlewares
+
+
+class FetchCore:
+    def __init__(self, middlewares=(), retry=None, httpx_transport=None, page_transport=None, request_transport=None):
+        self.middlewares = list(middlewares)
+        self.retry = retry or RetryPolicy()
+        self.httpx_transport = httpx_transport or HttpxTransport()
+        self.page_transport = page_transport or PlaywrightPageTransport()
+        self.request_transport = request_transport or PlaywrightRequestTransport()
+
+    def _hooks(self, name, reverse=False):
+        middlewares = reversed(self.middlewares) if reverse else self.middlewares
+        return [getattr(m, name) for m in middlewares if hasattr(m, name)]
+
+    async def _send(self, request, transport):
+        """调用传输层, 前后经过中间件; 传输层的异常在 after_send 之后原样抛出"""
+        for hook in self._hooks("before_send"):
+            await hook(request, transport)
+        proxy = request.proxy
+        try:
+            with span("fetch.send", transport=transport.name, method=request.method):
+                response = await transport.send(request)
+        except Exception as e:
+            for hook in self._hooks("after_send"):
+                await hook(request, transport, None, e)
+            if request.proxy != proxy:
+                # 中间件为重试换了代理(见 ProxyPoolMiddleware), 旧代理的 cookie 不能经新代理发出去
+                await self._proxy_changed(request)
+            raise
+        response.verdict = "ok" if transport.name != "httpx" else None
+        return response
+
+    async def _proxy_changed(self, request):
+        for hook in self._hooks("proxy_changed"):
+            await hook(request)
+
+    async def _after_send(self, request, transport, response):
+        for hook in self._hooks("after_send"):
+            await hook(request, transport, response, None)
+
+    async def fetch(self, request):
+        """返回 FetchResponse, 全部失败时返回 None; 浏览器传输层的异常原样抛出"""
+        with span("fetch", method=request.method) as fetch_span:
+            fetch_span.set(url=request.full_url)
+            response = await self._fetch(request)
+            source = response.source if response is not None else "none"
+            fetch_span.set(source=source)
+            incr("fetch_total", method=request.method, source=source)
+            if source == "cache":
+                incr("fetch_cache_hits_total", method=request.method)
+            if response is not None and response.text and get_metrics() is not None:
+                observe("fetch_response_bytes", len(response.text), BYTES_BUCKETS, source=source)
+        return response
+
+    async def _fetch(self, request):
+        response = None
+        for hook in self._hooks("before_fetch"):
+            response = await hook(request)
+            if response is not None:
+                break
+
+        if response is None:
+            try:
+                if request.budget:
+                    response = await asyncio.wait_for(self._fetch_transports(request), request.budget)
+                else:
+                    response = await self._fetch_transports(request)
+            except CircuitOpenError as e:
+                # 主机一直失败, 不再重试也不启动 Playwright
+                logging.warning(f"跳过请求: {e}")
+                incr("fetch_circuit_open_total")
+                response = None
+            except asyncio.TimeoutError:
+                logging.warning(f"超过 {request.budget} 秒的调用预算，放弃: {request.full_url}")
+                incr("fetch_budget_exceeded_total")
+                response = None
+
+        for hook in self._hooks("after_fetch", reverse=True):
+            response = await hook(request, response)
+        return response
+
+    async def _fetch_transports(self, request):
+        if request.hedge and not request.skip_httpx and (request.use_playwright or request.hedge_proxy):
+            return await self._fetch_hedged(request)
+        response = None
+        if not request.skip_httpx:
+            response = await self._fetch_httpx(request)
+        if response is None:
+            response = await self._fetch_fallback(request)
+        return response
+
+    async def _fetch_fallback(self, request):
+        if request.use_playwright:
+            return await self._fetch_browser(request, "direct" if request.skip_httpx else "fallback")
+        logging.warning("未启用 Playwright 回退，返回 None")
+        return None
+
+    async def _fetch_backup(self, request):
+        """对冲的备用路径: 指定了 hedge_proxy 时经该代理再发一次 httpx, 否则直接用浏览器"""
+        if not request.hedge_proxy:
+            return await self._fetch_browser(request, "hedge")
+        backup = copy.copy(request)
+        backup.proxy = pick_proxy(request.hedge_proxy, request.url, exclude={request.proxy})
+        # 可变字段各自一份, 主请求的会话 cookie 不能经另一个代理发出去
+        backup.headers = dict(request.headers)
+        backup.conditional_headers = dict(request.conditional_headers)
+        backup.state = dict(request.state)
+        await self._proxy_changed(backup)
+        logging.info(f"备用路径: 经 {backup.proxy} 的 httpx")
+        return await self._fetch_httpx(backup)
+
+    async def _fetch_hedged(self, request):
+        """httpx 在截止时间内没有结果就并行启动备用路径, 取先到的有效结果, 取消另一个"""
+        delay = request.hedge.delay(request.full_url)
+        primary = asyncio.ensure_future(self._fetch_httpx(request))
+        tasks = {primary: "httpx"}
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result() or await self._fetch_fallback(request)
+
+            logging.info(f"httpx 在 {delay:.2f} 秒内没有结果，并行启动备用路径。")
+            request.racing = True
+            incr("fetch_hedges_total")
+            backup = asyncio.ensure_future(self._fetch_backup(request))
+            # 备用 httpx 单独标记, 它输了被取消时不能让主请求的 httpx 失败漏记
+            tasks[backup] = "httpx_hedge" if request.hedge_proxy else "playwright"
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        error = error or e
+                        continue
+                    if response is not None and response.text:
+                        logging.info(f"对冲: {tasks[task]} 先拿到有效结果。")
+                        incr("fetch_hedge_wins_total", winner="primary" if task is primary else "backup")
+                        return response
+            if error is not None:
+                raise error
+            return await self._fetch_fallback(request) if request.hedge_proxy else None
+        finally:
+            request.racing = False
+            unfinished = [task for task in tasks if not task.done()]
+            for task in unfinished:
+                request.cancelled.add(tasks[task])
+                task.cancel()
+            if unfinished:
+                # 等取消完成(浏览器页面在这里关闭)
+                await asyncio.gather(*unfinished, return_exceptions=True)
+
+    async def _fetch_httpx(self, request):
+        logging.info(f"方法: httpx{request.label}")
+        transport = self.httpx_transport
+        attempts = request.httpx_retries
+        try:
+            for attempt in range(1, attempts + 1):
+                logging.info(f"httpx 第 {attempt}/{attempts} 次尝试{request.label}...")
+                if attempt > 1:
+                    incr("fetch_retries_total")
+                try:
+                    response = await self._send(request, transport)
+                except CircuitOpenError:
+                    raise
+                except httpx.TimeoutException:
+                    logging.warning(f"httpx 第 {attempt} 次尝试超时 (超过 {request.timeout} 秒)。")
+                    if attempt < attempts: await self.retry.wait(attempt)
+                    continue
+                except httpx.RequestError as e:
+                    logging.error(f"httpx 第 {attempt} 次尝试发生请求错误: {e}")
+                    if attempt < attempts: await self.retry.wait(attempt)
+                    continue
+                except Exception as e:
+                    logging.error(f"httpx 第 {attempt} 次尝试发生未知错误: {e}")
+                    if attempt < attempts: await self.retry.wait(attempt)
+                    continue
+
+                response.verdict = check_response(request, response, attempt)
+                incr("httpx_verdicts_total", verdict=response.verdict)
+                await self._after_send(request, transport, response)
+                if response.verdict in ("ok", "not_modified"):
+                    return response
+                if response.verdict == "challenge":
+                    logging.info("检测到 Cloudflare 防护，切换到 Playwright。")
+                    incr("fetch_challenges_total")
+                    break  # 跳出 httpx 重试循环，直接进入 Playwright
+                if attempt < attempts:
+                    await self.retry.wait(attempt)
+        except CircuitOpenError:
+            raise
+        except Exception as client_init_err:
+            logging.error(f"初始化 httpx 客户端时出错: {client_init_err}")
+
+        logging.warning("httpx 方法未能获取有效 HTML 或内容。将使用 Playwright")
+        return None
+
+    async def _fetch_browser(self, request, reason):
+        """reason: direct(跳过了 httpx) / fallback(httpx 失败后回退) / hedge(对冲)"""
+        logging.info(f"方法: Playwright{request.label}")
+        incr("fetch_playwright_total", method=request.method, reason=reason)
+        transport = self.page_transport if request.method == "GET" else self.request_transport
+        response = await self._send(request, transport)
+        await self._after_send(request, transport, response)
+        return response
@@ -0,0 +1,206 @@
+"""
+按域名记住抓取方式
+Cloudflare / 需要 JS 渲染的站点, get_html 每次都要先花 httpx_retries 次请求加退避才发现 httpx 不行, 再启动 Playwright
+这里按可注册域名(example.com, example.com.cn)记录 httpx 和 Playwright 各自的成功/失败次数和平均耗时,
+下次直接选对的方式:
+- httpx 最近几乎总是失败而 Playwright 能成功: 跳过 httpx 直接渲染(仍有 explore 的概率重新试一下 httpx)
+- httpx 最近稳定成功: 即使缓存条目来自 Playwright 也先试 httpx
+计数按 half_life 指数衰减, 站点换了防护方式后会慢慢忘掉旧结论; 表保存在磁盘上(JSON), 进程之间共享
+
+    html = await get_html(url)                          # 默认使用共享的策略表
+    html = await get_html(url, strategy=False)          # 不查也不记录
+    get_strategy_memory().stats()                       # 查看整张表
+"""
+import atexit
+import json
+import logging
+import os
+import random
+import time
+from urllib.parse import urlsplit
+from atomic_write import write_file_atomic
+
+DEFAULT_STRATEGY_PATH = os.path.join(os.path.expanduser("~"), ".cache", "search4llm", "fetch_strategy.json")
+METHODS = ("httpx", "playwright")
+
+# 常见的二级公共后缀, 例如 example.com.cn 的可注册域名是 example.com.cn 而不是 com.cn
+SECOND_LEVEL_SUFFIXES = frozenset((
+    "com.cn", "net.cn", "org.cn", "gov.cn", "edu.cn", "ac.cn",
+    "com.hk", "com.tw", "org.tw", "edu.tw", "com.sg", "com.au", "net.au", "org.au", "edu.au",
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "co.jp", "ne.jp", "or.jp", "ac.jp", "co.kr", "or.kr",
+    "com.br", "com.mx", "co.in", "co.nz", "co.za", "com.tr", "com.ru",
+))
+
+
+def registrable_domain(url):
+    """取 URL 的可注册域名(近似, 只认识常见的二级公共后缀); IP 和单标签主机原样返回"""
+    try:
+        host = (urlsplit(url).hostname or url).rstrip(".")
+    except ValueError:
+        return url
+    labels = host.split(".")
+    if len(labels) <= 2 or host.replace(".", "").isdigit() or ":" in host:
+        return host
+    if ".".join(labels[-2:]) in SECOND_LEVEL_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+class MethodRecord:
+    """一种抓取方式在某个域名上的衰减计数和平均耗时"""
+
+    def __init__(self, successes=0.0, failures=0.0, avg_seconds=None, updated=None):
+        self.successes = successes
+        self.failures = failures
+        self.avg_seconds = avg_seconds
+        self.updated = updated or time.time()
+
+    def decay(self, half_life, now):
+        factor = 0.5 ** ((now - self.updated) / half_life) if half_life else 1.0
+        self.successes *= factor
+        self.failures *= factor
+        self.updated = now
+
+    @property
+    def samples(self):
+        return self.successes + self.failures
+
+    @property
+    def success_rate(self):
+        return self.successes / self.samples if self.samples else None
+
+    def to_dict(self):
+        return {"successes": self.successes, "failures": self.failures, "avg_seconds": self.avg_seconds, "updated": self.updated}
+
+
+class StrategyMemory:
+    def __init__(self, path=DEFAULT_STRATEGY_PATH, half_life=7 * 86400, min_samples=2.0, explore=0.05,
+                 save_interval=30.0, max_domains=5000):
+        self.path = path
+        self.half_life = half_life
+        self.min_samples = min_samples
+        self.explore = explore
+        self.save_interval = save_interval
+        self.max_domains = max_domains
+        self._domains = {}        # 域名 -> {方式: MethodRecord}
+        self._dirty = False
+        self._saved_at = time.time()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self._domains = {
+                domain: {method: MethodRecord(**record) for method, record in methods.items() if method in METHODS}
+                for domain, methods in data.items()
+            }
+        except (OSError, ValueError, TypeError) as e:
+            logging.warning(f"读取抓取策略表失败，从空表开始: {e}")
+            self._domains = {}
+
+    def save(self):
+        """写回磁盘(原子替换); 没有变化时什么都不做"""
+        if not self._dirty or not self.path:
+            return
+        data = {domain: {method: record.to_dict() for method, record in methods.items()} for domain, methods in self._domains.items()}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            write_file_atomic(self.path, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        except OSError as e:
+            logging.warning(f"写入抓取策略表失败: {e}")
+            return
+        self._dirty = False
+        self._saved_at = time.time()
+
+    def _prune(self):
+        """域名太多时丢掉最久没更新的"""
+        if len(self._domains) <= self.max_domains:
+            return
+        by_age = sorted(self._domains, key=lambda d: max(r.updated for r in self._domains[d].values()))
+        for domain in by_age[:len(self._domains) - self.max_domains]:
+            del self._domains[domain]
+
+    def record(self, url, method, success, elapsed=None):
+        """记录一次抓取结果; method 为 httpx 或 playwright, elapsed 为耗时(秒)"""
+        domain = registrable_domain(url)
+        now = time.time()
+        record = self._domains.setdefault(domain, {}).setdefault(method, MethodRecord(updated=now))
+        record.decay(self.half_life, now)
+        if success:
+            record.successes += 1
+            if elapsed is not None:
+                record.avg_seconds = elapsed if record.avg_seconds is None else 0.7 * record.avg_seconds + 0.3 * elapsed
+        else:
+            record.failures += 1
+        self._dirty = True
+        self._prune()
+        if now - self._saved_at >= self.save_interval:
+            self.save()
+
+    def choose(self, url):
+        """返回 "playwright"(直接渲染)、"httpx"(先试 httpx) 或 None(没有足够记录, 按默认流程)"""
+        methods = self._domains.get(registrable_domain(url))
+        if not methods:
+            return None
+        now = time.time()
+        for record in methods.values():
+            record.decay(self.half_life, now)
+        choice = self._decide(methods)
+        if choice == "playwright" and random.random() < self.explore:
+            return None
+        return choice
+
+    def _decide(self, methods):
+        httpx_record = methods.get("httpx")
+        playwright_record = methods.get("playwright")
+        if httpx_record is None or httpx_record.samples < self.min_samples:
+            return None
+        if httpx_record.success_rate >= 0.5:
+            return "httpx"
+        # 计数会衰减, 一次成功过一阵子就不到 1 了
+        if (playwright_record is not None and playwright_record.successes >= 0.5 and httpx_record.success_rate < 0.2
+                and playwright_record.success_rate > httpx_record.success_rate):
+            return "playwright"
+        return None
+
+    def stats(self):
+        """{域名: {方式: {successes, failures, success_rate, avg_seconds, updated}, "choice": ...}}"""
+        now = time.time()
+        table = {}
+        for domain, methods in self._domains.items():
+            entry = {}
+            for method, record in methods.items():
+                record.decay(self.half_life, now)
+                entry[method] = dict(record.to_dict(), success_rate=record.success_rate)
+            entry["choice"] = self._decide(methods)
+            table[domain] = entry
+        return table
+
+    def forget(self, url=None):
+        if url is None:
+            self._domains.clear()
+        else:
+            self._domains.pop(registrable_domain(url), None)
+        self._dirty = True
+
+
+_default_memory = None
+
+
+def get_strategy_memory():
+    """返回进程内共享的策略表, 进程退出时自动写回磁盘"""
+    global _default_memory
+    if _default_memory is None:
+        _default_memory = StrategyMemory()
+        atexit.register(_default_memory.save)
+    return _default_memory
+
+
+def resolve_strategy(strategy):
+    """strategy 参数: True 使用共享策略表, None/False 不使用, 也可以直接传 StrategyMemory 实例"""
+    if strategy is True:
+        return get_strategy_memory()
+    return strategy or None
@@ -1,200 +1,91 @@
 import asyncio
-import httpx
-from playwright.async_api import async_playwright
+from browser_pool import close_browser_pool
+from http_client import close_clients
+from batch import ConcurrencyLimiter, iter_as_completed
+from fetch_strategy import resolve_strategy
+from session_store import resolve_session_store
+from hedging import resolve_hedge
+from proxy_pool import pick_proxy
+from fetch_core import (FetchCore, FetchRequest, default_middlewares, ssl_context, wait_with_backoff, DEFAULT_SNIFF_BYTES,
+                        CHALLENGE_MARKERS, JS_RENDER_MARKERS, DEFAULT_HTTPX_HEADERS, is_cloudflare_headers, needs_js_render,
+                        sniff_window, read_capped, is_cloudflare_response)
 import logging
-import random
-import ssl
 
 # 配置日志格式
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# 创建并配置 SSL 上下文，忽略证书验证
-ssl_context = ssl.create_default_context()
-ssl_context.check_hostname = False
-ssl_context.verify_mode = ssl.CERT_NONE
-
-async def wait_with_backoff(attempt, base_delay=0.5, max_delay=5.0):
-    """根据尝试次数进行指数退避等待，并加入随机抖动"""
-    delay = min(base_delay * (2 ** (attempt - 1)), max_delay)
-    jitter = delay * random.uniform(0.1, 0.5)
-    wait_time = delay + jitter
-    logging.info(f"等待 {wait_time:.2f} 秒后重试...")
-    await asyncio.sleep(wait_time)
-
-async def is_cloudflare_response(response):
-    """检测响应是否为 Cloudflare 防护页面"""
-    # 检查响应头
-    headers = response.headers
-    if 'server' in headers and 'cloudflare' in headers['server'].lower():
-        logging.info("检测到 Cloudflare 防护（基于 Server 头）。")
-        return True
-    if 'cf-ray' in headers:
-        logging.info("检测到 Cloudflare 防护（基于 cf-ray 头）。")
-        return True
-
-    # 检查响应内容
-    content = response.text.lower()
-    if 'cloudflare' in content or 'access denied' in content or 'cf-ray' in content:
-        logging.info("检测到 Cloudflare 防护（基于内容）。")
-        return True
-
-    return False
-
-async def get_html(url, proxy=None, params={}, headers=None, skip_httpx=False, timeout=30, httpx_retries=2):
-    """获取指定 URL 的 HTML 内容，默认先尝试 httpx，若检测到 Cloudflare 则切换到 Playwright"""
+async def get_html(url, proxy=None, params={}, headers=None, skip_httpx=False, timeout=30, httpx_retries=2, use_playwright=True, cache=None,
+                   render_profile="full", wait_selector=None, render_stats=None, max_bytes=None, sniff_bytes=DEFAULT_SNIFF_BYTES, strategy=True,
+                   session=True, middlewares=None, hedge=None, hedge_proxy=None, budget=None):
+    """获取指定 URL 的 HTML 内容，默认先尝试 httpx，若检测到 Cloudflare 则切换到 Playwright
+    use_playwright=False 时只用 httpx, 失败返回 None
+    cache: True 使用默认响应缓存, 或传入 ResponseCache 实例(见 http_cache.py)
+    render_profile / wait_selector: Playwright 回退的渲染配置(full / balanced / minimal, 见 render_profiles.py)
+    render_stats: 传入一个 dict 时, 走 Playwright 后会写入拦截请求数和估算节省的字节数
+    max_bytes: 设置后 httpx 以流式读取, 最多读 max_bytes 字节(截断的页面不写缓存),
+               防护/有效性检查只看开头和结尾各 sniff_bytes 个字符; 需要边下载边转换请用 html_stream.py
+    strategy: True 使用共享的域名策略表(见 fetch_strategy.py), 记录过 httpx 总是失败的域名直接走 Playwright;
+              False 不使用, 也可以传入 StrategyMemory 实例
+    session: True 使用共享的会话存储(见 session_store.py), Playwright 拿到的 cookie(cf_clearance 等)按域名+代理+UA 保存,
+             之后的 httpx 和 Playwright 请求都带上; False 不使用, 也可以传入 SessionStore 实例
+    middlewares: 追加在内置中间件之后的中间件列表(见 fetch_core.py)
+    hedge: True 使用共享的对冲策略(见 hedging.py), 数字为固定截止时间(秒), 也可以传入 HedgePolicy 实例;
+           httpx 超过截止时间还没有有效结果就并行启动 Playwright(设置了 hedge_proxy 时为经该代理的 httpx), 先到的结果胜出
+    budget: 整次调用最多花多少秒(含重试和渲染), 超时返回 None
+    proxy / hedge_proxy 都可以传入 ProxyPool(见 proxy_pool.py)"""
     logging.info(f"开始尝试获取 URL 的 HTML: {url}")
-    html_code = None
-
-    # 如果有参数，构造带参数的 URL
-    if params:
-        url_with_params = f"{url}?{'&'.join(f'{k}={v}' for k, v in params.items())}"
-    else:
-        url_with_params = url
-        
-    # 默认的 httpx 请求头
-    default_httpx_headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
-        "Accept": "*/*",
-        "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Connection": "keep-alive",
-        "Upgrade-Insecure-Requests": "1",
-    }
 
     # 如果传入了 headers，则合并默认 headers 和自定义 headers，自定义 headers 优先
-    httpx_headers = default_httpx_headers.copy()
+    httpx_headers = DEFAULT_HTTPX_HEADERS.copy()
     if headers:
         httpx_headers.update(headers)
 
-    # 如果 skip_httpx 为 False，先尝试 httpx
-    if not skip_httpx:
-        logging.info("方法: httpx")
+    request = FetchRequest("GET", url, params=params, headers=httpx_headers, browser_headers=headers, proxy=proxy, timeout=timeout,
+                           httpx_retries=httpx_retries, skip_httpx=skip_httpx, use_playwright=use_playwright, max_bytes=max_bytes,
+                           sniff_bytes=sniff_bytes, render_profile=render_profile, wait_selector=wait_selector, hedge=resolve_hedge(hedge),
+                           hedge_proxy=hedge_proxy, budget=budget)
+    core = FetchCore(default_middlewares(cache=cache, strategy=strategy, session=session, hedge=request.hedge) + list(middlewares or ()))
+    response = await core.fetch(request)
+    if render_stats is not None and "render" in request.stats:
+        render_stats.update(request.stats["render"])
+    return response.text if response is not None else None
+
+async def get_html_many(urls, concurrency=8, per_host_limit=2, proxy=None, params={}, headers=None, skip_httpx=False, timeout=30, httpx_retries=2, cache=None, render_profile="full",
+                        strategy=True, session=True):
+    """并发获取多个 URL 的 HTML，按完成顺序异步产出 (url, html)，失败时 html 为 None
+
+    用法: async for url, html in get_html_many(urls): ...
+    httpx 阶段同时受全局并发 concurrency 和单主机并发 per_host_limit 限制;
+    需要 Playwright 的页面会先让出全局名额再渲染(浏览器池自身限制页面数)，不会挡住其它 httpx 页面;
+    策略表里 httpx 总是失败的域名直接渲染(已保存 clearance cookie 的除外)
+    """
+    limiter = ConcurrencyLimiter(concurrency, per_host_limit)
+    strategy = resolve_strategy(strategy)
+    session = resolve_session_store(session)
+    user_agent = (headers or {}).get("User-Agent", DEFAULT_HTTPX_HEADERS["User-Agent"])
+
+    def prefers_playwright(url):
+        if not strategy or strategy.choose(url) != "playwright":
+            return False
+        return not (session and session.has_clearance(url, pick_proxy(proxy, url), user_agent))
+
+    async def fetch(url):
+        html = None
         try:
-            proxies = {"http://": proxy, "https://": proxy} if proxy else None
-            async with httpx.AsyncClient(
-                headers=httpx_headers,
-                follow_redirects=True,
-                timeout=timeout,
-                verify=ssl_context,
-                proxies=proxies
-            ) as client:
-                for attempt in range(1, httpx_retries + 1):
-                    logging.info(f"httpx 第 {attempt}/{httpx_retries} 次尝试...")
-                    try:
-                        response = await client.get(url_with_params)
-                        final_url = str(response.url)
-                        logging.info(f"httpx 收到状态码: {response.status_code}, 最终 URL: {final_url}")
-
-                        # 检测是否为 Cloudflare 防护页面
-                        if await is_cloudflare_response(response):
-                            logging.info("检测到 Cloudflare 防护，切换到 Playwright。")
-                            break  # 跳出 httpx 重试循环，直接进入 Playwright
-
-                        if response.is_success:
-                            try:
-                                content_type = response.headers.get('content-type', '').lower()
-                                is_html = 'text/html' in content_type
-                                is_json = 'application/json' in content_type
-                                raw_text = response.text
-
-                                valid_content = False
-                                if is_html:
-                                    if raw_text and len(raw_text.strip()) > 150 and '<html' in raw_text.lower() and '</html>' in raw_text.lower():
-                                        if '<script' in raw_text.lower() and ('loading' in raw_text.lower() or 'document.write' in raw_text.lower() or 'app-root' in raw_text):
-                                            logging.warning(f"httpx 获取了 HTML，但似乎需要 JS 渲染。将尝试 Playwright。")
-                                        else:
-                                            valid_content = True
-                                            logging.info(f"httpx 在第 {attempt} 次尝试成功获取有效 HTML。")
-                                    else:
-                                        logging.warning(f"httpx 获取的 HTML 内容无效、过短或结构不完整。")
-                                elif is_json:
-                                    if raw_text and len(raw_text.strip()) > 2:
-                                        valid_content = True
-                                        logging.info(f"httpx 在第 {attempt} 次尝试成功获取有效 JSON。")
-                                    else:
-                                        logging.warning(f"httpx 获取的 JSON 内容无效或为空。")
-                                elif raw_text and len(raw_text.strip()) > 50:
-                                    valid_content = True
-                                    logging.info(f"httpx 在第 {attempt} 次尝试成功获取到类型为 {content_type} 的非空内容。")
-                                else:
-                                    logging.warning(f"httpx 获取的内容为空或过短 (类型: {content_type})。")
-
-                                if valid_content:
-                                    html_code = raw_text
-                                else:
-                                    html_code = None
-
-                            except Exception as process_err:
-                                logging.warning(f"httpx 处理响应内容时出错: {process_err}")
-                                html_code = None
-                        else:
-                            logging.warning(f"httpx 第 {attempt} 次尝试失败，状态码: {response.status_code}")
-                            html_code = None
-
-                        if html_code is None and attempt < httpx_retries:
-                            await wait_with_backoff(attempt)
-                        elif html_code is not None:
-                            break
-
-                    except httpx.TimeoutException:
-                        logging.warning(f"httpx 第 {attempt} 次尝试超时 (超过 {timeout} 秒)。")
-                        html_code = None
-                        if attempt < httpx_retries: await wait_with_backoff(attempt)
-                    except httpx.RequestError as e:
-                        logging.error(f"httpx 第 {attempt} 次尝试发生请求错误: {e}")
-                        html_code = None
-                        if attempt < httpx_retries: await wait_with_backoff(attempt)
-                    except Exception as e:
-                        logging.error(f"httpx 第 {attempt} 次尝试发生未知错误: {e}")
-                        html_code = None
-                        if attempt < httpx_retries: await wait_with_backoff(attempt)
-
-                if html_code: return html_code  # 如果 httpx 成功，返回结果
-
-        except Exception as client_init_err:
-            logging.error(f"初始化 httpx 客户端时出错: {client_init_err}")
-
-        logging.warning("httpx 方法未能获取有效 HTML 或内容。将使用 Playwright")
-        html_code = None
-
-    # Playwright 方法（如果 skip_httpx=True 或 httpx 失败/检测到 CF）
-    logging.info("方法: Playwright")
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,
-            args=["--disable-blink-features=AutomationControlled"],
-            proxy={"server": proxy} if proxy else None
-        )
-        default_playwright_headers = {
-            "Accept": "*/*",
-            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Connection": "keep-alive",
-            "Upgrade-Insecure-Requests": "1",
-        }
-        playwright_headers = headers if headers else default_playwright_headers
-        context = await browser.new_context(
-            user_agent=playwright_headers.get("User-Agent", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"),
-            extra_http_headers=playwright_headers,
-            ignore_https_errors=True
-        )
-        page = await context.new_page()
-
-        async def log_request(request):
-            print(f"请求: {request.url}")
-        page.on("request", log_request)
-
-        full_url = url_with_params
-        print(f"正在访问: {full_url}")
-
-        response = await page.goto(full_url, wait_until="networkidle")
-        content = await page.content()
-        final_url = page.url
-        print(f"最终 URL: {final_url}")
-
-        await context.close()
-        await browser.close()
-        return content
+            if not skip_httpx and not prefers_playwright(url):
+                async with limiter.slot(url):
+                    html = await get_html(url, proxy=proxy, params=params, headers=headers, timeout=timeout, httpx_retries=httpx_retries, use_playwright=False, cache=cache,
+                                          strategy=strategy, session=session)
+            if html is None:
+                async with limiter.host_slot(url):
+                    html = await get_html(url, proxy=proxy, params=params, headers=headers, skip_httpx=True, timeout=timeout, cache=cache, render_profile=render_profile,
+                                          strategy=strategy, session=session)
+        except Exception as e:
+            logging.error(f"获取 {url} 失败: {e}")
+        return url, html
+
+    async for result in iter_as_completed(fetch(url) for url in urls):
+        yield result
 
 async def main():
     test_urls = [
@@ -226,8 +117,15 @@ async def main():
         print(f"{'='*30}\n")
         await asyncio.sleep(1)
 
+async def run_main():
+    try:
+        await main()
+    finally:
+        await close_clients()
+        await close_browser_pool()
+
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        asyncio.run(run_main())
     except KeyboardInterrupt:
         print("\n程序被用户中断。")
@@ -0,0 +1,84 @@
+"""
+对冲请求: 不确定页面要不要 JS 渲染时, 顺序的 httpx → Playwright 最坏要 timeout * httpx_retries 再加一次渲染
+开启对冲后, httpx 在"截止时间"内还没拿到有效结果, 就并行启动备用路径(Playwright 渲染, 或经另一个代理的 httpx),
+谁先拿到有效结果用谁, 另一个立即取消; budget 是整次调用的硬上限, 到点返回 None
+
+截止时间按主机取最近 httpx 成功耗时的第 percentile 百分位(样本不足时用 default_delay), 限制在 [min_delay, max_delay]
+这样平时很快的站点几乎不会触发对冲, 慢站点也不会无谓地多开浏览器
+
+    html = await get_html(url, hedge=True, budget=8)            # 共享的对冲策略, 整次调用最多 8 秒
+    html = await get_html(url, hedge=1.5)                        # 固定 1.5 秒后对冲
+    html = await get_html(url, hedge=True, hedge_proxy=proxy2)   # 备用路径为经 proxy2 的 httpx
+"""
+import math
+import time
+from collections import deque
+from batch import host_of
+
+
+class HedgePolicy:
+    """percentile: 截止时间取 httpx 成功耗时的百分位(0~100); delay: 设置后固定使用该截止时间
+    window: 每个主机保留的样本数; min_samples: 样本少于此数时使用 default_delay"""
+
+    def __init__(self, percentile=90, delay=None, default_delay=1.0, min_delay=0.2, max_delay=5.0, window=64, min_samples=5):
+        self.percentile = percentile
+        self.fixed_delay = delay
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}        # 主机 -> deque(耗时)
+
+    def record(self, url, seconds):
+        host = host_of(url)
+        samples = self._samples.get(host)
+        if samples is None:
+            samples = self._samples[host] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def delay(self, url):
+        """httpx 多少秒内没有结果就启动备用路径"""
+        if self.fixed_delay is not None:
+            return self.fixed_delay
+        samples = self._samples.get(host_of(url))
+        if not samples or len(samples) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(samples)
+        index = max(0, math.ceil(self.percentile / 100 * len(ordered)) - 1)
+        return min(max(ordered[index], self.min_delay), self.max_delay)
+
+    def stats(self):
+        """{主机: {"samples": 样本数, "delay": 当前截止时间}}"""
+        return {host: {"samples": len(samples), "delay": self.delay("//" + host)} for host, samples in self._samples.items()}
+
+    # 作为 FetchCore 的中间件: 记录 httpx 拿到有效结果的耗时
+    async def before_send(self, request, transport):
+        if transport.name == "httpx":
+            request.state.setdefault("hedge_started", time.perf_counter())
+
+    async def after_send(self, request, transport, response, error):
+        if transport.name == "httpx" and response is not None and response.verdict == "ok" and not request.max_bytes:
+            self.record(request.full_url, time.perf_counter() - request.state["hedge_started"])
+
+
+_default_policy = None
+
+
+def get_hedge_policy():
+    """返回进程内共享的对冲策略"""
+    global _default_policy
+    if _default_policy is None:
+        _default_policy = HedgePolicy()
+    return _default_policy
+
+
+def resolve_hedge(hedge):
+    """hedge 参数: True 使用共享的对冲策略, 数字为固定截止时间(秒), None/False 不对冲, 也可以直接传 HedgePolicy 实例"""
+    if hedge is True:
+        return get_hedge_policy()
+    if hedge is None or hedge is False:
+        return None
+    if isinstance(hedge, (int, float)):
+        return HedgePolicy(delay=hedge)
+    return hedge
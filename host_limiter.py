@@ -0,0 +1,222 @@
+"""
+按主机的自适应限速与熔断, search_engine / get_html / post_html 共用一份状态
+- 默认不限速(rate=None): 主机第一次返回 429/503(或被 penalize)后才给它套上令牌桶, 从 throttle_rate 次/秒开始,
+  之后再被限流就减半并遵守 Retry-After, 每次成功慢慢加回来(AIMD), 加到 max_rate 后重新解除限速
+- 传入 rate 时每个主机一开始就按 rate 次/秒限速(老的行为, 对礼貌要求高的批量抓取)
+- 连续 failure_threshold 次失败(连接错误、超时、5xx、429)后熔断: recovery_time 秒内对该主机的请求直接抛 CircuitOpenError,
+  之后放行一个探测请求, 成功则恢复, 失败则继续熔断
+
+    limiter = get_host_limiter()
+    await limiter.acquire(url)             # 熔断中抛 CircuitOpenError, 否则按令牌桶等待
+    try:
+        response = await client.get(url)
+    except httpx.RequestError as e:
+        limiter.record(url, error=e)
+        raise
+    limiter.record(url, response.status_code, response.headers)
+
+configure_host_limiter(enabled=False) 可以整体关闭, configure_host_limiter(rate=5) 每个主机固定起步限速
+"""
+import asyncio
+import logging
+import time
+from email.utils import parsedate_to_datetime
+from batch import host_of
+
+THROTTLE_STATUSES = (429, 503)
+
+
+class CircuitOpenError(Exception):
+    """主机处于熔断状态"""
+
+    def __init__(self, host, retry_in):
+        super().__init__(f"{host} 连续失败, 已熔断, {retry_in:.1f} 秒后再试")
+        self.host = host
+        self.retry_in = retry_in
+
+
+def parse_retry_after(value, now=None):
+    """Retry-After 可以是秒数或 HTTP 日期, 返回秒数, 无法解析返回 None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - (now or time.time()))
+    except (TypeError, ValueError):
+        return None
+
+
+class HostState:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0      # Retry-After 要求的最早时间
+        self.failures = 0             # 连续失败次数
+        self.circuit = "closed"       # closed / open / half_open
+        self.opened_at = 0.0
+        self.probe_started = None     # half_open 时探测请求的开始时间
+        self.requests = 0
+        self.throttled = 0
+        self.rejected = 0
+
+    def to_dict(self):
+        return {
+            "rate": round(self.rate, 3) if self.rate is not None else None,
+            "failures": self.failures,
+            "circuit": self.circuit,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "blocked_for": round(max(0.0, self.blocked_until - time.monotonic()), 3),
+        }
+
+
+class HostLimiter:
+    """rate: 每个主机的初始速率(次/秒), None 表示被限流之前不限速; throttle_rate: rate=None 时主机第一次被限流后的速率"""
+
+    def __init__(self, rate=None, burst=5, min_rate=0.2, max_rate=20.0, increase=0.1, decrease=0.5,
+                 failure_threshold=5, recovery_time=30.0, max_retry_after=60.0, throttle_rate=5.0):
+        self.rate = rate
+        self.throttle_rate = throttle_rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.max_retry_after = max_retry_after
+        self._hosts = {}
+
+    def _state(self, url):
+        host = host_of(url)
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(self.rate, self.burst)
+        return host, state
+
+    def _check_circuit(self, host, state, now):
+        if state.circuit == "closed":
+            return
+        if state.circuit == "open":
+            retry_in = state.opened_at + self.recovery_time - now
+            if retry_in > 0:
+                state.rejected += 1
+                raise CircuitOpenError(host, retry_in)
+            state.circuit = "half_open"
+            state.probe_started = None
+        # half_open: 同时只放行一个探测请求(探测请求一直没有结果时, 超过 recovery_time 再放行一个)
+        if state.probe_started is not None and now - state.probe_started < self.recovery_time:
+            state.rejected += 1
+            raise CircuitOpenError(host, state.probe_started + self.recovery_time - now)
+        state.probe_started = now
+        logging.info(f"{host} 熔断恢复期, 放行一个探测请求。")
+
+    async def acquire(self, url):
+        """取一个令牌, 需要时等待; 主机熔断中抛 CircuitOpenError"""
+        host, state = self._state(url)
+        now = time.monotonic()
+        self._check_circuit(host, state, now)
+        # 令牌可以预支成负数, 之后的请求按顺序排队
+        state.requests += 1
+        if state.rate is None:
+            delay = state.blocked_until - now
+        else:
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * state.rate) - 1
+            state.updated = now
+            delay = max(-state.tokens / state.rate, state.blocked_until - now)
+        if delay > 0:
+            if delay > 1:
+                logging.info(f"{host} 限速, 等待 {delay:.2f} 秒。")
+            await asyncio.sleep(delay)
+
+    def record(self, url, status=None, headers=None, error=None):
+        """记录一次请求的结果: status 为 HTTP 状态码, 请求异常时传 error"""
+        host, state = self._state(url)
+        now = time.monotonic()
+        if status in THROTTLE_STATUSES:
+            retry_after = parse_retry_after(headers.get("retry-after") if headers is not None else None)
+            self._throttle(host, state, now, retry_after)
+            logging.warning(f"{host} 返回 {status}, 速率降到 {state.rate:.2f} 次/秒。")
+
+        # 限流状态码对熔断来说也是失败: 半开时的探测请求收到 429 要重新熔断, 不能当成功解除
+        if error is not None or (status is not None and (status >= 500 or status in THROTTLE_STATUSES)):
+            state.failures += 1
+            if state.circuit == "half_open" or (state.circuit == "closed" and state.failures >= self.failure_threshold):
+                state.circuit = "open"
+                state.opened_at = now
+                logging.warning(f"{host} 连续失败 {state.failures} 次, 熔断 {self.recovery_time} 秒。")
+            return
+
+        state.failures = 0
+        if state.circuit != "closed":
+            logging.info(f"{host} 探测请求成功, 解除熔断。")
+            state.circuit = "closed"
+            state.probe_started = None
+        if status not in THROTTLE_STATUSES and state.rate is not None:
+            state.rate = min(self.max_rate, state.rate + self.increase)
+            if self.rate is None and state.rate >= self.max_rate:
+                logging.info(f"{host} 速率已恢复到 {self.max_rate} 次/秒, 解除限速。")
+                state.rate = None
+
+    def penalize(self, url, wait=None):
+        """软限流: 请求成功但结果像是被限制了(例如搜索引擎返回空结果页), 降速并暂停 wait 秒(默认 1/新速率)"""
+        host, state = self._state(url)
+        self._throttle(host, state, time.monotonic(), wait)
+
+    def _throttle(self, host, state, now, wait):
+        state.throttled += 1
+        if state.rate is None:
+            # 第一次被限流, 从这里开始按令牌桶限速
+            state.rate = self.throttle_rate
+            state.tokens = float(self.burst)
+            state.updated = now
+        else:
+            state.rate = max(self.min_rate, state.rate * self.decrease)
+        wait = min(self.max_retry_after, wait if wait is not None else 1 / state.rate)
+        state.blocked_until = max(state.blocked_until, now + wait)
+        logging.info(f"{host} {wait:.1f} 秒内暂停请求。")
+
+    def stats(self):
+        return {host: state.to_dict() for host, state in self._hosts.items()}
+
+    def reset(self, url=None):
+        if url is None:
+            self._hosts.clear()
+        else:
+            self._hosts.pop(host_of(url), None)
+
+
+class _DisabledLimiter:
+    async def acquire(self, url):
+        pass
+
+    def record(self, url, status=None, headers=None, error=None):
+        pass
+
+    def penalize(self, url, wait=None):
+        pass
+
+    def stats(self):
+        return {}
+
+    def reset(self, url=None):
+        pass
+
+
+_limiter = HostLimiter()
+
+
+def get_host_limiter():
+    """返回进程内共享的主机限速器"""
+    return _limiter
+
+
+def configure_host_limiter(enabled=True, **options):
+    """替换共享限速器; options 见 HostLimiter, enabled=False 时不限速也不熔断"""
+    global _limiter
+    _limiter = HostLimiter(**options) if enabled else _DisabledLimiter()
+    return _limiter
@@ -1,84 +1,319 @@
 import asyncio
+import logging
+import os
+import time
+import weakref
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Executor
+from concurrent.futures.process import BrokenProcessPool
 from bs4 import BeautifulSoup
 import html2text
 import re
+from parsers import make_soup
+from metrics import get_metrics, span, incr, observe, BYTES_BUCKETS
+from content_extract import extract_main_content
 
 """
 必要的库:
 pip install beautifulsoup4 html2text
 可选(性能更好):
 pip install lxml
-如果安装了 lxml, 可以将下面 BeautifulSoup(..., 'html.parser') 改为 BeautifulSoup(..., 'lxml')
+安装了 lxml 时自动使用 lxml 建树, 没有则回退到 html.parser (见 parsers.py)
+
+解析和 html2text 转换都是纯 CPU 操作, 在事件循环里直接执行会卡住所有并发的抓取
+html_to_markdown_combined(..., executor="process") 把转换放到进程池(也可以用 "thread" 线程池或传入自定义 Executor),
+每个文档有超时时间(从开始执行算起, 不含排队), 工作进程崩溃或超时时返回错误字符串而不是抛出异常, 也不影响其它文档(见 ConverterPool)
+批量转换用 html_to_markdown_many, 程序退出前调用 shutdown_converters() 关闭进程池
+
+mode="main" 时先做正文提取(见 content_extract.py), 只转换文章主体, 去掉导航栏/页脚/侧边栏等;
+传入 stats 字典可以拿到提取前后的文字量和减少比例
+
+max_chars / max_tokens 限制输出长度: 增量转换, 达到预算就停止, 不会先把整页转完再截断;
+mode="body" 时 BeautifulSoup 预处理也只解析需要的前缀(见 iter_prepared_html), mode="main" 的正文提取仍要解析整页
+按标题分段见 markdown_sections.py
 """
 
-async def html_to_markdown_combined(html_string: str, preprocess: bool = True) -> str:
-    try:
-        processed_html = html_string
-        soup = None
-
-        # 使用 BeautifulSoup 进行可选的预处理
-        if preprocess:
-            print("bs4正在处理中")
-            await asyncio.sleep(0)
-
-            soup = BeautifulSoup(html_string, 'html.parser')
-            # soup = BeautifulSoup(html_string, 'lxml') # 如果安装了 lxml 推荐使用这个
-
-            # 在这里添加你的 BeautifulSoup 预处理逻辑
-            # 示例 1: 移除所有的 <script> 和 <style> 标签
-            count_removed = 0
-            for unwanted_tag in soup(["script", "style"]):
-                unwanted_tag.decompose()
-                count_removed += 1
-            if count_removed > 0:
-                print(f"已移除 {count_removed}个 <script>/<style> 标签")
-
-            # 示例 2: 可以修改特定标签，比如移除所有图片的 'width' 和 'height' 属性 (仅作演示)
-            # for img in soup.find_all('img'):
-            #     if 'width' in img.attrs:
-            #         del img.attrs['width']
-            #     if 'height' in img.attrs:
-            #         del img.attrs['height']
-            #     print("Processed img tag attributes.")
-
-            # 示例 3: 通常只处理 <body> 部分的内容 (如果存在)
-            body_content = soup.body
-            if body_content:
-                print("获取到 <body> 标签")
-                processed_html = str(body_content)
+DEFAULT_CONVERT_TIMEOUT = 60
+# 按需预处理时第一次解析的原始 HTML 长度, 不够再乘以 PREPARE_PREFIX_GROWTH; 大多数页面比它短, 仍然只解析一次
+PREPARE_PREFIX_CHARS = 256 * 1024
+PREPARE_PREFIX_GROWTH = 4
+HTML_SLICE_CHARS = 16384
+
+CONVERT_MODES = ("body", "main")
+
+_pools = {}   # "process" / "thread" -> ConverterPool
+_CJK = re.compile(r'[\u3000-\u30ff\u3400-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数: 中日韩字符按 1 个字 1 个 token, 其余按 4 个字符 1 个 token"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def prepare_html(html_string: str, preprocess: bool = True, mode: str = "body", stats=None) -> str:
+    """BeautifulSoup 预处理: 去掉 script/style, 取 <body> 或提取正文, 返回交给 html2text 的 HTML"""
+    if mode not in CONVERT_MODES:
+        raise ValueError(f"未知的转换模式: {mode}，可选: {', '.join(CONVERT_MODES)}")
+    processed_html = html_string
+
+    # 使用 BeautifulSoup 进行可选的预处理
+    if preprocess or mode == "main":
+        print("bs4正在处理中")
+
+        soup = make_soup(html_string)
+
+        # 在这里添加你的 BeautifulSoup 预处理逻辑
+        # 示例 1: 移除所有的 <script> 和 <style> 标签
+        count_removed = 0
+        for unwanted_tag in soup(["script", "style"]):
+            unwanted_tag.decompose()
+            count_removed += 1
+        if count_removed > 0:
+            print(f"已移除 {count_removed}个 <script>/<style> 标签")
+
+        # 示例 2: 可以修改特定标签，比如移除所有图片的 'width' 和 'height' 属性 (仅作演示)
+        # for img in soup.find_all('img'):
+        #     if 'width' in img.attrs:
+        #         del img.attrs['width']
+        #     if 'height' in img.attrs:
+        #         del img.attrs['height']
+        #     print("Processed img tag attributes.")
+
+        # 示例 3: 通常只处理 <body> 部分的内容 (如果存在)
+        body_content = soup.body
+        if mode == "main":
+            processed_html, extract_stats = extract_main_content(soup)
+            print(f"正文提取: {extract_stats['input_chars']} -> {extract_stats['output_chars']} 字，减少 {extract_stats['reduction']:.0%} (使用 {extract_stats['mode']})")
+            if stats is not None:
+                stats.update(extract_stats)
+        elif body_content:
+            print("获取到 <body> 标签")
+            processed_html = str(body_content)
+        else:
+            # 如果没有 body 标签，尝试处理整个文档结构
+            print("没有 <body> 标签，处理整个文档结构")
+            processed_html = str(soup)
+
+        print("bs4处理完成")
+    return processed_html
+
+
+def iter_prepared_html(html_string, preprocess=True, mode="body", stats=None, slice_chars=HTML_SLICE_CHARS, prefix_chars=PREPARE_PREFIX_CHARS):
+    """按需预处理, 依次产出交给 html2text 的 HTML 片段(拼起来等于 prepare_html 的结果), 调用方提前停止时后面的 HTML 不再解析
+    mode="body" 时先只预处理原始 HTML 的前 prefix_chars 个字符; 调用方还要更多时把前缀放大 PREPARE_PREFIX_GROWTH 倍重新解析,
+    从上次的位置接着产出. 前缀末尾被截断的标签由解析器补全, 所以每个前缀的结果最后 slice_chars 个字符先不产出
+    mode="main" 的正文提取要看整页, 一次解析整页; stats 中 prepare_seconds 累计预处理耗时"""
+    def prepare(html):
+        started = time.perf_counter()
+        processed = prepare_html(html, preprocess, mode, stats)
+        if stats is not None:
+            stats["prepare_seconds"] = stats.get("prepare_seconds", 0.0) + time.perf_counter() - started
+        return processed
+
+    limit = prefix_chars if preprocess and mode == "body" else len(html_string)
+    position = 0
+    previous = None
+    while True:
+        complete = limit >= len(html_string)
+        processed = prepare(html_string if complete else html_string[:limit])
+        if previous is not None and processed[:position] != previous[:position]:
+            logging.warning("按前缀预处理的结果与更长前缀的结果不一致，转换结果在此处可能有出入")
+        stop = len(processed) if complete else len(processed) - slice_chars
+        while position < stop:
+            end = min(position + slice_chars, stop)
+            yield processed[position:end]
+            position = end
+        if complete:
+            return
+        previous = processed
+        limit *= PREPARE_PREFIX_GROWTH
+
+
+def _new_html2text():
+    h = html2text.HTML2Text()
+
+    # 配置 html2text 选项
+    h.body_width = 0
+    h.ignore_links = False
+    h.ignore_images = False
+    h.ignore_emphasis = False
+    h.ignore_tables = False
+    h.mark_code = True
+    return h
+
+
+def _fix_code_marks(markdown_string):
+    # 这是为了处理 html2text 意外输出 [code]...[/code] 的情况
+    markdown_string = re.sub(r'^\s*\[code\]\s*', '```\n', markdown_string, flags=re.IGNORECASE | re.MULTILINE)
+    return re.sub(r'\s*\[/code\]\s*$', '\n```', markdown_string, flags=re.IGNORECASE | re.MULTILINE)
+
+
+# 可以安全切分输出的位置: 含换行的空白段, 前一个字符不是 "]", 后一个字符不是 "[";
+# [code] / [/code] 的正则替换只会吃掉紧挨着标记的空白, 碰不到这样的空白段,
+# 所以分段替换的结果和整篇替换一致
+_SAFE_SPLIT = re.compile(r'(?<=[^\s\]])\s*\n\s*(?=[^\s\[])')
+
+
+class MarkdownStream:
+    """增量 HTML -> Markdown 转换器, 配置与 convert_html_to_markdown 相同(html2text 本身就是增量的 HTMLParser)
+
+    feed() 返回这一段已经可以确定的 Markdown, close() 返回剩余部分;
+    所有返回值拼起来等于 convert_html_to_markdown(html, preprocess=False) 的结果
+    """
+
+    def __init__(self):
+        self._h = _new_html2text()
+        self._h.start = True
+        self._html = ""            # 最后一个 ">" 之后还没喂给 html2text 的 HTML
+        self._buffer = ""          # 已经转出、但还不能确定是否会被后处理正则改动的 Markdown
+        self._started = False      # 是否已经产出过非空内容(用来去掉开头空白)
+        self._gap = ""             # 切分处的空白段, 后面还有内容时才补上(整篇末尾的空白要去掉)
+
+    def _drain(self):
+        # 保留最后一项: html2text 遇到空链接时会把刚输出的 "[" 弹出来
+        out = self._h.outtextlist
+        if len(out) > 1:
+            self._buffer += "".join(out[:-1]).replace("&nbsp_place_holder;", " ")
+            del out[:-1]
+
+    def _emit(self, text):
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._started = True
+        else:
+            text = self._gap + text
+        self._gap = ""
+        return text
+
+    def feed(self, html_chunk):
+        # 只喂到最后一个 ">" 为止: 文本节点被切成两段时 html2text 会在加粗/斜体后面多插一个空格
+        self._html += html_chunk
+        cut = self._html.rfind(">") + 1
+        if not cut:
+            return ""
+        self._h.feed(self._html[:cut])
+        self._html = self._html[cut:]
+        self._drain()
+        last = None
+        for last in _SAFE_SPLIT.finditer(self._buffer):
+            pass
+        if last is None:
+            return ""
+        ready, self._buffer = self._buffer[:last.start()], self._buffer[last.end():]
+        text = self._emit(_fix_code_marks(ready))
+        self._gap = last.group()
+        return text
+
+    def close(self):
+        self._h.feed(self._html)
+        self._html = ""
+        self._h.feed("")
+        rest = _fix_code_marks(self._buffer + self._h.finish()).rstrip()
+        self._buffer = ""
+        return self._emit(rest) if rest else ""
+
+
+def trim_to_budget(markdown_string, max_chars=None, max_tokens=None):
+    """截到预算以内, 尽量在段落边界截断, 并补上未闭合的代码块"""
+    limit = len(markdown_string)
+    if max_chars is not None:
+        limit = min(limit, max_chars)
+    if max_tokens is not None and estimate_tokens(markdown_string[:limit]) > max_tokens:
+        # token 数随长度单调增加, 二分查找最长的前缀
+        low, high = 0, limit
+        while low < high:
+            middle = (low + high + 1) // 2
+            if estimate_tokens(markdown_string[:middle]) <= max_tokens:
+                low = middle
             else:
-                # 如果没有 body 标签，尝试处理整个文档结构
-                print("没有 <body> 标签，处理整个文档结构")
-                processed_html = str(soup)
+                high = middle - 1
+        limit = low
+    if limit >= len(markdown_string):
+        return markdown_string
+    text = markdown_string[:limit]
+    boundary = text.rfind("\n\n")
+    if boundary > limit // 2:
+        text = text[:boundary]
+    text = text.rstrip()
+    if len(re.findall(r'^```', text, flags=re.MULTILINE)) % 2:
+        # 截断在代码块中间; 闭合标记本身占的预算很小, 忽略
+        text += "\n```"
+    return text
 
-            await asyncio.sleep(0)
-            print("bs4处理完成")
 
-        # html2text进行Markdown转换
-        print("正在 html2text 转换")
-        h = html2text.HTML2Text()
+def convert_within_budget(html_slices, max_chars=None, max_tokens=None):
+    """按预算增量转换: html_slices 是依次交给 html2text 的 HTML 片段(见 iter_prepared_html), 输出超过预算就停止, 后面的片段不再取
+    返回 (markdown, truncated)"""
+    stream = MarkdownStream()
+    pieces = []
+    produced_chars = produced_tokens = 0
 
-        # 配置 html2text 选项
-        h.body_width = 0
-        h.ignore_links = False
-        h.ignore_images = False
-        h.ignore_emphasis = False
-        h.ignore_tables = False
-        h.mark_code = True
+    def over_budget():
+        return (max_chars is not None and produced_chars > max_chars) or (max_tokens is not None and produced_tokens > max_tokens)
 
-        await asyncio.sleep(0)
+    truncated = False
+    for html_slice in html_slices:
+        piece = stream.feed(html_slice)
+        pieces.append(piece)
+        produced_chars += len(piece)
+        produced_tokens += estimate_tokens(piece)
+        if over_budget():
+            truncated = True
+            break
+    if not truncated:
+        pieces.append(stream.close())
+    markdown_string = "".join(pieces)
+    trimmed = trim_to_budget(markdown_string, max_chars, max_tokens)
+    return trimmed, truncated or len(trimmed) < len(markdown_string)
+
+
+def convert_html_to_markdown(html_string: str, preprocess: bool = True, mode: str = "body", stats=None,
+                             max_chars=None, max_tokens=None) -> str:
+    """同步转换, 可以在进程池/线程池中执行; 出错时返回以 "Error during conversion" 开头的字符串
+    mode: "body" 转换整个 <body>; "main" 只转换提取出的正文(需要预处理, 会忽略 preprocess=False)
+    stats: 传入字典时写入正文提取的统计信息(见 content_extract.extract_main_content), 以及 prepare_seconds / html2text_seconds 两个阶段的耗时
+    max_chars / max_tokens: 输出预算, 达到预算后停止转换(不是转完再截断), mode="body" 时预处理也只解析需要的前缀;
+    stats 中 truncated 表示是否被截断"""
+    if mode not in CONVERT_MODES:
+        raise ValueError(f"未知的转换模式: {mode}，可选: {', '.join(CONVERT_MODES)}")
+    processed_html = None
+    try:
+        started = time.perf_counter()
+        if max_chars is not None or max_tokens is not None:
+            print("正在按预算增量转换")
+            # 预处理和转换交替进行, 这里的 processed_html 只用来判断出错阶段
+            processed_html = ""
+            budget_stats = stats if stats is not None else {}
+            budget_stats["prepare_seconds"] = 0.0
+            final_markdown, truncated = convert_within_budget(iter_prepared_html(html_string, preprocess, mode, budget_stats), max_chars, max_tokens)
+            if truncated:
+                print(f"已达到预算 (max_chars={max_chars}, max_tokens={max_tokens})，停止转换")
+            if stats is not None:
+                stats["truncated"] = truncated
+                stats["markdown_chars"] = len(final_markdown)
+                stats["html2text_seconds"] = time.perf_counter() - started - stats["prepare_seconds"]
+            return final_markdown
+
+        processed_html = prepare_html(html_string, preprocess, mode, stats)
+        if stats is not None:
+            stats["prepare_seconds"] = time.perf_counter() - started
+            started = time.perf_counter()
+
+        # html2text进行Markdown转换
+        print("正在 html2text 转换")
+        h = _new_html2text()
 
         # 初始转换结果
         markdown_string = h.handle(processed_html)
 
-        await asyncio.sleep(0)
         print("html2text 转换完成")
 
         # 正则表达式后处理步骤 (Workaround)
-        # 这是为了处理 html2text 意外输出 [code]...[/code] 的情况
         print("正在进行正则替换 [code] -> ```")
-        markdown_string = re.sub(r'^\s*\[code\]\s*', '```\n', markdown_string, flags=re.IGNORECASE | re.MULTILINE)
-        markdown_string = re.sub(r'\s*\[/code\]\s*$', '\n```', markdown_string, flags=re.IGNORECASE | re.MULTILINE)
+        markdown_string = _fix_code_marks(markdown_string)
         print("正则替换完成")
 
         # 步骤 4: 可选的进一步清理 (合并多余空行)
@@ -87,16 +322,18 @@ async def html_to_markdown_combined(html_string: str, preprocess: bool = True) -
 
         # 最终去除首尾空白
         final_markdown = markdown_string.strip()
+        if stats is not None:
+            stats["truncated"] = False
+            stats["markdown_chars"] = len(final_markdown)
+            stats["html2text_seconds"] = time.perf_counter() - started
 
         return final_markdown
 
     except Exception as e:
         # 调整错误阶段判断
         stage = "Unknown"
-        if preprocess and soup is None:
-             stage = "Preprocessing (BeautifulSoup Init/Parse)"
-        elif preprocess and 'processed_html' not in locals():
-             stage = "Preprocessing (BeautifulSoup Post Process)"
+        if processed_html is None:
+             stage = "Preprocessing (BeautifulSoup)"
         elif 'markdown_string' not in locals():
              stage = "Conversion (html2text)"
         else:
@@ -107,6 +344,208 @@ async def html_to_markdown_combined(html_string: str, preprocess: bool = True) -
         # traceback.print_exc()
         return f"Error during conversion in {stage}: {e}"
 
+
+def _convert_with_stats(html_string, preprocess, mode, max_chars, max_tokens):
+    """在执行器里运行时 stats 字典传不回来, 改为随结果一起返回"""
+    stats = {}
+    return convert_html_to_markdown(html_string, preprocess, mode, stats, max_chars, max_tokens), stats
+
+
+def _warm_up():
+    """进程池预热: 工作进程启动时导入本模块(bs4 / html2text 等), 这部分耗时不算进文档的超时"""
+    return os.getpid()
+
+
+class ConverterPool:
+    """共享的转换执行器(进程池 / 线程池)
+    - 同时交给执行器的任务不超过 max_workers 个, 其余在这里排队, 所以超时从任务真正开始执行时算起, 不含排队时间
+    - 进程池创建时先启动全部工作进程, 启动耗时也不计入超时
+    - 某个文档超时: 换一个新的执行器接收后续任务, 旧执行器上其它调用方的任务照常完成, 之后终止旧的工作进程(包括卡住的那个)
+    - 执行器崩溃或已被换掉: 受影响的任务在新的执行器上重新提交一次, 不会把别人的任务取消掉"""
+
+    def __init__(self, kind="process", max_workers=None):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"未知的转换执行器: {kind}，可选: process, thread")
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = None
+        self._ready = []
+        self._active = {}                            # 执行器 -> 正在执行的任务数
+        self._retired = set()                        # 已被换掉、等任务结束后终止的执行器
+        self._slots = weakref.WeakKeyDictionary()    # 事件循环 -> asyncio.Semaphore
+        self._closed = False
+        self._start()
+
+    def _start(self):
+        if self.kind == "process":
+            # spawn: 事件循环和 httpx 都带线程, fork 出来的子进程可能继承到被锁住的锁
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            self._ready = [self.executor.submit(_warm_up) for _ in range(self.max_workers)]
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="html2md")
+            self._ready = []
+
+    def _slot(self):
+        loop = asyncio.get_running_loop()
+        slot = self._slots.get(loop)
+        if slot is None:
+            slot = self._slots[loop] = asyncio.Semaphore(self.max_workers)
+        return slot
+
+    def replace(self, executor):
+        """不再向 executor 提交任务, 换一个新的; executor 上的任务全部结束后终止它的工作进程"""
+        if executor is self.executor and not self._closed:
+            self._start()
+        self._retired.add(executor)
+        if not self._active.get(executor):
+            self._terminate(executor)
+
+    def _terminate(self, executor):
+        self._retired.discard(executor)
+        if isinstance(executor, ProcessPoolExecutor):
+            terminate_workers = getattr(executor, "terminate_workers", None)   # Python 3.14+
+            if terminate_workers is not None:
+                terminate_workers()
+                return
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                if process.is_alive():
+                    process.terminate()
+        # 线程没法强行结束, 卡住的线程只能等它自己跑完
+        executor.shutdown(wait=False)
+
+    async def run(self, fn, *args, timeout=None):
+        """在执行器里运行 fn(*args), 超过 timeout 秒抛出 asyncio.TimeoutError, 执行器不可用时抛出 RuntimeError"""
+        loop = asyncio.get_running_loop()
+        async with self._slot():
+            for attempt in range(2):
+                if self._closed:
+                    raise RuntimeError("转换执行器已关闭")
+                executor, ready = self.executor, self._ready
+                self._active[executor] = self._active.get(executor, 0) + 1
+                try:
+                    if ready and not all(f.done() for f in ready):
+                        await asyncio.gather(*(asyncio.wrap_future(f) for f in ready))
+                    future = loop.run_in_executor(executor, fn, *args)
+                    return await asyncio.wait_for(future, timeout)
+                except asyncio.TimeoutError:
+                    # 卡住的工作进程会一直占着名额
+                    self.replace(executor)
+                    raise
+                except RuntimeError as e:
+                    # 包括 BrokenProcessPool(工作进程崩溃)和"执行器已关闭"
+                    if attempt or self._closed:
+                        raise
+                    logging.warning(f"转换执行器不可用 ({e})，在新的执行器上重新提交")
+                    self.replace(executor)
+                finally:
+                    self._active[executor] -= 1
+                    if not self._active[executor] and executor is not self.executor:
+                        del self._active[executor]
+                        if executor in self._retired:
+                            self._terminate(executor)
+
+    def shutdown(self, wait=True):
+        """wait=True 等正在执行的任务完成; wait=False 直接终止工作进程, 未完成的任务返回错误字符串"""
+        self._closed = True
+        for executor in list(self._retired):
+            self._terminate(executor)
+        if wait:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        else:
+            self._terminate(self.executor)
+
+
+def get_converter_pool(kind="process", max_workers=None):
+    """返回共享的 ConverterPool; max_workers 只在首次创建时生效, 默认为 CPU 核数"""
+    pool = _pools.get(kind)
+    if pool is None:
+        pool = _pools[kind] = ConverterPool(kind, max_workers)
+    return pool
+
+
+def get_converter_executor(kind="process", max_workers=None):
+    """返回共享转换池当前使用的执行器"""
+    return get_converter_pool(kind, max_workers).executor
+
+
+def shutdown_converters(wait=True):
+    for pool in list(_pools.values()):
+        pool.shutdown(wait=wait)
+    _pools.clear()
+
+
+async def html_to_markdown_combined(html_string: str, preprocess: bool = True, executor=None, timeout=DEFAULT_CONVERT_TIMEOUT,
+                                    mode: str = "body", stats=None, max_chars=None, max_tokens=None) -> str:
+    """executor 为 None 时在当前事件循环里同步转换(原来的行为);
+    "process" / "thread" 使用共享的进程池/线程池, 也可以传入 concurrent.futures.Executor 实例
+    timeout 只对执行器模式生效, 超时或工作进程崩溃时返回错误字符串
+    mode / stats / max_chars / max_tokens 见 convert_html_to_markdown
+    """
+    if get_metrics() is None:
+        return await _html_to_markdown(html_string, preprocess, executor, timeout, mode, stats, max_chars, max_tokens)
+
+    kind = "inline" if executor is None else executor if isinstance(executor, str) else "custom"
+    stage_stats = stats if stats is not None else {}
+    with span("convert", executor=kind, mode=mode) as convert_span:
+        markdown = await _html_to_markdown(html_string, preprocess, executor, timeout, mode, stage_stats, max_chars, max_tokens)
+        convert_span.set(input_chars=len(html_string), output_chars=len(markdown))
+    observe("convert_input_chars", len(html_string), BYTES_BUCKETS)
+    observe("convert_output_chars", len(markdown), BYTES_BUCKETS)
+    for stage in ("prepare", "html2text"):
+        if f"{stage}_seconds" in stage_stats:
+            observe("convert_stage_seconds", stage_stats[f"{stage}_seconds"], stage=stage)
+    return markdown
+
+
+async def _html_to_markdown(html_string, preprocess, executor, timeout, mode, stats, max_chars, max_tokens):
+    if executor is None:
+        await asyncio.sleep(0)
+        return convert_html_to_markdown(html_string, preprocess, mode, stats, max_chars, max_tokens)
+
+    loop = asyncio.get_running_loop()
+    try:
+        if isinstance(executor, Executor):
+            future = loop.run_in_executor(executor, _convert_with_stats, html_string, preprocess, mode, max_chars, max_tokens)
+            markdown, worker_stats = await asyncio.wait_for(future, timeout)
+        else:
+            markdown, worker_stats = await get_converter_pool(executor).run(
+                _convert_with_stats, html_string, preprocess, mode, max_chars, max_tokens, timeout=timeout)
+        if stats is not None:
+            stats.update(worker_stats)
+        return markdown
+    except asyncio.TimeoutError:
+        logging.warning(f"HTML 转 Markdown 超过 {timeout} 秒未完成，放弃该文档。")
+        incr("convert_failures_total", reason="timeout")
+        return f"Error during conversion in Worker: 超过 {timeout} 秒未完成"
+    except BrokenProcessPool as e:
+        logging.error(f"转换进程崩溃: {e}")
+        incr("convert_failures_total", reason="crashed")
+        return f"Error during conversion in Worker: 工作进程崩溃 {e}"
+    except RuntimeError as e:
+        # 执行器已关闭
+        logging.error(f"转换执行器不可用: {e}")
+        incr("convert_failures_total", reason="unavailable")
+        return f"Error during conversion in Worker: {e}"
+    except asyncio.CancelledError:
+        cancelling = getattr(asyncio.current_task(), "cancelling", None)    # Python 3.11+
+        if cancelling is None or cancelling():
+            # 调用方自己被取消
+            raise
+        # 执行器里的任务被取消(例如 shutdown_converters), 和其它失败一样返回错误字符串
+        logging.error("转换任务被取消")
+        incr("convert_failures_total", reason="cancelled")
+        return "Error during conversion in Worker: 任务被取消"
+
+
+async def html_to_markdown_many(html_list, preprocess: bool = True, executor="process", timeout=DEFAULT_CONVERT_TIMEOUT, mode: str = "body",
+                               max_chars=None, max_tokens=None):
+    """把一批 HTML 分配到多个核心上转换, 返回与输入顺序一致的 Markdown 列表"""
+    return await asyncio.gather(*(
+        html_to_markdown_combined(html, preprocess, executor=executor, timeout=timeout, mode=mode,
+                                   max_chars=max_chars, max_tokens=max_tokens)
+        for html in html_list
+    ))
+
 # 示例用法
 async def main():
     sample_html = """
@@ -0,0 +1,171 @@
+"""
+大页面的流式抓取与转换
+get_html 会把整个响应体读成一个字符串再交给 html2md, 几十 MB 的页面会在内存里出现好几份拷贝
+这里边下载边解码边喂给 html2text (它本身就是增量的 HTMLParser), 转出来的 Markdown 分段产出,
+峰值内存只和分块大小(以及产出的 Markdown)有关, 和页面大小无关
+
+- 最多读取 max_bytes 字节, 超出部分直接丢弃
+- Cloudflare 防护 / 需要 JS 渲染 / 不是 HTML 只根据响应头和开头 sniff_bytes 个字符判断
+- 不经过 BeautifulSoup 预处理(相当于 html_to_markdown_combined(preprocess=False)), html2text 自己会跳过 head/script/style
+
+用法:
+    async for piece in iter_markdown_chunks(url, max_bytes=20 * 1024 * 1024):
+        f.write(piece)
+
+    markdown = await fetch_markdown(url)   # 流式检查不通过时回退到 get_html(Playwright) + html2md
+"""
+import asyncio
+import codecs
+import logging
+from contextlib import aclosing
+import httpx
+from http_client import get_client, close_clients
+from browser_pool import close_browser_pool
+from proxy_pool import use_proxy
+from get_html import get_html
+from fetch_core import ssl_context, DEFAULT_HTTPX_HEADERS, DEFAULT_SNIFF_BYTES, CHALLENGE_MARKERS, is_cloudflare_headers, needs_js_render
+from html2md import html_to_markdown_combined, MarkdownStream
+
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+async def iter_markdown_chunks(url, proxy=None, headers=None, timeout=30, max_bytes=DEFAULT_MAX_BYTES, sniff_bytes=DEFAULT_SNIFF_BYTES,
+                               chunk_size=DEFAULT_CHUNK_SIZE, result=None):
+    """流式抓取 url 并分段产出 Markdown
+
+    result: 传入一个 dict 时写入 status / bytes / truncated / final_url,
+    status 为 ok, challenge(Cloudflare 等防护), needs_js, not_html, invalid, http_error, error;
+    不是 ok 时不会产出任何内容, 调用方可以据此回退到 Playwright
+    """
+    if result is None:
+        result = {}
+    result.update(status=None, bytes=0, truncated=False, final_url=url)
+    request_headers = DEFAULT_HTTPX_HEADERS.copy()
+    if headers:
+        request_headers.update(headers)
+
+    def check(prefix):
+        lowered = prefix.lower()
+        if any(marker in lowered for marker in CHALLENGE_MARKERS):
+            logging.info("检测到 Cloudflare 防护（基于内容开头）。")
+            return "challenge"
+        if len(prefix.strip()) <= 150 or '<html' not in lowered:
+            logging.warning("流式抓取的 HTML 开头无效或过短。")
+            return "invalid"
+        if needs_js_render(lowered, prefix):
+            logging.warning("流式抓取的 HTML 似乎需要 JS 渲染。")
+            return "needs_js"
+        return "ok"
+
+    try:
+        async with use_proxy(proxy, url, timed=False) as chosen, \
+                get_client(proxy=chosen, verify=ssl_context).stream("GET", url, headers=request_headers, timeout=timeout, follow_redirects=True) as response:
+            result["final_url"] = str(response.url)
+            logging.info(f"流式抓取收到状态码: {response.status_code}, 最终 URL: {result['final_url']}")
+            if is_cloudflare_headers(response.headers):
+                result["status"] = "challenge"
+                return
+            if not response.is_success:
+                result["status"] = "http_error"
+                return
+            if 'text/html' not in response.headers.get('content-type', '').lower():
+                result["status"] = "not_html"
+                return
+
+            decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+            converter = MarkdownStream()
+            sniffed = []      # 检查通过之前先攒着开头的文本
+            sniffed_len = 0
+
+            async for chunk in response.aiter_bytes(chunk_size):
+                if result["bytes"] + len(chunk) > max_bytes:
+                    chunk = chunk[:max_bytes - result["bytes"]]
+                    result["truncated"] = True
+                result["bytes"] += len(chunk)
+                text = decoder.decode(chunk)
+
+                if sniffed is not None:
+                    sniffed.append(text)
+                    sniffed_len += len(text)
+                    if sniffed_len < sniff_bytes and not result["truncated"]:
+                        continue
+                    text = "".join(sniffed)
+                    sniffed = None
+                    result["status"] = check(text)
+                    if result["status"] != "ok":
+                        return
+
+                piece = converter.feed(text)
+                if piece:
+                    yield piece
+                if result["truncated"]:
+                    logging.warning(f"响应超过 {max_bytes} 字节，后面的内容被丢弃。")
+                    break
+
+            text = decoder.decode(b"", final=True)
+            if sniffed is not None:
+                # 整页都不到 sniff_bytes
+                text = "".join(sniffed) + text
+                result["status"] = check(text)
+                if result["status"] != "ok":
+                    return
+            piece = converter.feed(text) + converter.close()
+            if piece:
+                yield piece
+    except httpx.TimeoutException:
+        logging.warning(f"流式抓取超时 (超过 {timeout} 秒): {url}")
+        result["status"] = "error"
+    except httpx.RequestError as e:
+        logging.error(f"流式抓取发生请求错误: {e}")
+        result["status"] = "error"
+
+
+async def fetch_markdown(url, proxy=None, headers=None, timeout=30, max_bytes=DEFAULT_MAX_BYTES, sniff_bytes=DEFAULT_SNIFF_BYTES,
+                         use_playwright=True, render_profile="full", executor=None):
+    """流式抓取并转换 url, 返回 Markdown 字符串, 失败返回 None
+    流式检查不通过(防护页/需要 JS/不是 HTML)时回退到 get_html + html_to_markdown_combined"""
+    result = {}
+    pieces = []
+    async with aclosing(iter_markdown_chunks(url, proxy, headers, timeout, max_bytes, sniff_bytes, result=result)) as chunks:
+        async for piece in chunks:
+            pieces.append(piece)
+    if result["status"] == "ok":
+        logging.info(f"流式转换完成: 读取 {result['bytes']} 字节{'(已截断)' if result['truncated'] else ''}")
+        return "".join(pieces)
+
+    logging.info(f"流式抓取未通过检查 ({result['status']})，改用 get_html。")
+    if result["status"] == "not_html":
+        html = await get_html(url, proxy=proxy, headers=headers, timeout=timeout, use_playwright=use_playwright, render_profile=render_profile, max_bytes=max_bytes)
+    elif use_playwright:
+        html = await get_html(url, proxy=proxy, headers=headers, timeout=timeout, skip_httpx=True, render_profile=render_profile)
+    else:
+        return None
+    if not html:
+        return None
+    return await html_to_markdown_combined(html, executor=executor)
+
+
+async def main():
+    url = input("请输入 URL：")
+    total = 0
+    result = {}
+    async with aclosing(iter_markdown_chunks(url, result=result)) as chunks:
+        async for piece in chunks:
+            total += len(piece)
+            print(piece, end="")
+    print(f"\n\n状态: {result['status']}，读取 {result['bytes']} 字节，输出 {total} 字符")
+
+
+async def run_main():
+    try:
+        await main()
+    finally:
+        await close_clients()
+        await close_browser_pool()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_main())
+    except KeyboardInterrupt:
+        print("\n程序被用户中断。")
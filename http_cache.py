@@ -0,0 +1,255 @@
+"""
+get_html / post_html 的可选响应缓存
+- 键: 方法 + URL + 参数 + payload + 调用方的 Cookie / Authorization 请求头的哈希, 不同身份的响应互不命中
+- 磁盘上保存 zlib 压缩的响应体, 内存里保留一层热点缓存
+- 遵守 Cache-Control(no-store / no-cache / max-age) 和 Expires, 过期后用 ETag / Last-Modified 条件请求重新验证
+- 磁盘总大小超过上限时按最近最少使用淘汰
+- 记录条目来自 httpx 还是 Playwright, 命中 Playwright 渲染结果时不再启动浏览器
+
+用法:
+    html = await get_html(url, cache=True)               # 使用默认缓存目录
+    html = await get_html(url, cache=ResponseCache(...))  # 自定义缓存
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+import zlib
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from atomic_write import write_file_atomic
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "search4llm", "http")
+# 带这些请求头的响应因人而异, 计入缓存键
+CREDENTIAL_HEADERS = ("authorization", "cookie")
+
+
+def _parse_cache_control(value):
+    directives = {}
+    for part in (value or "").split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        name, _, arg = part.partition("=")
+        directives[name.strip()] = arg.strip().strip('"')
+    return directives
+
+
+def _http_date(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class CacheEntry:
+    """一条缓存: meta 为元数据字典, body 为响应文本"""
+
+    def __init__(self, meta, body):
+        self.meta = meta
+        self.body = body
+
+    @property
+    def source(self):
+        return self.meta.get("source")
+
+    def is_fresh(self, now=None):
+        return (now or time.time()) < self.meta.get("expires_at", 0)
+
+    def conditional_headers(self):
+        """重新验证用的条件请求头"""
+        headers = {}
+        if self.meta.get("etag"):
+            headers["If-None-Match"] = self.meta["etag"]
+        if self.meta.get("last_modified"):
+            headers["If-Modified-Since"] = self.meta["last_modified"]
+        return headers
+
+
+class ResponseCache:
+    """磁盘 + 内存两级的响应缓存"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=256 * 1024 * 1024, memory_items=128, default_ttl=600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.default_ttl = default_ttl
+        self._memory = OrderedDict()   # key -> CacheEntry
+        self._disk = None              # key -> 文件大小, 按访问时间排序, 首次使用时扫描目录
+        self._disk_bytes = 0
+
+    @staticmethod
+    def make_key(method, url, params=None, payload=None, headers=None):
+        """headers 里只有 Cookie / Authorization 参与计算(不区分大小写), 其他请求头不影响键"""
+        parts = [method.upper(), url]
+        for name, value in sorted((name.lower(), value) for name, value in (headers or {}).items() if value):
+            if name in CREDENTIAL_HEADERS:
+                parts.append(f"{name}: {value}")
+        if params:
+            parts.append(json.dumps(params, sort_keys=True, ensure_ascii=False, default=str))
+        if payload:
+            if isinstance(payload, (bytes, bytearray)):
+                parts.append(hashlib.sha256(payload).hexdigest())
+            else:
+                parts.append(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str))
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".cache")
+
+    def _load_disk_index(self):
+        if self._disk is not None:
+            return
+        files = []
+        if os.path.isdir(self.cache_dir):
+            for root, _, names in os.walk(self.cache_dir):
+                for name in names:
+                    if name.endswith(".cache"):
+                        path = os.path.join(root, name)
+                        try:
+                            stat = os.stat(path)
+                        except OSError:
+                            continue
+                        files.append((stat.st_mtime, name[:-len(".cache")], stat.st_size))
+        files.sort()
+        self._disk = OrderedDict((key, size) for _, key, size in files)
+        self._disk_bytes = sum(self._disk.values())
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """返回 CacheEntry(可能已过期, 由调用方决定是否重新验证), 不存在返回 None"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            return entry
+
+        self._load_disk_index()
+        if key not in self._disk:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                meta = json.loads(f.readline().decode("utf-8"))
+                body = zlib.decompress(f.read()).decode("utf-8")
+            os.utime(path)
+        except (OSError, ValueError, zlib.error) as e:
+            logging.warning(f"读取缓存文件失败，丢弃该条目: {e}")
+            self._drop(key)
+            return None
+        self._disk.move_to_end(key)
+        entry = CacheEntry(meta, body)
+        self._remember(key, entry)
+        return entry
+
+    def _freshness(self, headers, now):
+        """根据响应头计算过期时间; 返回 None 表示不允许缓存"""
+        cache_control = _parse_cache_control(headers.get("cache-control"))
+        if "no-store" in cache_control:
+            return None
+        if "no-cache" in cache_control:
+            return now
+        if "max-age" in cache_control:
+            try:
+                return now + int(cache_control["max-age"])
+            except ValueError:
+                pass
+        expires = _http_date(headers.get("expires"))
+        if expires is not None:
+            date = _http_date(headers.get("date")) or now
+            return now + (expires - date)
+        return now + self.default_ttl
+
+    def put(self, key, body, headers=None, source="httpx", method="GET", url=None):
+        """保存响应; Cache-Control: no-store 的响应不缓存"""
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        now = time.time()
+        expires_at = self._freshness(headers, now)
+        if expires_at is None:
+            logging.info("响应声明 no-store，不写入缓存。")
+            return None
+        meta = {
+            "method": method,
+            "url": url,
+            "source": source,
+            "stored_at": now,
+            "expires_at": expires_at,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "content_type": headers.get("content-type"),
+        }
+        entry = CacheEntry(meta, body)
+        self._remember(key, entry)
+        self._write(key, entry)
+        return entry
+
+    def refresh(self, key, entry, headers=None):
+        """304 重新验证成功后刷新过期时间和校验器"""
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        now = time.time()
+        expires_at = self._freshness(headers, now)
+        entry.meta["expires_at"] = expires_at if expires_at is not None else now
+        entry.meta["etag"] = headers.get("etag") or entry.meta.get("etag")
+        entry.meta["last_modified"] = headers.get("last-modified") or entry.meta.get("last_modified")
+        self._remember(key, entry)
+        self._write(key, entry)
+        return entry
+
+    def _write(self, key, entry):
+        self._load_disk_index()
+        path = self._path(key)
+        data = json.dumps(entry.meta, ensure_ascii=False).encode("utf-8") + b"\n" + zlib.compress(entry.body.encode("utf-8"))
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_file_atomic(path, data)
+        except OSError as e:
+            logging.warning(f"写入缓存文件失败: {e}")
+            return
+        self._disk_bytes += len(data) - self._disk.pop(key, 0)
+        self._disk[key] = len(data)
+        self._evict()
+
+    def _drop(self, key):
+        self._memory.pop(key, None)
+        size = self._disk.pop(key, None) if self._disk is not None else None
+        if size is not None:
+            self._disk_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._disk_bytes > self.max_bytes and len(self._disk) > 1:
+            key = next(iter(self._disk))
+            logging.debug(f"缓存超过 {self.max_bytes} 字节，淘汰 {key}")
+            self._drop(key)
+
+    def clear(self):
+        self._load_disk_index()
+        for key in list(self._disk):
+            self._drop(key)
+        self._memory.clear()
+
+
+_default_cache = None
+
+
+def get_response_cache():
+    """返回进程内共享的默认响应缓存"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+    return _default_cache
+
+
+def resolve_cache(cache):
+    """cache 参数: None/False 不使用缓存, True 使用默认缓存, 也可以直接传 ResponseCache 实例"""
+    if cache is True:
+        return get_response_cache()
+    return cache or None
@@ -0,0 +1,157 @@
+"""
+共享的 httpx.AsyncClient 注册表
+search_engine / get_html / post_html 的所有 httpx 请求都从这里取客户端,
+同一 (代理, 证书校验) 组合共用一个连接池, 重复访问同一主机时复用 TCP/TLS 连接
+
+用法:
+    client = get_client(proxy=proxy, verify=ssl_context)
+    response = await client.get(url, headers=headers, timeout=timeout, follow_redirects=True)
+    ...
+    await close_clients()  # 程序退出前调用
+
+cookie 不保存在共享客户端上(否则一个站点/调用方的 Set-Cookie 会带到所有后续请求里):
+每次 send(含跳转)各用一个临时 cookie jar; 需要在几个请求之间保留 cookie 时用 cookie_scope,
+跨进程、跨调用的持久会话交给 session_store.py
+
+    jar = CookieJar()
+    with cookie_scope(jar):
+        await client.get(login_url)
+        await client.get(page_url)      # 带上 login_url 设置的 cookie
+
+可选: pip install h2  安装后自动启用 HTTP/2
+"""
+import asyncio
+import contextvars
+import importlib.util
+import logging
+import weakref
+from contextlib import contextmanager
+from http.cookiejar import CookieJar
+import httpx
+
+# 连接池参数, 可通过 configure_clients() 调整
+_settings = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 30.0,
+    "http2": importlib.util.find_spec("h2") is not None,
+}
+
+# 事件循环 -> {键: AsyncClient}; 客户端的连接池绑定在事件循环上, 因此按循环分开
+_clients = weakref.WeakKeyDictionary()
+
+
+def configure_clients(max_connections=None, max_keepalive_connections=None, keepalive_expiry=None, http2=None):
+    """调整之后新建客户端的连接上限/保活时间/HTTP2 开关"""
+    if max_connections is not None:
+        _settings["max_connections"] = max_connections
+    if max_keepalive_connections is not None:
+        _settings["max_keepalive_connections"] = max_keepalive_connections
+    if keepalive_expiry is not None:
+        _settings["keepalive_expiry"] = keepalive_expiry
+    if http2 is not None:
+        if http2 and importlib.util.find_spec("h2") is None:
+            logging.warning("未安装 h2, 无法启用 HTTP/2 (pip install h2)。")
+            http2 = False
+        _settings["http2"] = http2
+
+
+_cookie_scope = contextvars.ContextVar("search4llm_cookie_scope", default=None)
+
+
+@contextmanager
+def cookie_scope(jar=None):
+    """with 块内经共享客户端发出的请求读写同一个 cookie jar(不传则新建), 返回该 jar"""
+    jar = CookieJar() if jar is None else jar
+    token = _cookie_scope.set(jar)
+    try:
+        yield jar
+    finally:
+        _cookie_scope.reset(token)
+
+
+class _ScopedCookieJar(CookieJar):
+    """共享客户端的 cookie jar: 自己不存 cookie, 读写都转给当前 cookie_scope 的 jar, 没有 scope 时丢弃"""
+
+    def add_cookie_header(self, request):
+        jar = _cookie_scope.get()
+        if jar is not None:
+            jar.add_cookie_header(request)
+
+    def extract_cookies(self, response, request):
+        jar = _cookie_scope.get()
+        if jar is not None:
+            jar.extract_cookies(response, request)
+
+    def set_cookie(self, cookie):
+        jar = _cookie_scope.get()
+        if jar is not None:
+            jar.set_cookie(cookie)
+
+    def set_cookie_if_ok(self, cookie, request):
+        jar = _cookie_scope.get()
+        if jar is not None:
+            jar.set_cookie_if_ok(cookie, request)
+
+    def clear(self, domain=None, path=None, name=None):
+        jar = _cookie_scope.get()
+        if jar is not None:
+            jar.clear(domain, path, name)
+
+    def __iter__(self):
+        jar = _cookie_scope.get()
+        return iter(jar) if jar is not None else iter(())
+
+    def __len__(self):
+        jar = _cookie_scope.get()
+        return len(jar) if jar is not None else 0
+
+
+class SharedAsyncClient(httpx.AsyncClient):
+    """共享客户端: 没有外层 cookie_scope 时, 每次 send 用一个新的 cookie jar, 跳转链内的 cookie 照常生效"""
+
+    async def send(self, request, **kwargs):
+        if _cookie_scope.get() is not None:
+            return await super().send(request, **kwargs)
+        with cookie_scope():
+            return await super().send(request, **kwargs)
+
+
+def _verify_key(verify):
+    # SSLContext 不可哈希比较内容, 按对象身份区分
+    return verify if isinstance(verify, (bool, str)) else id(verify)
+
+
+def get_client(proxy=None, verify=True):
+    """返回当前事件循环中 (proxy, verify) 对应的共享客户端, 不存在则创建"""
+    loop = asyncio.get_running_loop()
+    clients = _clients.setdefault(loop, {})
+    key = (proxy, _verify_key(verify))
+    client = clients.get(key)
+    if client is None or client.is_closed:
+        proxies = {"http://": proxy, "https://": proxy} if proxy else None
+        client = SharedAsyncClient(
+            proxies=proxies,
+            verify=verify,
+            cookies=_ScopedCookieJar(),
+            http2=_settings["http2"],
+            limits=httpx.Limits(
+                max_connections=_settings["max_connections"],
+                max_keepalive_connections=_settings["max_keepalive_connections"],
+                keepalive_expiry=_settings["keepalive_expiry"],
+            ),
+        )
+        clients[key] = client
+        logging.debug(f"新建共享 httpx 客户端 (代理: {proxy}, HTTP/2: {_settings['http2']})")
+    return client
+
+
+async def close_clients():
+    """关闭当前事件循环中的所有共享客户端"""
+    loop = asyncio.get_running_loop()
+    clients = _clients.pop(loop, {})
+    for client in clients.values():
+        try:
+            await client.aclose()
+        except Exception as e:
+            logging.debug(f"关闭 httpx 客户端时出错(忽略): {e}")
@@ -0,0 +1,161 @@
+"""
+按标题把 Markdown 切成小节, 给 LLM 按需读取
+每个小节是 dict:
+    index    序号(从 0 开始)
+    heading  标题文字(第一个标题之前的内容为 None)
+    level    标题级别 1-6(没有标题为 0)
+    path     从最外层到本节的标题列表, 例如 ["安装", "Linux"]
+    part     小节过长被拆开时的分片序号(从 0 开始)
+    start / end  在完整 Markdown 中的字符偏移, text == markdown[start:end]
+    tokens   估算的 token 数(见 html2md.estimate_tokens)
+    text     小节内容
+
+代码块里的 # 不算标题; 超过 max_tokens / max_chars 的小节在段落边界处拆开(单个段落过长时直接按长度切)
+
+    sections = split_markdown_sections(markdown, max_tokens=800)
+    for section in iter_html_sections(html, max_tokens=800):   # 边转换边分段, 停止迭代后剩下的 HTML 不再转换
+        ...
+"""
+import re
+from html2md import MarkdownStream, iter_prepared_html, estimate_tokens
+
+HEADING = re.compile(r'^(#{1,6})[ \t]+(.+?)[ \t]*#*[ \t]*$')
+FENCE = re.compile(r'^\s*```')
+
+
+def _fits(text, max_chars, max_tokens):
+    return (max_chars is None or len(text) <= max_chars) and (max_tokens is None or estimate_tokens(text) <= max_tokens)
+
+
+def _split_long(text, max_chars, max_tokens):
+    """把过长的小节按段落拆成若干片, 返回各片在 text 中的 (start, end)"""
+    if _fits(text, max_chars, max_tokens):
+        return [(0, len(text))]
+    # 段落边界: 不在代码块里的空行
+    boundaries = []
+    in_fence = False
+    position = 0
+    for line in text.splitlines(keepends=True):
+        if FENCE.match(line):
+            in_fence = not in_fence
+        elif not in_fence and not line.strip() and position:
+            boundaries.append(position + len(line))
+        position += len(line)
+    boundaries.append(len(text))
+
+    spans = []
+    start = 0
+    end = None         # 从 start 开始、还在预算内的最远段落边界
+    for boundary in boundaries:
+        if _fits(text[start:boundary], max_chars, max_tokens):
+            end = boundary
+            continue
+        if end is not None:
+            spans.append((start, end))
+            start = end
+        # 单个段落就超过预算, 直接按长度切
+        while not _fits(text[start:boundary], max_chars, max_tokens):
+            cut = _longest_prefix(text, start, boundary, max_chars, max_tokens)
+            spans.append((start, cut))
+            start = cut
+        end = boundary if boundary > start else None
+    if end is not None:
+        spans.append((start, end))
+    return spans
+
+
+def _longest_prefix(text, start, stop, max_chars, max_tokens):
+    """text[start:stop] 中满足预算的最长前缀的结束位置(至少 1 个字符)"""
+    low, high = start + 1, stop
+    while low < high:
+        middle = (low + high + 1) // 2
+        if _fits(text[start:middle], max_chars, max_tokens):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def iter_sections(pieces, max_tokens=None, max_chars=None):
+    """从依次到达的 Markdown 片段中逐个产出小节; 一个小节在下一个标题出现(或输入结束)时产出"""
+    buffer = ""        # 当前小节开始之后收到的文本
+    base = 0           # buffer 在完整 Markdown 中的起始偏移
+    scanned = 0        # buffer 中已经逐行检查过的位置
+    in_fence = False
+    heading, level, path = None, 0, []
+    stack = []         # [(level, heading)]
+    index = 0
+
+    def emit(end):
+        nonlocal index
+        text = buffer[:end]
+        if not text.strip():
+            return
+        for part, (start, stop) in enumerate(_split_long(text, max_chars, max_tokens)):
+            chunk = text[start:stop]
+            yield {
+                "index": index,
+                "heading": heading,
+                "level": level,
+                "path": list(path),
+                "part": part,
+                "start": base + start,
+                "end": base + stop,
+                "tokens": estimate_tokens(chunk),
+                "text": chunk,
+            }
+            index += 1
+
+    def scan(final):
+        nonlocal buffer, base, scanned, in_fence, heading, level, path
+        while True:
+            newline = buffer.find("\n", scanned)
+            if newline < 0:
+                if not final or scanned >= len(buffer):
+                    return
+                newline = len(buffer)
+            line = buffer[scanned:newline]
+            line_start = scanned
+            scanned = newline + 1
+            if FENCE.match(line):
+                in_fence = not in_fence
+                continue
+            match = None if in_fence else HEADING.match(line)
+            if not match:
+                continue
+            yield from emit(line_start)
+            buffer = buffer[line_start:]
+            base += line_start
+            scanned -= line_start
+            level = len(match.group(1))
+            heading = match.group(2).strip()
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            stack.append((level, heading))
+            path = [h for _, h in stack]
+
+    for piece in pieces:
+        if not piece:
+            continue
+        buffer += piece
+        yield from scan(False)
+    yield from scan(True)
+    yield from emit(len(buffer))
+
+
+def split_markdown_sections(markdown, max_tokens=None, max_chars=None):
+    """把完整的 Markdown 切成小节列表"""
+    return list(iter_sections([markdown], max_tokens, max_chars))
+
+
+def iter_html_sections(html_string, preprocess=True, mode="body", max_tokens=None, max_chars=None):
+    """边转换边按标题分段; 调用方停止迭代后剩下的 HTML 不会再转换, mode="body" 时也不会再解析(见 html2md.iter_prepared_html)
+    offsets 对应完整转换结果(convert_html_to_markdown 在同样的 preprocess/mode 下的输出)"""
+    stream = MarkdownStream()
+
+    def pieces():
+        for html_slice in iter_prepared_html(html_string, preprocess, mode):
+            yield stream.feed(html_slice)
+        yield stream.close()
+
+    yield from iter_sections(pieces(), max_tokens, max_chars)
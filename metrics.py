@@ -0,0 +1,379 @@
+"""
+结构化指标与追踪: 抓取 / 搜索 / 转换各阶段的耗时、计数、字节数
+默认关闭, 关闭时 span() 返回同一个空对象, incr() / observe() 只做一次 None 判断, 对热路径几乎没有开销
+
+- span(name, **labels): 计时区间, 可嵌套(按 contextvars 记录父子关系, 同一次调用的区间共享 trace_id),
+  结束时写入直方图 {name}_seconds, 抛出异常时计数 {name}_errors_total, 再交给导出器
+  labels 会成为指标的标签, 只放取值有限的东西(引擎、传输层、方法); URL 之类用 span.set(url=...) 只写进追踪记录
+- incr(name, value=1, **labels): 计数器
+- observe(name, value, buckets=None, **labels): 直方图(默认桶按秒, 字节数请用 BYTES_BUCKETS)
+- 导出器: InMemoryExporter(保存在内存里, 测试/调试用)、JsonLinesExporter(每个区间一行 JSON)、
+  PrometheusExporter(flush 时把全部指标按 Prometheus 文本格式写到文件, 配合 node_exporter 的 textfile collector)
+
+    configure_metrics(exporters=[JsonLinesExporter("trace.jsonl"), PrometheusExporter("search4llm.prom")])
+    html = await get_html(url)
+    print(get_metrics().to_prometheus())
+    get_metrics().flush()          # 进程退出时也会自动 flush
+
+    with span("my_stage", engine="baidu") as s:
+        ...
+        s.set(bytes=len(html))
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from atomic_write import write_file_atomic
+
+PREFIX = "search4llm_"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+_current_span = contextvars.ContextVar("search4llm_current_span", default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self):
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """按桶估算分位数(取所在桶的上界), 没有样本返回 None"""
+        if not self.count:
+            return None
+        target = q * self.count
+        for bound, total in self.cumulative():
+            if total >= target:
+                return bound
+        return float("inf")
+
+
+class Span:
+    """一个计时区间; 用 with / async with, 或者手动 start() / finish()"""
+
+    __slots__ = ("metrics", "name", "labels", "attrs", "trace_id", "span_id", "parent_id", "started_at", "duration", "error",
+                 "_start", "_token")
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.attrs = {}
+        self.trace_id = self.span_id = self.parent_id = None
+        self.started_at = self.duration = self.error = None
+        self._start = self._token = None
+
+    def set(self, **attrs):
+        """附加只写进追踪记录的属性"""
+        self.attrs.update(attrs)
+        return self
+
+    def start(self):
+        parent = _current_span.get()
+        self.span_id = f"{random.getrandbits(64):016x}"
+        if parent is not None:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+        else:
+            self.trace_id = f"{random.getrandbits(128):032x}"
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def finish(self, error=None):
+        self.duration = time.perf_counter() - self._start
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        if self._token is not None:
+            try:
+                _current_span.reset(self._token)
+            except ValueError:
+                # 在别的上下文里结束(例如跨任务), 不影响当前上下文
+                pass
+            self._token = None
+        self.metrics._finish(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(exc)
+        return False
+
+    async def __aenter__(self):
+        return self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.finish(exc)
+        return False
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.started_at,
+            "duration": self.duration,
+            "labels": self.labels,
+            "attrs": self.attrs,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """指标关闭时 span() 返回的对象, 所有操作都不做事"""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        return self
+
+    def start(self):
+        return self
+
+    def finish(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Metrics:
+    def __init__(self, exporters=(), buckets=DEFAULT_BUCKETS):
+        self.exporters = list(exporters)
+        self.buckets = tuple(buckets)
+        self._counters = {}       # (名称, 标签) -> 数值
+        self._histograms = {}     # (名称, 标签) -> Histogram
+
+    def span(self, name, **labels):
+        return Span(self, name, labels)
+
+    def incr(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=None, **labels):
+        key = (name, _label_key(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram(buckets or self.buckets)
+        histogram.observe(value)
+
+    def _finish(self, span):
+        self.observe(f"{span.name}_seconds", span.duration, **span.labels)
+        if span.error is not None:
+            self.incr(f"{span.name}_errors_total", **span.labels)
+        if self.exporters:
+            record = span.to_dict()
+            for exporter in self.exporters:
+                try:
+                    exporter.export_span(record)
+                except Exception as e:
+                    logging.warning(f"导出追踪记录失败 ({type(exporter).__name__}): {e}")
+
+    def counter(self, name, **labels):
+        """读取计数器的值(没有记录过返回 0)"""
+        return self._counters.get((name, _label_key(labels)), 0)
+
+    def histogram(self, name, **labels):
+        """读取直方图, 没有记录过返回 None"""
+        return self._histograms.get((name, _label_key(labels)))
+
+    def snapshot(self):
+        """{"counters": [{name, labels, value}], "histograms": [{name, labels, count, sum, p50, p95, buckets}]}"""
+        return {
+            "counters": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in sorted(self._counters.items())],
+            "histograms": [
+                {"name": name, "labels": dict(labels), "count": h.count, "sum": h.sum, "p50": h.quantile(0.5), "p95": h.quantile(0.95),
+                 "buckets": h.cumulative()}
+                for (name, labels), h in sorted(self._histograms.items())
+            ],
+        }
+
+    def to_prometheus(self):
+        """Prometheus 文本格式(0.0.4)"""
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(self._counters.items()):
+            metric = _metric_name(name)
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        for (name, labels), h in sorted(self._histograms.items()):
+            metric = _metric_name(name)
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            for bound, total in h.cumulative():
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', _format_number(bound)),))} {total}")
+            lines.append(f"{metric}_bucket{_format_labels(labels + (('le', '+Inf'),))} {h.count}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {h.sum}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        for exporter in self.exporters:
+            try:
+                exporter.flush(self)
+            except Exception as e:
+                logging.warning(f"导出指标失败 ({type(exporter).__name__}): {e}")
+
+    def reset(self):
+        self._counters.clear()
+        self._histograms.clear()
+
+
+def _metric_name(name):
+    return PREFIX + "".join(c if c.isalnum() or c == "_" else "_" for c in name)
+
+
+def _format_number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{k}="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+class InMemoryExporter:
+    """把追踪记录保存在内存里(最多 max_spans 条)"""
+
+    def __init__(self, max_spans=10000):
+        self._spans = deque(maxlen=max_spans)
+
+    def export_span(self, record):
+        self._spans.append(record)
+
+    def flush(self, metrics):
+        pass
+
+    def spans(self, name=None):
+        return [s for s in self._spans if name is None or s["name"] == name]
+
+    def clear(self):
+        self._spans.clear()
+
+
+class JsonLinesExporter:
+    """每个区间一行 JSON 追加到 path; 攒够 buffer_size 条或 flush 时写盘"""
+
+    def __init__(self, path, buffer_size=100):
+        self.path = path
+        self.buffer_size = buffer_size
+        self._buffer = []
+
+    def export_span(self, record):
+        self._buffer.append(json.dumps(record, ensure_ascii=False))
+        if len(self._buffer) >= self.buffer_size:
+            self._write()
+
+    def _write(self):
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def flush(self, metrics):
+        self._write()
+
+
+class PrometheusExporter:
+    """flush 时把全部指标写到 path(原子替换), 不处理单个区间"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def export_span(self, record):
+        pass
+
+    def flush(self, metrics):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        write_file_atomic(self.path, metrics.to_prometheus().encode("utf-8"))
+
+
+_metrics = None
+_atexit_registered = False
+
+
+def get_metrics():
+    """返回当前的指标对象, 没有开启时返回 None"""
+    return _metrics
+
+
+def configure_metrics(enabled=True, exporters=(), **options):
+    """开启(替换)或关闭指标; options 见 Metrics; 进程退出时自动 flush"""
+    global _metrics, _atexit_registered
+    if _metrics is not None:
+        _metrics.flush()
+    _metrics = Metrics(exporters, **options) if enabled else None
+    if enabled and not _atexit_registered:
+        atexit.register(lambda: _metrics is not None and _metrics.flush())
+        _atexit_registered = True
+    return _metrics
+
+
+def span(name, **labels):
+    metrics = _metrics
+    if metrics is None:
+        return NOOP_SPAN
+    return metrics.span(name, **labels)
+
+
+def incr(name, value=1, **labels):
+    if _metrics is not None:
+        _metrics.incr(name, value, **labels)
+
+
+def observe(name, value, buckets=None, **labels):
+    if _metrics is not None:
+        _metrics.observe(name, value, buckets, **labels)
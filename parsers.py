@@ -0,0 +1,174 @@
+"""
+HTML 解析后端
+- make_soup(): html2md 等需要 BeautifulSoup 树的地方使用, 安装了 lxml 时用 lxml 构建(比 html.parser 快数倍)
+- extract_*_results(): 直接用 lxml + 预编译 XPath 提取 Baidu / searx / Bing 的结果块, 不再构建 BeautifulSoup 树
+  输出与 search_engine 里原来的 BeautifulSoup('html.parser') 版本逐字段一致(文本规则照搬 bs4:
+  跳过注释以及 script/style/template/rt/rp 里的文字)
+
+后端:
+    "lxml"  默认(已在 requirements.txt 中)
+    "bs4"   未安装 lxml 时自动回退, 也可以通过 set_parser_backend("bs4") 强制使用
+"""
+import importlib.util
+from bs4 import BeautifulSoup
+
+HAS_LXML = importlib.util.find_spec("lxml") is not None
+
+if HAS_LXML:
+    from lxml import etree
+    import lxml.html
+
+_backend = "lxml" if HAS_LXML else "bs4"
+
+
+def set_parser_backend(name):
+    """切换结果提取/建树使用的后端: "lxml" 或 "bs4" """
+    global _backend
+    if name not in ("lxml", "bs4"):
+        raise ValueError(f"未知的解析后端: {name}")
+    if name == "lxml" and not HAS_LXML:
+        raise ValueError("未安装 lxml (pip install lxml)")
+    _backend = name
+
+
+def resolve_backend(backend=None):
+    if backend is None:
+        return _backend
+    if backend == "lxml" and not HAS_LXML:
+        return "bs4"
+    return backend
+
+
+def make_soup(html, backend=None):
+    """按后端构建 BeautifulSoup 树 (lxml 后端使用 'lxml' 树构建器, 否则 'html.parser')"""
+    return BeautifulSoup(html, "lxml" if resolve_backend(backend) == "lxml" else "html.parser")
+
+
+# ---------------- lxml 快速提取 ----------------
+
+# BeautifulSoup 的 get_text()/stripped_strings 不包含这些标签里的文字
+_SKIP_TEXT_TAGS = frozenset(("script", "style", "template", "rt", "rp"))
+
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+if HAS_LXML:
+    _HTML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+    _BAIDU_OP = etree.XPath("//div[normalize-space(@class)='result-op c-container new-pmd']")
+    _BAIDU_XPATH_LOG = etree.XPath("//div[normalize-space(@class)='result c-container xpath-log new-pmd']")
+    _FIRST_H3 = etree.XPath("(.//h3)[1]")
+    _FIRST_HREF_A = etree.XPath("(.//a[@href])[1]")
+
+    _SEARX_ARTICLES = etree.XPath("//article[normalize-space(@class)='result result-default category-general']")
+    _SEARX_URL_HEADER = etree.XPath(f"(.//a[{_has_class('url_header')}])[1]")
+    _SEARX_CONTENT = etree.XPath(f"(.//p[{_has_class('content')}])[1]")
+
+    _BING_RESULTS = etree.XPath(f"//li[{_has_class('b_algo')}]")
+    _FIRST_H2 = etree.XPath("(.//h2)[1]")
+    _FIRST_A = etree.XPath("(.//a)[1]")
+    _BING_CAPTION_P = etree.XPath(f"(.//*[{_has_class('b_caption')}]//p)[1]")
+    _BING_SLUG = etree.XPath(f"(.//*[{_has_class('b_algoSlug')}])[1]")
+
+
+def _parse(html_content):
+    if not html_content or not html_content.strip():
+        return None
+    try:
+        return lxml.html.document_fromstring(html_content.encode("utf-8", "surrogatepass"), parser=_HTML_PARSER)
+    except (etree.ParserError, ValueError):
+        return None
+
+
+def _iter_strings(element):
+    """按文档顺序产出元素内的文本节点, 规则与 bs4 的 _all_strings 一致"""
+    if element.text and element.tag not in _SKIP_TEXT_TAGS:
+        yield element.text
+    if element.tag in _SKIP_TEXT_TAGS:
+        return
+    for child in element:
+        if isinstance(child.tag, str):
+            yield from _iter_strings(child)
+        if child.tail:
+            yield child.tail
+
+
+def stripped_strings(element):
+    for text in _iter_strings(element):
+        text = text.strip()
+        if text:
+            yield text
+
+
+def text_strip(element):
+    """等价于 bs4 的 get_text(strip=True)"""
+    return "".join(stripped_strings(element))
+
+
+def text_raw(element):
+    """等价于 bs4 的 get_text()"""
+    return "".join(_iter_strings(element))
+
+
+def _first(xpath, element):
+    found = xpath(element)
+    return found[0] if found else None
+
+
+def extract_baidu_results(html_content):
+    """返回 [{'title', 'link', 'content'}], content 为未做时间格式修正的原始拼接文本"""
+    root = _parse(html_content)
+    if root is None:
+        return []
+    entries = []
+    for div in _BAIDU_OP(root) + _BAIDU_XPATH_LOG(root):
+        title_tag = _first(_FIRST_H3, div)
+        title = text_strip(title_tag) if title_tag is not None else "无标题"
+        link_tag = _first(_FIRST_HREF_A, div)
+        link = link_tag.get("href") if link_tag is not None else "无链接"
+        content = ' '.join(text for text in stripped_strings(div) if text != title)
+        entries.append({'title': title, 'link': link, 'content': content})
+    return entries
+
+
+def extract_searx_results(html_content):
+    root = _parse(html_content)
+    if root is None:
+        return []
+    entries = []
+    for article in _SEARX_ARTICLES(root):
+        title_tag = _first(_FIRST_H3, article)
+        title = text_strip(title_tag) if title_tag is not None else '无标题'
+        a_tag = _first(_SEARX_URL_HEADER, article)
+        link = a_tag.get('href') if a_tag is not None and a_tag.get('href') is not None else '无链接'
+        content_tag = _first(_SEARX_CONTENT, article)
+        content = text_strip(content_tag) if content_tag is not None else '无内容'
+        entries.append({'title': title, 'link': link, 'content': content})
+    return entries
+
+
+def extract_bing_results(html_content, page_num=1):
+    root = _parse(html_content)
+    if root is None:
+        return []
+    entries = []
+    for result in _BING_RESULTS(root):
+        try:
+            title_elem = _first(_FIRST_H2, result)
+            title = text_raw(title_elem).strip() if title_elem is not None else "无标题"
+            link_elem = _first(_FIRST_A, result)
+            link = link_elem.get('href') if link_elem is not None and link_elem.get('href') is not None else "无链接"
+
+            summary_elem = _first(_BING_CAPTION_P, result)
+            if summary_elem is None:
+                summary_elem = _first(_BING_SLUG, result)
+            summary = text_raw(summary_elem).strip() if summary_elem is not None else "无摘要"
+            summary = summary[:200]
+
+            entries.append({'title': title, 'link': link, 'content': summary})
+        except Exception as e:
+            print(f"处理第 {page_num} 页单个结果时出错: {str(e)}")
+            continue
+    return entries
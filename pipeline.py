@@ -0,0 +1,145 @@
+"""
+搜索 -> 抓取 -> 转 Markdown 的流式流水线
+
+    async for doc in search_and_read("关键词", engine="baidu", top_n=5):
+        print(doc['rank'], doc['url'], doc['markdown'][:200])
+
+三个阶段重叠执行: 第一页搜索结果一解析完就开始抓取第一个链接, 每个 HTML 到达后立刻开始转换,
+转换好的文档按完成顺序产出, 所以拿到第一篇文档的时间约等于一次搜索翻页加一次抓取
+抓取和转换各自有并发上限(fetch_concurrency / convert_concurrency)
+转换默认放在进程池里执行(convert_executor, 见 html2md.py), 不会卡住事件循环上的抓取
+"""
+import asyncio
+import logging
+from contextlib import aclosing
+from search_engine import iter_baidu_pages, iter_searx_pages, iter_edge_pages, is_valid_link
+from get_html import get_html
+from html2md import html_to_markdown_combined, shutdown_converters, DEFAULT_CONVERT_TIMEOUT
+from batch import ConcurrencyLimiter
+from metrics import span
+from http_client import close_clients
+from browser_pool import close_browser_pool
+
+SEARCH_ENGINES = {
+    'baidu': iter_baidu_pages,
+    'searx': iter_searx_pages,
+    'edge': iter_edge_pages,
+}
+
+_DONE = object()
+
+
+async def search_and_read(query, engine='baidu', top_n=5, proxy=None, fetch_concurrency=4, per_host_limit=2, convert_concurrency=2, timeout=30, httpx_retries=2, cache=None, render_profile='full', convert_executor='process', convert_timeout=DEFAULT_CONVERT_TIMEOUT, convert_mode='body', max_tokens=None):
+    """流式产出前 top_n 个搜索结果的 Markdown 文档
+
+    每个文档是 dict: rank(搜索排名, 从 1 开始), title, url, snippet, markdown
+    抓取失败的结果 markdown 为 None, 仍会产出以便调用方知道该链接已处理
+    cache / render_profile 透传给 get_html(见 http_cache.py / render_profiles.py)
+    convert_executor / convert_timeout 透传给 html_to_markdown_combined, convert_executor=None 时在事件循环里直接转换
+    convert_mode='main' 时只转换正文(见 content_extract.py)
+    max_tokens: 每篇文档的 token 预算, 达到后停止转换; 需要分段读取请用 markdown_sections.iter_html_sections
+    """
+    if engine not in SEARCH_ENGINES:
+        raise ValueError(f"不支持的搜索引擎: {engine}，可选: {', '.join(SEARCH_ENGINES)}")
+
+    limiter = ConcurrencyLimiter(fetch_concurrency, per_host_limit)
+    convert_semaphore = asyncio.Semaphore(convert_concurrency)
+    queue = asyncio.Queue()
+    tasks = set()
+
+    async def fetch(url):
+        # 与 get_html_many 相同: httpx 阶段占全局名额, Playwright 回退只占主机名额
+        async with limiter.slot(url):
+            html = await get_html(url, proxy=proxy, timeout=timeout, httpx_retries=httpx_retries, use_playwright=False, cache=cache)
+        if html is None:
+            async with limiter.host_slot(url):
+                html = await get_html(url, proxy=proxy, skip_httpx=True, timeout=timeout, cache=cache, render_profile=render_profile)
+        return html
+
+    async def read(rank, entry):
+        doc = {
+            'rank': rank,
+            'title': entry['title'],
+            'url': entry['link'],
+            'snippet': entry['content'],
+            'markdown': None,
+        }
+        try:
+            # 同一篇文档的抓取/转换区间挂在这个区间下面(见 metrics.py)
+            with span("pipeline.read", engine=engine) as read_span:
+                read_span.set(rank=rank, url=entry['link'])
+                html = await fetch(entry['link'])
+                if html:
+                    async with convert_semaphore:
+                        doc['markdown'] = await html_to_markdown_combined(html, executor=convert_executor, timeout=convert_timeout, mode=convert_mode, max_tokens=max_tokens)
+        except Exception as e:
+            logging.error(f"处理搜索结果 #{rank} ({entry['link']}) 失败: {e}")
+        except asyncio.CancelledError:
+            logging.error(f"处理搜索结果 #{rank} ({entry['link']}) 被取消")
+            raise
+        finally:
+            # 无论成败都要交付, 否则消费端会一直等这篇文档; 队列不限长度, put_nowait 不会阻塞
+            queue.put_nowait(doc)
+
+    async def search():
+        seen = set()
+        try:
+            async with aclosing(SEARCH_ENGINES[engine](query, proxy)) as pages:
+                async for entries in pages:
+                    for entry in entries:
+                        link = entry['link']
+                        if not is_valid_link(link) or link in seen:
+                            continue
+                        seen.add(link)
+                        tasks.add(asyncio.create_task(read(len(seen), entry)))
+                        if len(seen) >= top_n:
+                            return
+        except Exception as e:
+            logging.error(f"{engine} 搜索失败: {e}")
+        finally:
+            await queue.put(_DONE)
+
+    search_task = asyncio.create_task(search())
+    try:
+        search_done = False
+        delivered = 0
+        while not search_done or delivered < len(tasks):
+            item = await queue.get()
+            if item is _DONE:
+                search_done = True
+                continue
+            delivered += 1
+            yield item
+    finally:
+        pending = [t for t in tasks | {search_task} if not t.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def main():
+    proxy = "http://127.0.0.1:7890"
+    query = input("请输入搜索关键词：")
+    async for doc in search_and_read(query, engine='baidu', top_n=5, proxy=proxy):
+        print(f"\n{'='*10} #{doc['rank']} {doc['title']} {'='*10}")
+        print(doc['url'])
+        if doc['markdown']:
+            print(doc['markdown'][:500] + "...")
+        else:
+            print("未能获取该页面内容")
+
+
+async def run_main():
+    try:
+        await main()
+    finally:
+        await close_clients()
+        await close_browser_pool()
+        shutdown_converters()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_main())
+    except KeyboardInterrupt:
+        print("\n程序被用户中断。")
@@ -0,0 +1,191 @@
+"""
+代理池: 多个代理按健康度分担请求, 一个代理挂了不会拖垮整个进程
+所有接受 proxy= 的地方(get_html / post_html / get_html_many / html_stream / 各搜索引擎 / 百度跳转解析 / federated_search)
+都可以直接传入 ProxyPool, httpx 和 Playwright 两条路径都会从池里选代理
+
+- 健康度: 每个代理记录成功耗时的 EWMA 和错误率的 EWMA, 分数 = 耗时 * (1 + 4 * 错误率), 越小越好
+- 新域名在健康代理里随机取两个, 用分数低的那个(power of two choices, 避免所有请求挤到同一个"最好"的代理)
+- 按可注册域名粘住同一个代理(sticky_ttl 秒内没有请求则解除), cf_clearance 等 cookie 和出口 IP 绑定, 换代理就得重新过防护
+- 连续 max_failures 次失败(连不上代理、连接超时、代理握手失败、407、Playwright 的代理/隧道错误)后剔除 eject_time 秒,
+  再次被剔除时时间翻倍(最多 max_eject_time 秒); 到期后重新参与选择, 成功一次即恢复
+- 全部代理都被剔除时, 选最快恢复的那个(不会返回"没有代理")
+- None 可以作为池里的一项, 表示直连
+
+    pool = ProxyPool(["http://127.0.0.1:7890", "http://127.0.0.1:7891", None])
+    html = await get_html(url, proxy=pool)
+    results = await baidu_search_results(query, proxy=pool)
+    pool.stats()
+
+本地验证(两个本地代理, 其中一个连不上): python benchmarks/proxy_pool_check.py
+
+自己发请求时:
+    async with use_proxy(proxy, url) as chosen:     # proxy 可以是字符串或 ProxyPool
+        response = await get_client(proxy=chosen).get(url)
+"""
+import logging
+import random
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import httpx
+from fetch_strategy import registrable_domain
+
+# Playwright 的异常没有细分类型, 只能看消息; 只认代理/隧道本身的错误, 页面加载超时可能只是目标站点慢
+PLAYWRIGHT_PROXY_ERRORS = ("ERR_PROXY", "ERR_TUNNEL", "ERR_SOCKS", "ERR_NO_SUPPORTED_PROXIES")
+
+
+def is_proxy_error(error):
+    """这个异常是否是代理造成的: 连不上代理、连接超时、代理握手失败
+    读超时等其它超时不算(目标站点慢也会这样), 目标站点返回的错误状态码也不算"""
+    if isinstance(error, (httpx.ProxyError, httpx.ConnectError, httpx.ConnectTimeout)):
+        return True
+    if isinstance(error, httpx.HTTPError):
+        return False
+    message = str(error)
+    return any(marker in message for marker in PLAYWRIGHT_PROXY_ERRORS)
+
+
+class ProxyState:
+    """一个代理的健康状态"""
+
+    def __init__(self, proxy, initial_latency):
+        self.proxy = proxy
+        self.latency = initial_latency      # 成功请求耗时的 EWMA(秒)
+        self.error_rate = 0.0               # 失败率的 EWMA
+        self.consecutive_failures = 0
+        self.ejections = 0                  # 连续被剔除的次数, 决定下次剔除多久
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def score(self):
+        return self.latency * (1 + 4 * self.error_rate)
+
+    def ejected(self, now):
+        return now < self.ejected_until
+
+
+class ProxyPool:
+    """proxies: 代理地址列表(可以包含 None 表示直连)
+    sticky_ttl: 域名多少秒没有请求就解除与代理的绑定; alpha: EWMA 的平滑系数"""
+
+    def __init__(self, proxies, sticky_ttl=1800, max_failures=3, eject_time=30, max_eject_time=600, alpha=0.3,
+                 initial_latency=1.0, max_domains=10000):
+        proxies = list(dict.fromkeys(proxies))
+        if not proxies:
+            raise ValueError("代理池至少需要一个代理")
+        self.sticky_ttl = sticky_ttl
+        self.max_failures = max_failures
+        self.eject_time = eject_time
+        self.max_eject_time = max_eject_time
+        self.alpha = alpha
+        self.max_domains = max_domains
+        self._states = {proxy: ProxyState(proxy, initial_latency) for proxy in proxies}
+        self._sticky = OrderedDict()      # 可注册域名 -> (代理, 最近使用时间)
+
+    @property
+    def proxies(self):
+        return list(self._states)
+
+    def select(self, url, exclude=()):
+        """为 url 选一个代理; exclude 中的代理尽量不选(例如刚失败的那个, 或对冲请求要换一个出口)"""
+        now = time.time()
+        domain = registrable_domain(url)
+        sticky = self._sticky.get(domain)
+        if sticky is not None:
+            proxy, used_at = sticky
+            state = self._states.get(proxy)
+            if state is not None and now - used_at < self.sticky_ttl and not state.ejected(now) and proxy not in exclude:
+                self._sticky[domain] = (proxy, now)
+                self._sticky.move_to_end(domain)
+                return proxy
+
+        candidates = [s for s in self._states.values() if not s.ejected(now) and s.proxy not in exclude]
+        if not candidates:
+            candidates = [s for s in self._states.values() if not s.ejected(now)]
+        if not candidates:
+            state = min(self._states.values(), key=lambda s: s.ejected_until)
+            logging.warning(f"代理池中所有代理都已被剔除，临时使用最快恢复的 {state.proxy}")
+            return state.proxy
+        if len(candidates) == 1:
+            chosen = candidates[0]
+        else:
+            first, second = random.sample(candidates, 2)
+            chosen = first if first.score() <= second.score() else second
+
+        if sticky is not None and sticky[0] != chosen.proxy:
+            logging.info(f"域名 {domain} 的代理从 {sticky[0]} 换成 {chosen.proxy}")
+        self._sticky[domain] = (chosen.proxy, now)
+        self._sticky.move_to_end(domain)
+        while len(self._sticky) > self.max_domains:
+            self._sticky.popitem(last=False)
+        return chosen.proxy
+
+    def record(self, proxy, success, elapsed=None):
+        """记录一次请求结果; elapsed 为成功请求的耗时(秒), 不传则不更新耗时"""
+        state = self._states.get(proxy)
+        if state is None:
+            return
+        state.requests += 1
+        state.error_rate = (1 - self.alpha) * state.error_rate + self.alpha * (0.0 if success else 1.0)
+        if success:
+            if elapsed is not None:
+                state.latency = (1 - self.alpha) * state.latency + self.alpha * elapsed
+            if state.ejections:
+                logging.info(f"代理 {proxy} 已恢复")
+            state.consecutive_failures = 0
+            state.ejections = 0
+            return
+        state.failures += 1
+        state.consecutive_failures += 1
+        if state.consecutive_failures >= self.max_failures:
+            now = time.time()
+            if not state.ejected(now):
+                state.ejections += 1
+                eject_for = min(self.eject_time * 2 ** (state.ejections - 1), self.max_eject_time)
+                state.ejected_until = now + eject_for
+                logging.warning(f"代理 {proxy} 连续失败 {state.consecutive_failures} 次，剔除 {eject_for:.0f} 秒")
+
+    def stats(self):
+        """{代理: {latency, error_rate, requests, failures, ejected_for, domains}}"""
+        now = time.time()
+        domains = {}
+        for proxy, used_at in self._sticky.values():
+            if now - used_at < self.sticky_ttl:
+                domains[proxy] = domains.get(proxy, 0) + 1
+        return {
+            state.proxy: {
+                "latency": state.latency,
+                "error_rate": state.error_rate,
+                "requests": state.requests,
+                "failures": state.failures,
+                "ejected_for": max(0.0, state.ejected_until - now),
+                "domains": domains.get(state.proxy, 0),
+            }
+            for state in self._states.values()
+        }
+
+
+def pick_proxy(proxy, url, exclude=()):
+    """proxy 参数可以是代理字符串、None 或 ProxyPool, 返回这次请求实际使用的代理"""
+    if isinstance(proxy, ProxyPool):
+        return proxy.select(url, exclude)
+    return proxy
+
+
+@asynccontextmanager
+async def use_proxy(proxy, url, timed=True):
+    """选一个代理在 with 块内使用: 块内抛出代理类错误记为失败, 正常结束记为成功
+    timed=False 时不记录耗时(流式读取、整个搜索会话这类耗时和代理快慢无关的场景)"""
+    if not isinstance(proxy, ProxyPool):
+        yield proxy
+        return
+    chosen = proxy.select(url)
+    started = time.perf_counter()
+    try:
+        yield chosen
+    except Exception as e:
+        if is_proxy_error(e):
+            proxy.record(chosen, False)
+        raise
+    proxy.record(chosen, True, time.perf_counter() - started if timed else None)
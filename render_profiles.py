@@ -0,0 +1,163 @@
+"""
+get_html Playwright 回退的渲染配置
+html2md 只需要 DOM, 图片/媒体/字体/统计/广告请求都是纯开销
+
+    full      不拦截任何请求, 等待 networkidle (原来的行为)
+    balanced  拦截图片/媒体/字体和统计广告域名, 等待 load
+    minimal   额外拦截样式表等, 等待 domcontentloaded 后再等页面文字稳定
+
+还可以指定 wait_selector: 导航完成后再等待某个 CSS 选择器出现
+被拦截的请求数按类型统计; 被拦截请求的大小无法得知, 节省的字节数按各类型的典型大小估算
+"""
+import asyncio
+import logging
+import time
+from urllib.parse import urlsplit
+
+RENDER_PROFILES = {
+    "full": {
+        "block_types": (),
+        "block_domains": False,
+        "wait_until": "networkidle",
+        "wait_text_stable": False,
+    },
+    "balanced": {
+        "block_types": ("image", "media", "font"),
+        "block_domains": True,
+        "wait_until": "load",
+        "wait_text_stable": False,
+    },
+    "minimal": {
+        "block_types": ("image", "media", "font", "stylesheet", "texttrack", "eventsource", "websocket", "manifest"),
+        "block_domains": True,
+        "wait_until": "domcontentloaded",
+        "wait_text_stable": True,
+    },
+}
+
+# 统计/广告域名, 子域名同样拦截
+BLOCKED_DOMAINS = (
+    "google-analytics.com", "googletagmanager.com", "googlesyndication.com", "doubleclick.net",
+    "adservice.google.com", "googleadservices.com", "amazon-adsystem.com", "facebook.net",
+    "scorecardresearch.com", "hotjar.com", "segment.io", "mixpanel.com", "clarity.ms",
+    "criteo.com", "taboola.com", "outbrain.com", "bat.bing.com",
+    "hm.baidu.com", "cnzz.com", "umeng.com", "51.la", "growingio.com",
+)
+
+# 被拦截资源的典型大小(字节), 只用于估算节省量
+_TYPICAL_SIZES = {
+    "image": 40_000,
+    "media": 300_000,
+    "font": 40_000,
+    "stylesheet": 25_000,
+    "script": 30_000,
+}
+_DEFAULT_TYPICAL_SIZE = 5_000
+
+
+def is_blocked_domain(url, domains=BLOCKED_DOMAINS):
+    try:
+        host = urlsplit(url).hostname or ""
+    except ValueError:
+        return False
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+class RenderStats:
+    """一次渲染的请求统计"""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.requests = 0
+        self.blocked = {}       # 资源类型 -> 拦截次数
+        self.bytes_loaded = 0   # 已加载响应的 Content-Length 之和(没有该头的响应不计)
+
+    @property
+    def blocked_requests(self):
+        return sum(self.blocked.values())
+
+    @property
+    def estimated_bytes_saved(self):
+        return sum(_TYPICAL_SIZES.get(t, _DEFAULT_TYPICAL_SIZE) * n for t, n in self.blocked.items())
+
+    def to_dict(self):
+        return {
+            "profile": self.profile,
+            "requests": self.requests,
+            "blocked_requests": self.blocked_requests,
+            "blocked_by_type": dict(self.blocked),
+            "bytes_loaded": self.bytes_loaded,
+            "estimated_bytes_saved": self.estimated_bytes_saved,
+        }
+
+
+def get_render_profile(name):
+    if name not in RENDER_PROFILES:
+        raise ValueError(f"未知的渲染配置: {name}，可选: {', '.join(RENDER_PROFILES)}")
+    return RENDER_PROFILES[name]
+
+
+async def apply_render_profile(page, name="full"):
+    """按配置在页面上安装请求拦截, 返回 RenderStats"""
+    profile = get_render_profile(name)
+    stats = RenderStats(name)
+    block_types = set(profile["block_types"])
+
+    def on_response(response):
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            stats.bytes_loaded += int(length)
+
+    page.on("response", on_response)
+
+    if not block_types and not profile["block_domains"]:
+        page.on("request", lambda request: setattr(stats, "requests", stats.requests + 1))
+        return stats
+
+    async def handle(route):
+        request = route.request
+        stats.requests += 1
+        resource_type = request.resource_type
+        if resource_type in block_types or (profile["block_domains"] and is_blocked_domain(request.url)):
+            stats.blocked[resource_type] = stats.blocked.get(resource_type, 0) + 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await page.route("**/*", handle)
+    return stats
+
+
+async def wait_for_text_stable(page, interval=0.25, stable_rounds=2, max_wait=5.0):
+    """轮询 body 文本长度, 连续 stable_rounds 次不变即认为渲染完成"""
+    deadline = time.monotonic() + max_wait
+    last_length = -1
+    stable = 0
+    while time.monotonic() < deadline:
+        try:
+            length = await page.evaluate("() => document.body ? document.body.innerText.length : 0")
+        except Exception:
+            return
+        if length == last_length and length > 0:
+            stable += 1
+            if stable >= stable_rounds:
+                return
+        else:
+            stable = 0
+        last_length = length
+        await asyncio.sleep(interval)
+    logging.info(f"页面文字在 {max_wait} 秒内未稳定，直接读取。")
+
+
+async def render(page, url, name="full", wait_selector=None, timeout=30):
+    """按配置导航并等待页面就绪, 返回 Playwright 的导航响应"""
+    profile = get_render_profile(name)
+    response = await page.goto(url, wait_until=profile["wait_until"], timeout=timeout * 1000)
+    if wait_selector:
+        try:
+            await page.wait_for_selector(wait_selector, timeout=timeout * 1000)
+        except Exception as e:
+            logging.warning(f"等待选择器 {wait_selector} 超时或失败: {e}")
+    elif profile["wait_text_stable"]:
+        await wait_for_text_stable(page)
+    return response
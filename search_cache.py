@@ -0,0 +1,121 @@
+"""
+搜索结果缓存与并发查询合并
+- 同一时刻相同(或只差 top_n 更小)的查询共用一次上游请求
+- 结果按 (引擎, 规范化后的查询词, 语言, 代理) 缓存一段时间, 缓存里 top_n 更大的结果可以直接回答 top_n 更小的请求;
+  不同代理(出口地区)的结果可能不同, 互不共用, ProxyPool 按实例区分
+
+fetch 回调返回 (entries, exhausted): entries 为条目列表, exhausted 表示上游已经没有更多结果
+(此时即使 top_n 更大也可以直接用缓存回答)
+"""
+import asyncio
+import logging
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """全角转半角、大小写折叠、合并空白"""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+class SearchCache:
+    """带 TTL 的搜索结果缓存, ttl=0 时只合并进行中的请求, 不保存结果"""
+
+    def __init__(self, ttl=300, max_items=512):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._items = OrderedDict()   # key -> (stored_at, top_n, entries, exhausted)
+        self._inflight = {}           # key -> [(top_n, task)]
+        self._waiting = {}            # task -> 正在等待它的调用方数量
+
+    def _lookup(self, key, top_n):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        stored_at, cached_top_n, entries, exhausted = item
+        if time.time() - stored_at > self.ttl:
+            del self._items[key]
+            return None
+        if cached_top_n >= top_n or exhausted:
+            self._items.move_to_end(key)
+            return entries
+        return None
+
+    def _store(self, key, top_n, entries, exhausted):
+        if self.ttl <= 0:
+            return
+        current = self._items.get(key)
+        if current is not None and current[1] > top_n and not exhausted:
+            return  # 不用更小的结果覆盖更大的结果
+        self._items[key] = (time.time(), top_n, entries, exhausted)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    async def get_or_fetch(self, engine, query, top_n, language, fetch, proxy=None):
+        """返回 (条目列表, 来源); 条目可能比 top_n 多, 由调用方截取
+        来源: cache(命中缓存) / coalesced(合并到进行中的相同查询) / fetched(自己调用了 fetch)
+        fetch(top_n) 只在缓存和进行中的请求都无法满足时调用"""
+        key = (engine, normalize_query(query), language, proxy)
+
+        entries = self._lookup(key, top_n)
+        if entries is not None:
+            logging.info(f"{engine} 搜索命中缓存: {query}")
+            return entries, "cache"
+
+        for inflight_top_n, task in self._inflight.get(key, []):
+            if inflight_top_n >= top_n:
+                logging.info(f"{engine} 搜索合并到进行中的相同查询: {query}")
+                return await self._wait(task), "coalesced"
+
+        task = asyncio.ensure_future(fetch(top_n))
+        waiters = self._inflight.setdefault(key, [])
+        waiters.append((top_n, task))
+
+        def _done(t):
+            waiters.remove((top_n, task))
+            if not waiters:
+                self._inflight.pop(key, None)
+            if not t.cancelled() and t.exception() is None:
+                entries, exhausted = t.result()
+                self._store(key, top_n, entries, exhausted)
+
+        task.add_done_callback(_done)
+        return await self._wait(task), "fetched"
+
+    async def _wait(self, task):
+        """等待共享的上游请求; 单个调用方被取消不影响其他调用方, 所有调用方都被取消时才取消上游请求
+        (例如聚合搜索超过时间预算, 放弃还没返回的引擎)"""
+        self._waiting[task] = self._waiting.get(task, 0) + 1
+        try:
+            entries, _ = await asyncio.shield(task)
+            return entries
+        finally:
+            self._waiting[task] -= 1
+            if not self._waiting[task]:
+                del self._waiting[task]
+                if not task.done():
+                    task.cancel()
+
+    def clear(self):
+        self._items.clear()
+
+
+_default_cache = None
+_coalescer = SearchCache(ttl=0)
+
+
+def get_search_cache():
+    """返回进程内共享的默认搜索结果缓存"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SearchCache()
+    return _default_cache
+
+
+def resolve_search_cache(cache):
+    """cache 参数: None/False 只合并并发查询, True 使用默认缓存, 也可以直接传 SearchCache 实例"""
+    if cache is True:
+        return get_search_cache()
+    return cache or _coalescer
@@ -4,23 +4,156 @@ searx_search: 使用searx(可能搜索结果比较少)
 baidu_search: 使用百度搜索引擎进行搜索(出来的网址全都需要重定向)
 edge_search: 使用edge搜索引擎进行搜索(恶心的反爬机制导致我只能用playwright,速度肯定更慢)
 都是异步的,所以前面都要await,接受参数query和top_n(默认10),返回结果列表和url列表
+
+searx_search_results / baidu_search_results / edge_search_results 返回 SearchResults(见 search_results.py),
+即 SearchResult 对象列表, 需要文本时再调用 .to_text(); 上面三个函数就是在它们外面包了一层
+
+iter_searx_pages / iter_baidu_pages / iter_edge_pages 是对应的逐页异步生成器,
+每解析完一页就产出该页的条目列表({'title', 'link', 'content'}), 供流水线边搜边抓
 """
 import httpx
 import asyncio
 from bs4 import BeautifulSoup
 import time
 from urllib.parse import quote
-from playwright.async_api import async_playwright
+from browser_pool import get_browser_pool, close_browser_pool, block_page_resources
+from http_client import get_client, close_clients, cookie_scope
+from http.cookiejar import CookieJar
+from search_cache import resolve_search_cache
+from search_results import SearchResults, is_valid_link, results_from_entries, take_top
+from baidu_links import resolve_baidu_links
+from host_limiter import get_host_limiter
+from proxy_pool import use_proxy
+from metrics import span, incr
+import parsers
+from parsers import resolve_backend
 import random
 import re
+import math
+from dataclasses import replace
+from contextlib import aclosing
+
+# 搜索入口地址, 离线基准测试(benchmarks/offline_suite.py)会把它们换成本地模拟服务器
+SEARX_SEARCH_URL = 'https://searx.bndkt.io/search'
+BAIDU_SEARCH_URL = "https://www.baidu.com/s"
+BING_SEARCH_URL = "https://www.cn.bing.com/search"
+
+async def limited_get(client, url, **kwargs):
+    """经过共享的主机限速/熔断(见 host_limiter.py)发送 GET 请求"""
+    limiter = get_host_limiter()
+    await limiter.acquire(url)
+    try:
+        with span("search.fetch"):
+            response = await client.get(url, **kwargs)
+    except httpx.RequestError as e:
+        limiter.record(url, error=e)
+        raise
+    limiter.record(url, response.status_code, response.headers)
+    return response
+
+async def fetch_url(url, headers, proxy=None, cookies=None):
+    """cookies: 同一次搜索的各页共用的 CookieJar(共享客户端本身不保存 cookie, 见 http_client.py)"""
+    async with use_proxy(proxy, url) as chosen:
+        client = get_client(proxy=chosen)
+        with cookie_scope(cookies):
+            response = await limited_get(client, url, headers=headers)
+    return response.text
+
+async def collect_entries(pages, top_n):
+    """从逐页生成器中收集条目, 有效链接数达到 top_n 即停止(并关闭生成器)
+    返回 (entries, exhausted), exhausted 表示生成器先结束了(上游没有更多结果)"""
+    entries = []
+    valid = 0
+    async with aclosing(pages):
+        async for page_entries in pages:
+            for entry in page_entries:
+                entries.append(entry)
+                if is_valid_link(entry['link']):
+                    valid += 1
+
+                if valid >= top_n:
+                    return entries, False
+    return entries, True
+
+def format_entries(entries, top_n):
+    """把条目格式化为结果文本列表和有效链接列表, 有效链接数达到 top_n 即停止"""
+    results = take_top(results_from_entries(entries, None), top_n)
+    return [r.to_text() for r in results], results.urls
+
+async def cached_search_results(engine, pages_factory, query, top_n, language, cache, proxy=None):
+    """经过搜索缓存/并发合并收集结果, 返回 SearchResults; proxy 是缓存键的一部分
+    条目在抓取时就转成 SearchResult, 缓存里存的是对象(fetched_at 是真正抓取的时间)"""
+    async def fetch(n):
+        entries, exhausted = await collect_entries(pages_factory(), n)
+        return results_from_entries(entries, engine), exhausted
+
+    with span("search", engine=engine) as search_span:
+        results, source = await resolve_search_cache(cache).get_or_fetch(engine, query, top_n, language, fetch, proxy)
+        search_span.set(query=query, results=len(results), cached=source == "cache", coalesced=source == "coalesced")
+    if source == "cache":
+        incr("search_cache_hits_total", engine=engine)
+    elif source == "coalesced":
+        incr("search_coalesced_total", engine=engine)
+    return take_top(results, top_n, engine)
+
+async def cached_search(engine, pages_factory, query, top_n, language, cache, proxy=None):
+    """经过搜索缓存/并发合并收集条目, 返回 (results, urls)"""
+    results = await cached_search_results(engine, pages_factory, query, top_n, language, cache, proxy)
+    return [r.to_text() for r in results], results.urls
 
-async def fetch_url(url, headers, proxy=None):
-    proxies = {"http://": proxy, "https://": proxy} if proxy else None
-    async with httpx.AsyncClient(proxies=proxies) as client:
-        response = await client.get(url, headers=headers)
-        return response.text
+def estimate_pages(top_n, per_page=10):
+    """估算凑够 top_n 条结果需要的页数"""
+    return max(1, math.ceil(top_n / per_page))
+
+async def iter_pages(fetch_page, first_page, prefetch=1):
+    """按页码顺序产出 fetch_page(page) 的结果, 遇到空页结束
+
+    prefetch > 1 时先同时请求 prefetch 页, 之后不够再逐页补请求, 并按链接去重;
+    生成器被关闭(调用方已凑够结果)时取消仍在进行中的页"""
+    tasks = {}
+    seen = set()
+    page = first_page
+    try:
+        for p in range(first_page, first_page + prefetch):
+            tasks[p] = asyncio.create_task(fetch_page(p))
+        while True:
+            task = tasks.pop(page, None) or asyncio.create_task(fetch_page(page))
+            entries = await task
+            if not entries:
+                return
+            if prefetch > 1:
+                unique = []
+                for entry in entries:
+                    if entry['link'] in seen:
+                        continue
+                    if is_valid_link(entry['link']):
+                        seen.add(entry['link'])
+                    unique.append(entry)
+                entries = unique
+            yield entries
+            page += 1
+    finally:
+        pending = [task for task in tasks.values() if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            print(f"已取消 {len(pending)} 个多余的翻页请求")
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+def clean_baidu_content(content):
+    content = re.sub(r'UTC\+8(\d{5}:\d{2}:\d{2})', lambda x: 'UTC+8 ' + ':'.join([x.group(1)[i:i+2] for i in range(0, len(x.group(1)), 2)]).lstrip(':'), content)
+    content = re.sub(r'(\d{2}:\d{2})(\d{4}-\d{2}-\d{2})', r'\1 \2', content)
+    content = re.sub(r'(\d{2}) (\d{2}) : (\d{2}) (\d{2}) : (\d{2}) (\d{2})', r'\1:\3:\5', content)
+    return content
+
+def extract_div_contents(html_content, backend=None):
+    """提取百度结果块; backend 为 None 时使用 parsers 的默认后端(lxml), "bs4" 为原来的 html.parser 实现"""
+    if resolve_backend(backend) == "lxml":
+        entries = parsers.extract_baidu_results(html_content)
+        for entry in entries:
+            entry['content'] = clean_baidu_content(entry['content'])
+        return entries
 
-def extract_div_contents(html_content):
     soup = BeautifulSoup(html_content, 'html.parser')
     result_op_divs = soup.find_all('div', class_='result-op c-container new-pmd')
     result_xpath_log_divs = soup.find_all('div', class_='result c-container xpath-log new-pmd')
@@ -36,9 +169,7 @@ def extract_div_contents(html_content):
         all_texts = [text for text in div.stripped_strings if text != title]
         content = ' '.join(all_texts)
         
-        content = re.sub(r'UTC\+8(\d{5}:\d{2}:\d{2})', lambda x: 'UTC+8 ' + ':'.join([x.group(1)[i:i+2] for i in range(0, len(x.group(1)), 2)]).lstrip(':'), content)
-        content = re.sub(r'(\d{2}:\d{2})(\d{4}-\d{2}-\d{2})', r'\1 \2', content)
-        content = re.sub(r'(\d{2}) (\d{2}) : (\d{2}) (\d{2}) : (\d{2}) (\d{2})', r'\1:\3:\5', content)
+        content = clean_baidu_content(content)
         
         entries.append({
             'title': title,
@@ -48,14 +179,73 @@ def extract_div_contents(html_content):
     
     return entries
 
-async def searx_search(query, top_n=20, proxy=None):
-    url = 'https://searx.bndkt.io/search'
+def extract_searx_results(html_content, backend=None):
+    if resolve_backend(backend) == "lxml":
+        return parsers.extract_searx_results(html_content)
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+    articles = soup.find_all('article', class_='result result-default category-general')
+
+    entries = []
+
+    for article in articles:
+        title_tag = article.find('h3')
+        title = title_tag.get_text(strip=True) if title_tag else '无标题'
+
+        a_tag = article.find('a', class_='url_header')
+        link = a_tag['href'] if a_tag and 'href' in a_tag.attrs else '无链接'
+
+        content_tag = article.find('p', class_='content')
+        content = content_tag.get_text(strip=True) if content_tag else '无内容'
+
+        entries.append({
+            'title': title,
+            'link': link,
+            'content': content
+        })
+
+    return entries
+
+def extract_bing_results(html_content, page_num=1, backend=None):
+    if resolve_backend(backend) == "lxml":
+        return parsers.extract_bing_results(html_content, page_num)
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+    search_results = soup.select('li.b_algo')
+
+    entries = []
+
+    for result in search_results:
+        try:
+            title_elem = result.find('h2')
+            title = title_elem.get_text().strip() if title_elem else "无标题"
+            link_elem = result.find('a')
+            link = link_elem['href'] if link_elem and 'href' in link_elem.attrs else "无链接"
+
+            summary_elem = result.select_one('.b_caption p') or result.select_one('.b_algoSlug')
+            summary = summary_elem.get_text().strip() if summary_elem else "无摘要"
+            summary = summary[:200]
+
+            entries.append({
+                'title': title,
+                'link': link,
+                'content': summary
+            })
+
+        except Exception as e:
+            print(f"处理第 {page_num} 页单个结果时出错: {str(e)}")
+            continue
+
+    return entries
+
+async def iter_searx_pages(query, proxy=None, language='zh-CN', prefetch=1):
+    url = SEARX_SEARCH_URL
     current_timestamp = int(time.time())
     
     params = {
         'q': query,
         'categories': 'general',
-        'language': 'zh-CN',
+        'language': language,
         'time_range': '',
         'safesearch': '0',
         'theme': 'simple',
@@ -85,73 +275,63 @@ async def searx_search(query, top_n=20, proxy=None):
         "X-Custom-Time": str(current_timestamp),
     }
 
-    results = []
-    urls = []
-    page = 1
     max_retries = 10
+    cookies = CookieJar()
 
-    proxies = {"http://": proxy, "https://": proxy} if proxy else None
-    async with httpx.AsyncClient(proxies=proxies) as client:
-        while len(urls) < top_n:
-            retry_count = 0
-            articles = None
-            
-            while retry_count < max_retries:
-                try:
-                    params['pageno'] = page
-                    response = await client.get(url, params=params, headers=headers)
-                    response.raise_for_status()
-
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    articles = soup.find_all('article', class_='result result-default category-general')
-
-                    if articles:
-                        break
-                    
-                    retry_count += 1
-                    print(f"第 {page} 页无内容，第 {retry_count} 次重试...")
-                    await asyncio.sleep(1)
-
-                except httpx.HTTPStatusError as exc:
-                    print(f"HTTP错误: {exc}")
-                    print(f"响应内容: {exc.response.text}")
-                    return f"搜索失败: {str(exc)}", []
-                except httpx.RequestError as exc:
-                    print(f"请求错误: {exc}")
-                    return f"请求失败: {str(exc)}", []
-                except Exception as e:
-                    print(f"未知错误: {e}")
-                    return f"发生未知错误: {str(e)}", []
-
-            if not articles:
-                print(f"第 {page} 页重试 {max_retries} 次后仍无内容，结束搜索")
-                break
-
-            for article in articles:
-                title_tag = article.find('h3')
-                title = title_tag.get_text(strip=True) if title_tag else '无标题'
-
-                a_tag = article.find('a', class_='url_header')
-                link = a_tag['href'] if a_tag and 'href' in a_tag.attrs else '无链接'
-
-                content_tag = article.find('p', class_='content')
-                content = content_tag.get_text(strip=True) if content_tag else '无内容'
-
-                results.append(f"标题: {title}\n链接: {link}\n内容: {content}\n{'-'*20}")
-                if link != '无链接' and link.startswith(('http://', 'https://')):
-                    urls.append(link)
-
-                if len(urls) >= top_n:
-                    break
+    async def fetch_page(page):
+        page_params = dict(params, pageno=page)
+        retry_count = 0
 
-            page += 1
+        while retry_count < max_retries:
+            async with use_proxy(proxy, url) as chosen:
+                with cookie_scope(cookies):
+                    response = await limited_get(get_client(proxy=chosen), url, params=page_params, headers=headers)
+            response.raise_for_status()
+
+            with span("search.parse", engine='searx'):
+                entries = extract_searx_results(response.text)
+
+            if entries:
+                return entries
+
+            retry_count += 1
+            print(f"第 {page} 页无内容，第 {retry_count} 次重试...")
+            # 空结果页多半是被限流了, 由主机限速器降速, 下次请求前自动等待
+            get_host_limiter().penalize(url)
+
+        print(f"第 {page} 页重试 {max_retries} 次后仍无内容，结束搜索")
+        return None
+
+    async with aclosing(iter_pages(fetch_page, 1, prefetch)) as pages:
+        async for entries in pages:
+            yield entries
+
+async def searx_search_results(query, top_n=20, proxy=None, language='zh-CN', cache=None, concurrent_pages=False):
+    """返回 SearchResults, 出错时直接抛出异常; 参数同 searx_search"""
+    prefetch = estimate_pages(top_n) if concurrent_pages else 1
+    return await cached_search_results('searx', lambda: iter_searx_pages(query, proxy, language, prefetch), query, top_n, language, cache, proxy)
+
+async def searx_search(query, top_n=20, proxy=None, language='zh-CN', cache=None, concurrent_pages=False):
+    """cache: None 只合并并发的相同查询, True 使用默认搜索缓存, 也可以传入 SearchCache 实例
+    concurrent_pages=True 时按每页约 10 条估算页数并同时请求这些页"""
+    try:
+        results = await searx_search_results(query, top_n, proxy, language, cache, concurrent_pages)
+    except httpx.HTTPStatusError as exc:
+        print(f"HTTP错误: {exc}")
+        print(f"响应内容: {exc.response.text}")
+        return f"搜索失败: {str(exc)}", []
+    except httpx.RequestError as exc:
+        print(f"请求错误: {exc}")
+        return f"请求失败: {str(exc)}", []
+    except Exception as e:
+        print(f"未知错误: {e}")
+        return f"发生未知错误: {str(e)}", []
 
-    final = "searx搜索结果:\n" + "\n".join(results)
-    return final, urls[:top_n]
+    return results.to_text(), results.urls
 
-async def baidu_search(query, top_n=20, proxy=None):
+async def iter_baidu_pages(query, proxy=None, prefetch=1):
     current_timestamp = int(time.time())
-    base_url = "https://www.baidu.com/s"
+    base_url = BAIDU_SEARCH_URL
     query_encoded = quote(query.encode('utf-8', 'ignore'))
     
     params = {
@@ -181,140 +361,135 @@ async def baidu_search(query, top_n=20, proxy=None):
         "X-Custom-Time": str(current_timestamp),
     }
 
-    results = []
-    urls = []
-    page = 0
     max_retries = 10
+    cookies = CookieJar()
 
-    proxies = {"http://": proxy, "https://": proxy} if proxy else None
-    async with httpx.AsyncClient(proxies=proxies) as client:
-        while len(urls) < top_n:
-            retry_count = 0
-            entries = None
-            
-            while retry_count < max_retries:
-                try:
-                    params['pn'] = page * 10
-                    url = f"{base_url}?{'&'.join(f'{k}={v}' for k, v in params.items())}"
-                    html_content = await fetch_url(url, headers, proxy)
-                    entries = extract_div_contents(html_content)
-
-                    if entries:
-                        break
-                    
-                    retry_count += 1
-                    print(f"第 {page + 1} 页无内容，第 {retry_count} 次重试...")
-                    await asyncio.sleep(1)
-
-                except httpx.HTTPStatusError as exc:
-                    print(f"HTTP错误: {exc}")
-                    return f"搜索失败: {str(exc)}", []
-                except httpx.RequestError as exc:
-                    print(f"请求错误: {exc}")
-                    return f"请求失败: {str(exc)}", []
-                except Exception as e:
-                    print(f"未知错误: {e}")
-                    return f"发生未知错误: {str(e)}", []
+    # fetch_url 复用共享客户端, 各页之间不再重复握手; cookie 只在这次搜索的各页之间共享
+    async def fetch_page(page):
+        page_params = dict(params, pn=page * 10)
+        url = f"{base_url}?{'&'.join(f'{k}={v}' for k, v in page_params.items())}"
+        retry_count = 0
 
-            if not entries:
-                print(f"第 {page + 1} 页重试 {max_retries} 次后仍无内容，结束搜索")
-                break
+        while retry_count < max_retries:
+            html_content = await fetch_url(url, headers, proxy, cookies)
+            with span("search.parse", engine='baidu'):
+                entries = extract_div_contents(html_content)
 
-            for entry in entries:
-                results.append(f"标题: {entry['title']}\n链接: {entry['link']}\n内容: {entry['content']}\n{'-'*20}")
-                if entry['link'] != '无链接' and entry['link'].startswith(('http://', 'https://')):
-                    urls.append(entry['link'])
+            if entries:
+                return entries
 
-                if len(urls) >= top_n:
-                    break
+            retry_count += 1
+            print(f"第 {page + 1} 页无内容，第 {retry_count} 次重试...")
+            get_host_limiter().penalize(url)
 
-            page += 1
+        print(f"第 {page + 1} 页重试 {max_retries} 次后仍无内容，结束搜索")
+        return None
+
+    async with aclosing(iter_pages(fetch_page, 0, prefetch)) as pages:
+        async for entries in pages:
+            yield entries
+
+async def baidu_search_results(query, top_n=20, proxy=None, cache=None, concurrent_pages=False, resolve_links=False):
+    """返回 SearchResults, 出错时直接抛出异常; 参数同 baidu_search"""
+    prefetch = estimate_pages(top_n) if concurrent_pages else 1
+    results = await cached_search_results('baidu', lambda: iter_baidu_pages(query, proxy, prefetch), query, top_n, None, cache, proxy)
+    if resolve_links:
+        valid = [r for r in results if r.has_valid_url]
+        targets = dict(zip((r.url for r in valid), await resolve_baidu_links([r.url for r in valid], proxy)))
+        results = SearchResults((replace(r, url=targets[r.url]) if r.url in targets else r for r in results), 'baidu')
+    return results
+
+async def baidu_search(query, top_n=20, proxy=None, cache=None, concurrent_pages=False, resolve_links=False):
+    """cache: None 只合并并发的相同查询, True 使用默认搜索缓存, 也可以传入 SearchCache 实例
+    concurrent_pages=True 时按每页约 10 条估算页数并同时请求这些页
+    resolve_links=True 时把 baidu.com/link?url=... 跳转链接并发解析成真实地址(见 baidu_links.py)"""
+    try:
+        results = await baidu_search_results(query, top_n, proxy, cache, concurrent_pages, resolve_links)
+    except httpx.HTTPStatusError as exc:
+        print(f"HTTP错误: {exc}")
+        return f"搜索失败: {str(exc)}", []
+    except httpx.RequestError as exc:
+        print(f"请求错误: {exc}")
+        return f"请求失败: {str(exc)}", []
+    except Exception as e:
+        print(f"未知错误: {e}")
+        return f"发生未知错误: {str(e)}", []
 
-    output = "baidu搜索结果:\n" + "\n".join(results)
-    return output, urls[:top_n]
+    return results.to_text(), results.urls
 
-async def edge_search(query, top_n=20, proxy=None):
-    results = []
-    url_ls = []
-    page_num = 1
+async def iter_edge_pages(query, proxy=None, language='en-US', tabs=1, prefetch=1, block_resources=False):
+    """tabs: 同一 context 里打开的标签页数, 多个 SERP 页可以同时加载
+    block_resources=True 时拦截图片/字体/样式表/媒体请求, 减少带宽和渲染时间"""
     max_retries = 10
-    
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,
-            args=['--disable-blink-features=AutomationControlled'],
-            proxy={"server": proxy} if proxy else None
-        )
-        context = await browser.new_context(
-            viewport={"width": 1280, "height": 720},
-            locale="en-US"
-        )
-        page = await context.new_page()
-        
-        await page.evaluate("() => { Object.defineProperty(navigator, 'webdriver', { get: () => false }); }")
-        
-        while len(url_ls) < top_n:
-            search_url = f"https://www.cn.bing.com/search?q={query}&first={(page_num - 1) * 10 + 1}&FORM=PERE"
-            print(f"正在访问第 {page_num} 页: {search_url}")
-            
-            retry_count = 0
-            page_results_found = False
-            
-            while retry_count < max_retries and not page_results_found:
-                try:
-                    await page.goto(search_url, wait_until="domcontentloaded", timeout=30000)
-                    await page.wait_for_selector('li.b_algo', timeout=10000)
-                    html = await page.content()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    search_results = soup.select('li.b_algo')
-                    
-                    if not search_results:
-                        print(f"第 {page_num} 页无结果，重试 {retry_count + 1}/{max_retries}")
-                        retry_count += 1
-                        continue
-                    
-                    page_results_found = True
-                    
-                    for result in search_results:
-                        if len(url_ls) >= top_n:
-                            break
-                            
-                        try:
-                            title_elem = result.find('h2')
-                            title = title_elem.get_text().strip() if title_elem else "无标题"
-                            link_elem = result.find('a')
-                            link = link_elem['href'] if link_elem and 'href' in link_elem.attrs else "无链接"
-                            
-                            summary_elem = result.select_one('.b_caption p') or result.select_one('.b_algoSlug')
-                            summary = summary_elem.get_text().strip() if summary_elem else "无摘要"
-                            summary = summary[:200]
-                            
-                            formatted_result = f"标题: {title}\n链接: {link}\n内容: {summary}\n{'-'*20}"
-                            results.append(formatted_result)
-                            if link != "无链接" and link.startswith(('http://', 'https://')):
-                                url_ls.append(link)
-                            
-                        except Exception as e:
-                            print(f"处理第 {page_num} 页单个结果时出错: {str(e)}")
+    tabs = max(1, tabs)
+
+    async with use_proxy(proxy, BING_SEARCH_URL, timed=False) as chosen, get_browser_pool().context(
+        proxy=chosen,
+        pages=tabs,
+        viewport={"width": 1280, "height": 720},
+        locale=language
+    ) as context:
+
+        free_tabs = asyncio.Queue()
+        for _ in range(tabs):
+            page = await context.new_page()
+            if block_resources:
+                await block_page_resources(page)
+            await page.evaluate("() => { Object.defineProperty(navigator, 'webdriver', { get: () => false }); }")
+            free_tabs.put_nowait(page)
+
+        async def fetch_page(page_num):
+            page = await free_tabs.get()
+            try:
+                search_url = f"{BING_SEARCH_URL}?q={query}&first={(page_num - 1) * 10 + 1}&FORM=PERE"
+                print(f"正在访问第 {page_num} 页: {search_url}")
+
+                retry_count = 0
+                entries = None
+
+                while retry_count < max_retries and not entries:
+                    try:
+                        with span("search.render", engine='edge'):
+                            await page.goto(search_url, wait_until="domcontentloaded", timeout=30000)
+                            await page.wait_for_selector('li.b_algo', timeout=10000)
+                            html = await page.content()
+                        with span("search.parse", engine='edge'):
+                            entries = extract_bing_results(html, page_num)
+
+                        if not entries:
+                            print(f"第 {page_num} 页无结果，重试 {retry_count + 1}/{max_retries}")
+                            retry_count += 1
                             continue
-                    
-                except Exception as e:
-                    print(f"第 {page_num} 页加载失败: {str(e)}，重试 {retry_count + 1}/{max_retries}")
-                    retry_count += 1
-                    await asyncio.sleep(random.uniform(1.0, 3.0))
-            
-            if not page_results_found:
-                print(f"第 {page_num} 页重试 {max_retries} 次仍无结果，停止搜索")
-                break
-                
-            page_num += 1
-            if len(url_ls) < top_n:
-                print(f"已获取 {len(url_ls)} 个结果，继续下一页")
-        
-        await browser.close()
-    
-    return "\n".join(results), url_ls[:top_n]
-        
+
+                    except Exception as e:
+                        print(f"第 {page_num} 页加载失败: {str(e)}，重试 {retry_count + 1}/{max_retries}")
+                        retry_count += 1
+                        await asyncio.sleep(random.uniform(1.0, 3.0))
+
+                if not entries:
+                    print(f"第 {page_num} 页重试 {max_retries} 次仍无结果，停止搜索")
+                    return None
+
+                print(f"第 {page_num} 页已解析")
+                return entries
+            finally:
+                free_tabs.put_nowait(page)
+
+        async with aclosing(iter_pages(fetch_page, 1, prefetch)) as pages:
+            async for entries in pages:
+                yield entries
+
+async def edge_search_results(query, top_n=20, proxy=None, language='en-US', cache=None, tabs=1, block_resources=False):
+    """返回 SearchResults; 参数同 edge_search"""
+    prefetch = estimate_pages(top_n) if tabs > 1 else 1
+    return await cached_search_results('edge', lambda: iter_edge_pages(query, proxy, language, tabs, prefetch, block_resources), query, top_n, language, cache, proxy)
+
+async def edge_search(query, top_n=20, proxy=None, language='en-US', cache=None, tabs=1, block_resources=False):
+    """cache: None 只合并并发的相同查询, True 使用默认搜索缓存, 也可以传入 SearchCache 实例
+    tabs > 1 时按估算的页数同时排队, 最多 tabs 个标签页并行加载; block_resources 见 iter_edge_pages"""
+    results = await edge_search_results(query, top_n, proxy, language, cache, tabs, block_resources)
+    return results.to_text(), results.urls
+
 async def main():
     proxy = "http://127.0.0.1:7890"
     # proxy = None  # 默认无代理
@@ -336,5 +511,8 @@ async def main():
             print(f"发生未知错误: {str(e)}")
             print("请稍后重试或检查输入内容")
 
+    await close_clients()
+    await close_browser_pool()
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+结构化的搜索结果
+各引擎解析出的条目转成 SearchResult(title, url, snippet, rank, engine, fetched_at),
+排序/去重/缓存都直接操作对象, 只有需要给 LLM 看的时候才拼成文本(SearchResults.to_text)
+
+    results = await baidu_search_results("关键词")
+    for r in results:
+        print(r.rank, r.title, r.url)
+    text = results.to_text()        # 与 baidu_search 返回的文本相同
+"""
+import time
+from dataclasses import dataclass, asdict
+
+# 各引擎文本视图的标题行(与原来 *_search 返回的文本一致, edge 没有标题行)
+ENGINE_HEADERS = {
+    'searx': "searx搜索结果:",
+    'baidu': "baidu搜索结果:",
+    'federated': "聚合搜索结果:",
+}
+
+
+def is_valid_link(link):
+    return link != '无链接' and link.startswith(('http://', 'https://'))
+
+
+@dataclass(slots=True, frozen=True)
+class SearchResult:
+    title: str
+    url: str           # 解析不到链接时为 '无链接'
+    snippet: str
+    rank: int          # 在该引擎结果中的位置, 从 1 开始
+    engine: str
+    fetched_at: float  # 抓取该结果页的时间戳(命中缓存时仍是原始抓取时间)
+
+    @property
+    def has_valid_url(self):
+        return is_valid_link(self.url)
+
+    def to_text(self):
+        return f"标题: {self.title}\n链接: {self.url}\n内容: {self.snippet}\n{'-'*20}"
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def results_from_entries(entries, engine, fetched_at=None, first_rank=1):
+    """把解析出的条目({'title', 'link', 'content'})转成 SearchResult 列表"""
+    fetched_at = time.time() if fetched_at is None else fetched_at
+    return [
+        SearchResult(entry['title'], entry['link'], entry['content'], rank, engine, fetched_at)
+        for rank, entry in enumerate(entries, first_rank)
+    ]
+
+
+class SearchResults(list):
+    """SearchResult 列表, 附带引擎名和按需生成的文本视图"""
+
+    def __init__(self, results=(), engine=None):
+        super().__init__(results)
+        self.engine = engine
+
+    @property
+    def urls(self):
+        return [r.url for r in self if r.has_valid_url]
+
+    def to_text(self):
+        """LLM 用的文本视图, 调用时才格式化"""
+        lines = [r.to_text() for r in self]
+        header = ENGINE_HEADERS.get(self.engine)
+        return f"{header}\n" + "\n".join(lines) if header else "\n".join(lines)
+
+    def __str__(self):
+        return self.to_text()
+
+
+def take_top(results, top_n, engine=None):
+    """按原来的规则截取: 有效链接数达到 top_n 即停止(无效链接的条目也保留在文本里)"""
+    selected = SearchResults(engine=engine)
+    valid = 0
+    for result in results:
+        selected.append(result)
+        if result.has_valid_url:
+            valid += 1
+        if valid >= top_n:
+            break
+    return selected
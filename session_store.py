@@ -0,0 +1,135 @@
+"""
+保存 Playwright 过了防护之后拿到的 cookie(cf_clearance 等), 之后的请求直接复用
+- 按 (可注册域名, 代理, User-Agent) 分开保存, 格式同 Playwright 的 storage_state({"cookies": [...], "origins": []}),
+  cf_clearance 和出口 IP、UA 绑定, 三者任何一个变了都不能复用
+- get_html 的 Playwright 回退在打开页面前把 cookie 加进 context, 渲染完再把新的 cookie 存回来
+- httpx 请求用同一个 UA 时带上这些 cookie, clearance 过期之前大多数后续请求都不需要再启动浏览器
+
+    html = await get_html(url)                    # 默认使用共享的会话存储
+    html = await get_html(url, session=False)     # 不读也不写
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from urllib.parse import urlsplit
+from fetch_strategy import registrable_domain
+from atomic_write import write_file_atomic
+
+DEFAULT_SESSION_DIR = os.path.join(os.path.expanduser("~"), ".cache", "search4llm", "sessions")
+CLEARANCE_COOKIES = ("cf_clearance", "__cf_bm")
+
+
+def _cookie_matches(cookie, host, path, secure):
+    domain = cookie.get("domain", "").lstrip(".").lower()
+    if not domain or not (host == domain or host.endswith("." + domain)):
+        return False
+    if not path.startswith(cookie.get("path") or "/"):
+        return False
+    return secure or not cookie.get("secure")
+
+
+def _belongs(cookie, domain):
+    """cookie 是否属于该可注册域名(含子域名)"""
+    cookie_domain = cookie.get("domain", "").lstrip(".").lower()
+    return cookie_domain == domain or cookie_domain.endswith("." + domain)
+
+
+def _alive(cookie, now):
+    expires = cookie.get("expires", -1)
+    return expires is None or expires < 0 or expires > now
+
+
+class SessionStore:
+    """max_age: 会话 cookie(没有过期时间的)最多保留多少秒"""
+
+    def __init__(self, session_dir=DEFAULT_SESSION_DIR, max_age=12 * 3600):
+        self.session_dir = session_dir
+        self.max_age = max_age
+        self._memory = {}     # 键 -> (saved_at, cookies)
+
+    def _key(self, url, proxy, user_agent):
+        raw = "\n".join((registrable_domain(url), proxy or "", user_agent or ""))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.session_dir, key + ".json")
+
+    def cookies(self, url, proxy=None, user_agent=None):
+        """返回该 (域名, 代理, UA) 下还没过期的 cookie 列表(Playwright 格式)"""
+        key = self._key(url, proxy, user_agent)
+        item = self._memory.get(key)
+        if item is None:
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    data = json.load(f)
+                item = (data["saved_at"], data["cookies"])
+            except FileNotFoundError:
+                return []
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"读取会话文件失败，忽略: {e}")
+                return []
+            self._memory[key] = item
+        saved_at, cookies = item
+        now = time.time()
+        if now - saved_at > self.max_age:
+            cookies = [c for c in cookies if c.get("expires", -1) > 0]
+        return [c for c in cookies if _alive(c, now)]
+
+    def storage_state(self, url, proxy=None, user_agent=None):
+        """Playwright new_context(storage_state=...) 可以直接使用的格式, 没有可用 cookie 时返回 None"""
+        cookies = self.cookies(url, proxy, user_agent)
+        return {"cookies": cookies, "origins": []} if cookies else None
+
+    def has_clearance(self, url, proxy=None, user_agent=None):
+        return any(c.get("name") in CLEARANCE_COOKIES for c in self.cookies(url, proxy, user_agent))
+
+    def cookie_header(self, url, proxy=None, user_agent=None):
+        """httpx 请求用的 Cookie 头, 没有匹配的 cookie 时返回 None"""
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        matched = [c for c in self.cookies(url, proxy, user_agent) if _cookie_matches(c, host, parts.path or "/", parts.scheme == "https")]
+        return "; ".join(f"{c['name']}={c['value']}" for c in matched) or None
+
+    def save(self, url, proxy, user_agent, state):
+        """保存 context.storage_state() 中属于该域名的 cookie"""
+        domain = registrable_domain(url)
+        now = time.time()
+        cookies = [c for c in state.get("cookies", []) if _alive(c, now) and _belongs(c, domain)]
+        if not cookies:
+            return
+        key = self._key(url, proxy, user_agent)
+        self._memory[key] = (now, cookies)
+        path = self._path(key)
+        try:
+            os.makedirs(self.session_dir, exist_ok=True)
+            write_file_atomic(path, json.dumps({"domain": domain, "saved_at": now, "cookies": cookies}, ensure_ascii=False).encode("utf-8"))
+        except OSError as e:
+            logging.warning(f"写入会话文件失败: {e}")
+
+    def forget(self, url, proxy=None, user_agent=None):
+        key = self._key(url, proxy, user_agent)
+        self._memory.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+_default_store = None
+
+
+def get_session_store():
+    """返回进程内共享的会话存储"""
+    global _default_store
+    if _default_store is None:
+        _default_store = SessionStore()
+    return _default_store
+
+
+def resolve_session_store(session):
+    """session 参数: True 使用共享的会话存储, None/False 不使用, 也可以直接传 SessionStore 实例"""
+    if session is True:
+        return get_session_store()
+    return session or None